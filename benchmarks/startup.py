@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+
+#Copyright (C) 2023 University of Twente
+
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Startup time benchmark: measures the wall time of the command line tool for --help and for a one day, one household
+# run, and checks these against a time budget. Run from the root of the repository:
+#
+#   python benchmarks/startup.py [--repeat N] [--budget-help SECONDS] [--budget-run SECONDS]
+#
+# The exit code is 1 if a budget is exceeded or if pandas is imported without the PandasWriter being used.
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTPUT_NAME = 'benchmark-startup'
+
+SMALL_CONFIG = '''seed = 42
+numDays = 1
+writer = "DEMKitWriter"
+
+[[households]]
+type = "SingleWorker"
+count = 1
+'''
+
+
+def environment():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.join(ROOT, 'src') + os.pathsep + env.get('PYTHONPATH', '')
+    return env
+
+
+def timed(args, repeat):
+    # Best of several runs, to filter out disturbances by other processes
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=ROOT, env=environment(), check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        duration = time.perf_counter() - start
+        if best is None or duration < best:
+            best = duration
+    return best
+
+
+def imports_pandas():
+    code = 'import sys, alpg.profilegenerator, alpg.config; print("pandas" in sys.modules)'
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=environment(), check=True,
+                            capture_output=True, text=True)
+    return result.stdout.strip() == 'True'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ALPG startup time benchmark')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-help', type=float, default=0.3, help='Budget in seconds for --help')
+    parser.add_argument('--budget-run', type=float, default=1.0, help='Budget in seconds for a one day, one household run')
+    args = parser.parse_args()
+
+    ok = True
+    results = []
+
+    results.append(('--help', timed(['-m', 'alpg.profilegenerator', '--help'], args.repeat), args.budget_help))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cfgFile = os.path.join(tmp, 'startup.toml')
+        with open(cfgFile, 'w') as f:
+            f.write(SMALL_CONFIG)
+        try:
+            run = ['-m', 'alpg.profilegenerator', '-c', cfgFile, '-o', OUTPUT_NAME, '-f', '--no-cache']
+            results.append(('1 day, 1 household', timed(run, args.repeat), args.budget_run))
+        finally:
+            shutil.rmtree(os.path.join(ROOT, 'output', OUTPUT_NAME), ignore_errors=True)
+
+    for name, duration, budget in results:
+        status = 'ok' if duration <= budget else 'OVER BUDGET'
+        print("%-20s %7.3f s  (budget %.3f s)  %s" % (name, duration, budget, status))
+        ok = ok and duration <= budget
+
+    if imports_pandas():
+        print("pandas is imported without using the PandasWriter")
+        ok = False
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
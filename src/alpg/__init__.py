@@ -1,10 +1,32 @@
 
-from alpg.config import (Config,
-                         HouseholdSingleWorkerConfig,
-                         HouseholdSingleRetiredConfig,
-                         HouseholdDualWorkerConfig,
-                         HouseholdDualRetiredConfig,
-                         HouseholdFamilyDualWorkerConfig)
-from alpg.configLoader import init_config
-from alpg.profilegenerator import simulate, write_output
-from alpg.writer import PandasWriter
+import importlib
+
+# The public names are imported on first use, such that importing alpg (or running alpg.profilegenerator) does not
+# import all household models and writers (and with it pandas) up front
+_EXPORTS = {'Config': 'alpg.config',
+            'HouseholdSingleWorkerConfig': 'alpg.config',
+            'HouseholdSingleRetiredConfig': 'alpg.config',
+            'HouseholdDualWorkerConfig': 'alpg.config',
+            'HouseholdDualRetiredConfig': 'alpg.config',
+            'HouseholdFamilyDualWorkerConfig': 'alpg.config',
+            'init_config': 'alpg.configLoader',
+            'simulate': 'alpg.profilegenerator',
+            'write_output': 'alpg.profilegenerator',
+            'generate': 'alpg.profilegenerator',
+            'NeighbourhoodResult': 'alpg.writer',
+            'HouseholdResult': 'alpg.writer',
+            'PandasWriter': 'alpg.writer'}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module 'alpg' has no attribute " + repr(name))
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,303 @@
+
+#Copyright (C) 2023 University of Twente
+
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Batch runs: the jobs of a manifest (TOML or JSON) are run on a pool of worker processes, e.g.
+#
+# workers = 4
+# [[jobs]]
+# config = "example"
+# output = "site_a"
+# overrides = { seed = 1, penetrationPV = 50 }
+# [[jobs]]
+# config = "example.toml"
+# output = "site_b"
+# sweep = true
+#
+# Each job takes the options of the command line of alpg.profilegenerator: config, output, force, cache, library, sweep,
+# pipeline and outputs, and overrides of the attributes of the config (as in declarative configs). Identical jobs are
+# run only once. Jobs that share a profile library run one after the other in the same worker, as they extend the same
+# index. The read-only resources of the jobs (weather, solar positions, sunrise and sunset, device profiles) are loaded
+# before the workers are started, such that forked workers share them, and are kept by the workers between jobs.
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import linecache
+import multiprocessing
+from dataclasses import dataclass, field, asdict
+
+from alpg import cache
+from alpg import configLoader
+from alpg import devices
+from alpg import profilegenerator
+from alpg import sweep
+
+logger = logging.getLogger(__name__)
+
+# Keys of a job in the manifest and the options of the command line they set
+JOB_OPTIONS = {'config': 'cfgFile', 'force': 'forceDeletion', 'cache': 'useCache', 'library': 'libraryDir',
+               'sweep': 'sweep', 'pipeline': 'pipeline', 'outputs': 'outputs'}
+
+
+@dataclass
+class Job:
+    options: configLoader.CommandLineOptions
+    overrides: dict = field(default_factory=dict)
+
+    def key(self) -> str:
+        # Equal for jobs that do exactly the same
+        return json.dumps({'options': asdict(self.options), 'overrides': self.overrides}, sort_keys=True)
+
+
+def job_from_dict(values: dict) -> Job:
+    if not isinstance(values, dict) or 'config' not in values or 'output' not in values:
+        raise configLoader.ConfigError("Each job must be a table with at least a config and an output")
+    options = configLoader.CommandLineOptions()
+    for name, value in values.items():
+        if name == 'output':
+            if not isinstance(value, str):
+                raise configLoader.ConfigError("The output of a job must be a string")
+            options.cfgOutputDir = 'output/' + value + '/'
+        elif name == 'overrides':
+            if not isinstance(value, dict):
+                raise configLoader.ConfigError("The overrides of a job must be a table")
+        elif name in JOB_OPTIONS:
+            default = getattr(options, JOB_OPTIONS[name])
+            if name == 'outputs':
+                valid = isinstance(value, list) and all(isinstance(channel, str) for channel in value)
+            elif isinstance(default, bool):
+                valid = isinstance(value, bool)
+            else:
+                valid = isinstance(value, str)
+            if not valid:
+                raise configLoader.ConfigError("Invalid value for " + name + " of a job")
+            setattr(options, JOB_OPTIONS[name], value)
+        else:
+            raise configLoader.ConfigError("Unknown job option " + name)
+    return Job(options, values.get('overrides', {}))
+
+
+def load_manifest(fname: str) -> tuple[list[Job], dict]:
+    # The jobs and the settings (workers, summary) of a manifest
+    if fname.endswith('.toml'):
+        import tomllib
+        with open(fname, 'rb') as f:
+            try:
+                values = tomllib.load(f)
+            except tomllib.TOMLDecodeError as e:
+                raise configLoader.ConfigError("Invalid TOML in " + fname + ": " + str(e))
+    else:
+        with open(fname) as f:
+            try:
+                values = json.load(f)
+            except json.JSONDecodeError as e:
+                raise configLoader.ConfigError("Invalid JSON in " + fname + ": " + str(e))
+    if not isinstance(values, dict) or not isinstance(values.get('jobs'), list):
+        raise configLoader.ConfigError("The manifest " + fname + " must contain a list of jobs")
+    settings = {name: value for name, value in values.items() if name != 'jobs'}
+    for name in settings:
+        if name not in ('workers', 'summary'):
+            raise configLoader.ConfigError("Unknown manifest setting " + name)
+    return [job_from_dict(job) for job in values['jobs']], settings
+
+
+def deduplicate(jobs: list[Job]) -> tuple[list[int], dict]:
+    # Indices of the jobs to run, and for the others the index of the identical job that is run instead
+    unique = []
+    duplicates = {}
+    byKey = {}
+    byOutput = {}
+    for i, job in enumerate(jobs):
+        key = job.key()
+        if key in byKey:
+            duplicates[i] = byKey[key]
+            continue
+        if job.options.cfgOutputDir in byOutput:
+            raise configLoader.ConfigError("Jobs " + str(byOutput[job.options.cfgOutputDir] + 1) + " and " + str(i + 1) +
+                                           " differ, but write to the same output " + job.options.cfgOutputDir)
+        byKey[key] = i
+        byOutput[job.options.cfgOutputDir] = i
+        unique.append(i)
+    return unique, duplicates
+
+
+def lanes(jobs: list[Job], indices: list[int]) -> list[list[int]]:
+    # Groups of jobs that run one after the other: jobs sharing a profile library, all others on their own
+    result = []
+    byLibrary = {}
+    for i in indices:
+        libraryDir = jobs[i].options.libraryDir
+        if libraryDir is None:
+            result.append([i])
+        elif os.path.abspath(libraryDir) in byLibrary:
+            byLibrary[os.path.abspath(libraryDir)].append(i)
+        else:
+            byLibrary[os.path.abspath(libraryDir)] = [i]
+            result.append(byLibrary[os.path.abspath(libraryDir)])
+    return result
+
+
+def load_job_config(job: Job) -> configLoader.Config:
+    config = configLoader.load_config(job.options, job.overrides)
+    if job.options.sweep:
+        sweep.validate_scenarios(config)
+    return config
+
+
+def check_job_config(job: Job) -> configLoader.Config:
+    # The validated config of a job without its writer and households, which are only created by the worker
+    config = configLoader.read_config(job.options, job.overrides)
+    configLoader.validate_config(config)
+    if job.options.sweep:
+        sweep.validate_scenarios(config)
+    return config
+
+
+def warm_resources(config: configLoader.Config) -> None:
+    # Loads the read-only resources of a config into the caches of this process
+    linecache.getline(config.weather_irradiation, 1)
+    cache.file_digest(config.weather_irradiation)
+    cache.code_version()
+    devices.skyIrradiance(config.weather_irradiation, config.weather_timebaseDataset, devices.locationKey(config.location),
+                          config.startDay, config.numDays*1440)
+    devices.sunTimes(devices.locationKey(config.location), config.startDay, config.numDays)
+    for name in dir(config):
+        if name.startswith('deviceProfile'):
+            devices.deviceProfile(getattr(config, name))
+
+
+def run_job(job: Job) -> dict:
+    start = time.perf_counter()
+    outcome = {'status': 'ok', 'households': 0, 'error': None}
+    try:
+        config = load_job_config(job)
+        outputDir = job.options.cfgOutputDir
+        if os.path.isdir(outputDir) and os.listdir(outputDir) and not job.options.forceDeletion:
+            raise configLoader.ConfigError("The output directory " + outputDir + " is not empty, set force for the job")
+        profilegenerator.prepare_output_directory(job.options)
+        profilegenerator.run(config, job.options)
+        outcome['households'] = len(config.householdList)
+    except Exception as e:
+        logger.exception("Job with output " + job.options.cfgOutputDir + " failed")
+        outcome['status'] = 'failed'
+        outcome['error'] = type(e).__name__ + ': ' + str(e)
+    outcome['seconds'] = round(time.perf_counter() - start, 3)
+    return outcome
+
+
+def run_lane(jobs: list[tuple[int, Job]]) -> list[tuple[int, dict]]:
+    return [(i, run_job(job)) for i, job in jobs]
+
+
+def run_batch(jobs: list[Job], workers: int) -> list[dict]:
+    # Runs the jobs and returns the outcome of each job, in the order of the manifest
+    start = time.perf_counter()
+    indices, duplicates = deduplicate(jobs)
+    outcomes = {}
+
+    # Check the configs up front, which finds errors in the configs before any job is run and loads the resources
+    runnable = []
+    for i in indices:
+        try:
+            warm_resources(check_job_config(jobs[i]))
+            runnable.append(i)
+        except Exception as e:
+            outcomes[i] = {'status': 'failed', 'households': 0, 'error': type(e).__name__ + ': ' + str(e), 'seconds': 0.0}
+
+    batchLanes = [[(i, jobs[i]) for i in lane] for lane in lanes(jobs, runnable)]
+    workers = max(1, min(workers, len(batchLanes)))
+    logger.info("Running " + str(len(runnable)) + " jobs on " + str(workers) + " workers")
+    pool = None
+    if workers == 1:
+        results = map(run_lane, batchLanes)
+    else:
+        # Forked workers start with the resources loaded above
+        methods = multiprocessing.get_all_start_methods()
+        pool = multiprocessing.get_context('fork' if 'fork' in methods else None).Pool(workers)
+        results = pool.imap_unordered(run_lane, batchLanes)
+    try:
+        for laneOutcomes in results:
+            for i, outcome in laneOutcomes:
+                logger.info("Job " + str(i + 1) + " (" + jobs[i].options.cfgOutputDir + "): " + outcome['status'] +
+                            " in " + str(outcome['seconds']) + " s")
+                outcomes[i] = outcome
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    for i, original in duplicates.items():
+        outcomes[i] = {'status': 'duplicate', 'households': 0, 'error': None, 'seconds': 0.0, 'duplicateOf': original + 1}
+
+    summary = []
+    for i, job in enumerate(jobs):
+        summary.append({'job': i + 1, 'config': job.options.cfgFile, 'output': job.options.cfgOutputDir,
+                        'overrides': job.overrides, **outcomes[i]})
+    logger.info("Batch done in " + str(round(time.perf_counter() - start, 1)) + " s")
+    return summary
+
+
+def write_summary(fname: str, summary: list[dict], seconds: float, workers: int) -> None:
+    os.makedirs(os.path.dirname(fname) or '.', exist_ok=True)
+    with open(fname + '.tmp', 'w') as f:
+        json.dump({'seconds': round(seconds, 3), 'workers': workers,
+                   'ok': sum(1 for job in summary if job['status'] == 'ok'),
+                   'failed': sum(1 for job in summary if job['status'] == 'failed'),
+                   'duplicate': sum(1 for job in summary if job['status'] == 'duplicate'),
+                   'jobs': summary}, f, indent=1)
+    os.replace(fname + '.tmp', fname)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='[%(processName)s] %(message)s', stream=sys.stdout)
+
+    parser = argparse.ArgumentParser(prog='Artifical Load Profile Generator (ALPG) batch runner')
+    parser.add_argument('manifest', type=str, help='TOML or JSON file with the jobs')
+    parser.add_argument('-w', '--workers', type=int, help='Number of worker processes, overrides workers in the manifest (default: number of CPUs)')
+    parser.add_argument('--summary', type=str, help='JSON file with the outcome and duration of each job (default: output/<manifest>_summary.json)')
+    args = parser.parse_args()
+
+    try:
+        jobs, settings = load_manifest(args.manifest)
+    except (configLoader.ConfigError, OSError) as e:
+        print("Error: " + str(e), flush=True)
+        exit(1)
+    workers = args.workers or settings.get('workers') or os.cpu_count() or 1
+    summaryFile = args.summary or settings.get('summary') or \
+        os.path.join('output', os.path.splitext(os.path.basename(args.manifest))[0] + '_summary.json')
+
+    start = time.perf_counter()
+    try:
+        summary = run_batch(jobs, workers)
+    except configLoader.ConfigError as e:
+        print("Error: " + str(e), flush=True)
+        exit(1)
+    write_summary(summaryFile, summary, time.perf_counter() - start, workers)
+
+    for job in summary:
+        print(str(job['job']).rjust(4) + '  ' + job['status'].ljust(9) + str(job['seconds']).rjust(9) + ' s  ' + job['output'] +
+              ('  ' + job['error'] if job['error'] else ''), flush=True)
+    print("Summary written to " + summaryFile, flush=True)
+    if any(job['status'] == 'failed' for job in summary):
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
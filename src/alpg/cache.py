@@ -0,0 +1,186 @@
+#Copyright (C) 2023 University of Twente
+
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Content-addressed cache for simulated households.
+# Every household is stored under a hash of the simulation relevant config attributes (including the seed and the
+# household configs), the index of the household in the neighbourhood and the version of the code. Changing only the
+# writer or the output directory will therefore reuse the simulated households of a previous run.
+
+import copy
+import functools
+import hashlib
+import json
+import os
+import pickle
+import zlib
+from typing import Optional
+
+from alpg import configLoader
+from alpg.households import HouseholdModel
+
+
+# Household attributes that hold the simulation results
+# The reactive power and the heat gain of devices are derived from these on access, see households.ReactiveProfiles
+RESULT_ATTRIBUTES = ('Consumption', 'ReactiveFactor', 'StoredHeatGain', 'HeatDemand', 'PVProfile', 'Occupancy', 'Devices',
+                     'DeviceEvents', 'FridgeCycles')
+
+
+@functools.lru_cache(maxsize=None)
+def code_version() -> str:
+    # Hash of all the sources of this package, such that any change in the models invalidates the cache
+    digest = hashlib.sha256()
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for fname in sorted(os.listdir(package_dir)):
+        if fname.endswith('.py'):
+            with open(os.path.join(package_dir, fname), 'rb') as f:
+                digest.update(fname.encode() + b'\0' + f.read())
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def file_digest(fname: str) -> str:
+    digest = hashlib.sha256()
+    with open(fname, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def household_key(config: configLoader.Config, num: int, allOutputs: bool = False) -> str:
+    key = {'config': configLoader.canonical_config(config, allOutputs),
+           'household': num,
+           'weather': file_digest(config.weather_irradiation),
+           'code': code_version()}
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def household_keys(config: configLoader.Config, num: int) -> list[str]:
+    # Keys to look up a household with, the last one is the key to store it under. A household simulated for all outputs
+    # also serves a selection of outputs that skips the domestic hot water, so the key of a full run is tried first.
+    keys = [household_key(config, num, allOutputs=True), household_key(config, num)]
+    return keys[1:] if keys[0] == keys[1] else keys
+
+
+def household_state(household: HouseholdModel) -> dict:
+    state = {attr: getattr(household, attr) for attr in RESULT_ATTRIBUTES}
+    # Heating devices keep a reference to the config, which should not end up in the cache
+    state['HeatingDevices'] = {name: {k: v for k, v in vars(device).items() if k != 'config'}
+                               for name, device in household.HeatingDevices.items()}
+    return state
+
+
+def restore_household_state(household: HouseholdModel, state: dict) -> None:
+    for name, device_state in state.pop('HeatingDevices').items():
+        vars(household.HeatingDevices[name]).update(device_state)
+    vars(household).update(state)
+
+
+def copy_state(value):
+    # Copy of a household state, such that the same state can be restored into several households. Lists, dicts and
+    # objects (devices) are copied, the numbers and tuples in them are immutable and shared. Much faster than
+    # copy.deepcopy() for profiles with a value per minute.
+    if isinstance(value, dict):
+        return {k: copy_state(v) for k, v in value.items()}
+    if isinstance(value, list):
+        if len(value) == 0 or isinstance(value[0], (int, float)):
+            return list(value)
+        return [copy_state(v) for v in value]
+    if hasattr(value, '__dict__') and not isinstance(value, type):
+        result = copy.copy(value)
+        vars(result).update(copy_state(vars(value)))
+        return result
+    return value
+
+
+def dump_state(fname: str, state: dict) -> None:
+    # The temporary file is unique per process, such that processes of a batch run can store the same household
+    tmpName = fname + '.' + str(os.getpid()) + '.tmp'
+    with open(tmpName, 'wb') as f:
+        f.write(zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 1))
+    os.replace(tmpName, fname)
+
+
+def load_state(fname: str) -> dict:
+    with open(fname, 'rb') as f:
+        return pickle.loads(zlib.decompress(f.read()))
+
+
+class ResultCache:
+    def __init__(self, directory: str, size_limit: float = 2048):
+        self.directory = directory
+        self.size_limit = size_limit * 1024 * 1024  # MB
+        os.makedirs(self.directory, exist_ok=True)
+        # Total size of the entries, counted by evict() and kept up to date by put(), such that the folder is only listed
+        # again when the limit is exceeded. Entries written by other processes are only counted by evict().
+        self.size = None
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.pickle.z')
+
+    def get(self, key: str) -> Optional[dict]:
+        fname = self.path(key)
+        try:
+            state = load_state(fname)
+        except (OSError, EOFError, zlib.error, pickle.UnpicklingError):
+            return None
+
+        # Mark as recently used
+        os.utime(fname, None)
+        return state
+
+    def lookup(self, keys: list[str]) -> Optional[dict]:
+        # The state of the first of the keys that is in the cache
+        for key in keys:
+            state = self.get(key)
+            if state is not None:
+                return state
+        return None
+
+    def put(self, key: str, state: dict) -> None:
+        dump_state(self.path(key), state)
+        if self.size is not None:
+            self.size += os.path.getsize(self.path(key))
+        if self.size is None or self.size > self.size_limit:
+            self.evict()
+
+    def evict(self) -> None:
+        # Remove the least recently used entries until the cache fits within 90% of the size limit, which leaves room
+        # for the next entries before the folder has to be listed again
+        entries = []
+        for fname in os.listdir(self.directory):
+            if fname.endswith('.pickle.z'):
+                try:
+                    st = os.stat(os.path.join(self.directory, fname))
+                except OSError:
+                    # Removed by another process in the meantime
+                    continue
+                entries.append((st.st_mtime, st.st_size, fname))
+
+        total = sum(size for _, size, _ in entries)
+        if total > self.size_limit:
+            for _, size, fname in sorted(entries):
+                if total <= 0.9 * self.size_limit:
+                    break
+                try:
+                    os.unlink(os.path.join(self.directory, fname))
+                except OSError:
+                    pass
+                total -= size
+        self.size = total
+
+
+def open_cache(config: configLoader.Config) -> ResultCache:
+    return ResultCache(getattr(config, 'cacheDir', 'cache/'), getattr(config, 'cacheSizeLimit', 2048))
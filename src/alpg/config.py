@@ -118,9 +118,49 @@ class Config:
 
     writer_class = DEMKitWriter
 
+    # Cache of simulated households, disable with the --no-cache flag
+    cacheDir = 'cache/'
+    cacheSizeLimit = 2048  # MB, least recently used households are removed first
+
+    # Number of pre-simulated households per household type, with and without induction cooking, when composing a
+    # neighbourhood out of a profile library
+    libraryArchetypes = 10
+
+    # Scenarios written with the --sweep flag, each a dict of penetrations (and other technology parameters) that differ
+    # from this config. E.g. [{'penetrationPV': 0}, {'penetrationPV': 50}], see also sweep.penetrationSteps()
+    sweepScenarios = []
+
+    # Maximum number of simulated households waiting for the writer thread when using the --pipeline flag
+    writerQueueSize = 4
+
+    # Compression of the output files of the DEMKitWriter: None, 'gzip' or 'zstd' (requires the zstandard package).
+    # The level is the compression level of the codec, None for its default
+    outputCompression = None
+    outputCompressionLevel = None
+
+    # Render the runs of the washing machines and dishwashers at their start times into extra output channels (the
+    # uncontrolled load): None, 'direct' or 'fft' (FFT convolution, only faster for runs that are dense in time)
+    renderTimeshiftable = None
+
+    # Render the charging of the EVs into an extra output channel, charging at full power as soon as the EV is plugged in
+    renderElectricVehicles = False
+
+    # The PandasWriter gives the sessions of the EVs, washing machines, dishwashers and thermostats as one table per
+    # session type for all households (PandasWriter.sessionTable). Set to False to skip the per session objects of
+    # each household (EVChargeSession, ThermostatSetpoint, ...), which take a lot of memory for large neighbourhoods
+    pandasSessionObjects = True
+
+    # Output channels to write, by the name of their DEMKit output file without extension, e.g. ['Electricity_Profile',
+    # 'Electricity_Profile_PVProduction'], or None for all. Profiles of which no channel is selected are not computed (the
+    # domestic hot water demand) or not derived (reactive power, heat gain of devices). Also the --outputs flag
+    outputs = None
+
     # input files:
     weather_irradiation = 'input/weather/solarirradiation_twenthe.csv'
     weather_timebaseDataset = 3600  # in seconds per interval
+    # Power profiles of a single run of the timeshiftable devices: <profile>_active.csv and <profile>_reactive.csv
+    deviceProfileWashingMachine = 'input/devices/washingmachine'
+    deviceProfileDishwasher = 'input/devices/dishwasher'
 
     # Simulation:
     # number of days to simulate and skipping of initial days. Simulation starts at Sunday January 1.
@@ -15,47 +15,302 @@
 #along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import os
 import sys
+import json
+import hashlib
 import argparse
 import importlib
+import dataclasses
 from dataclasses import dataclass
 from types import ModuleType
 from typing import Optional
 
+from alpg import rng
+
 Config = ModuleType
 
 sys.path.insert(0, 'configs')
 
+
+class ConfigError(Exception):
+    pass
+
+
 @dataclass
 class CommandLineOptions:
     cfgFile: Optional[str] = None
     cfgOutputDir: str = 'output/output/'
     forceDeletion: bool = False
+    useCache: bool = True
+    libraryDir: Optional[str] = None
+    sweep: bool = False
+    pipeline: bool = False
+    outputs: Optional[list] = None
 
 
 def parse_cmdline_options() -> CommandLineOptions:
     parser = argparse.ArgumentParser(prog='Artifical Load Profile Generator (ALPG)')
-    parser.add_argument('-c', '--config', type=str, required=True)
+    parser.add_argument('-c', '--config', type=str, required=True, help='Python module in configs/, or a .toml/.json file')
     parser.add_argument('-o', '--output', type=str, required=True)
     parser.add_argument('-f', '--force', action='store_true')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use (or fill) the cache of simulated households')
+    parser.add_argument('-l', '--library', type=str, help='Compose the neighbourhood out of the profile library in this directory')
+    parser.add_argument('-s', '--sweep', action='store_true', help='Write the sweepScenarios of the config, simulating the households only once')
+    parser.add_argument('-p', '--pipeline', action='store_true', help='Write households in a separate thread while the next ones are simulated')
+    parser.add_argument('--outputs', type=str, help='Comma separated output channels to write (e.g. Electricity_Profile,Electricity_Profile_PVProduction), overrides outputs in the config')
     args = parser.parse_args()
 
     return CommandLineOptions(cfgFile=args.config,
                               cfgOutputDir='output/' + args.output + '/',
-                              forceDeletion=args.force)
+                              forceDeletion=args.force,
+                              useCache=not args.no_cache,
+                              libraryDir=args.library,
+                              sweep=args.sweep,
+                              pipeline=args.pipeline,
+                              outputs=args.outputs.split(',') if args.outputs is not None else None)
+
+
+# Attributes that do not influence the simulated households
+NON_SIMULATION_ATTRIBUTES = {'writer', 'writer_class', 'householdList', 'config_file', 'output_dir',
+                             'cacheDir', 'cacheSizeLimit', 'sweepScenarios', 'writerQueueSize',
+                             'outputCompression', 'outputCompressionLevel', 'renderTimeshiftable',
+                             'renderElectricVehicles', 'pandasSessionObjects', 'outputs'}
+
+
+def canonical_value(value):
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        return value
+    if isinstance(value, (list, tuple, range)):
+        return [canonical_value(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): canonical_value(v) for k, v in value.items()}
+    if hasattr(value, 'latitude') and hasattr(value, 'longitude'):
+        # astral Location
+        return {'latitude': value.latitude, 'longitude': value.longitude, 'timezone': value.timezone,
+                'elevation': value.elevation, 'solar_depression': value.solar_depression}
+    if hasattr(value, '__dict__'):
+        # Household configs, the type is relevant as well
+        return {'type': type(value).__name__, **canonical_value(vars(value))}
+    return repr(value)
+
+
+def canonical_config(config: Config, allOutputs: bool = False) -> dict:
+    # Plain representation of all attributes that determine the outcome of the simulation. Attributes missing from the
+    # config (e.g. in Python configs written for an earlier version) take the defaults of alpg.config.Config, as they do
+    # for declarative configs.
+    from alpg import config as defaults
+    from alpg.households import DHW_CHANNELS
+    canonical = {}
+    for source in (defaults.Config, config):
+        for name in dir(source):
+            if not name.startswith('_') and name not in NON_SIMULATION_ATTRIBUTES and not callable(getattr(source, name)):
+                canonical[name] = canonical_value(getattr(source, name))
+    # Of the selected outputs, only skipping the domestic hot water changes the simulated households. With allOutputs,
+    # the representation is that of the same config writing all outputs.
+    if not allOutputs and not outputSelected(config, DHW_CHANNELS):
+        canonical['skipDHW'] = True
+    return canonical
+
+
+def config_hash(config: Config) -> str:
+    # Stable hash of the simulation relevant parts of a config, equal for equal Python and declarative configs
+    return hashlib.sha256(json.dumps(canonical_config(config), sort_keys=True).encode()).hexdigest()
+
+
+def validate_config(config: Config) -> None:
+    for name in dir(config):
+        if name.startswith('penetration') and not 0 <= getattr(config, name) <= 100:
+            raise ConfigError("The penetration " + name + " must be between 0 and 100!")
+    if config.penetrationEV + config.penetrationPHEV > 100:
+        raise ConfigError("The combined penetration of EV and PHEV exceed 100!")
+    if config.penetrationPV < config.penetrationBattery:
+        raise ConfigError("The penetration of PV must be equal or higher than the penetration of batteries!")
+    if config.penetrationHeatPump + config.penetrationCHP > 100:
+        raise ConfigError("The combined penetration of heatpumps and CHPs exceed 100!")
+    if config.numDays <= 0 or config.startDay < 0:
+        raise ConfigError("The number of days must be positive and the start day may not be negative!")
+    if len(config.householdConfigs) == 0:
+        raise ConfigError("The config does not contain any households!")
+    if getattr(config, 'outputCompression', None) not in (None, 'gzip', 'zstd'):
+        raise ConfigError("The output compression must be None, 'gzip' or 'zstd'!")
+    if getattr(config, 'renderTimeshiftable', None) not in (None, 'direct', 'fft'):
+        raise ConfigError("The rendering of timeshiftable devices must be None, 'direct' or 'fft'!")
+    outputs = getattr(config, 'outputs', None)
+    if outputs is not None:
+        from alpg import writer
+        if isinstance(outputs, str) or len(outputs) == 0:
+            raise ConfigError("The outputs must be None or a list of output channels!")
+        for channel in outputs:
+            if channel not in writer.CHANNELS:
+                raise ConfigError("Unknown output channel " + str(channel) + ", expected one of " + ', '.join(writer.CHANNELS))
+            if channel in writer.OPTIONAL_CHANNELS and channel not in writer.renderedChannels(config):
+                raise ConfigError("The output channel " + channel + " requires renderTimeshiftable or renderElectricVehicles!")
+
+
+def outputSelected(config: Config, channels) -> bool:
+    # Whether any of the given output channels is written, all channels are when outputs is not set in the config
+    outputs = getattr(config, 'outputs', None)
+    return outputs is None or any(channel in outputs for channel in channels)
+
+
+# Declarative (TOML/JSON) configs
+# All keys map onto the attributes of alpg.config.Config, of which the values are used as defaults. The location is given
+# as a table with latitude, longitude, timezone, elevation and solar_depression, the writer by its class name in
+# alpg.writer. Households are given as a list of tables with a type (e.g. "FamilyDualWorker"), a count and the
+# options of the household config (parttime, jobless). For example:
+#
+# seed = 42
+# numDays = 365
+# penetrationPV = 50
+# writer = "DEMKitWriter"
+# [[households]]
+# type = "DualWorker"
+# count = 2
+# parttime = true
+
+def household_config_classes() -> dict:
+    from alpg import config as defaults
+    classes = {}
+    for name, cls in vars(defaults).items():
+        if isinstance(cls, type) and issubclass(cls, defaults.HouseholdConfig) and cls is not defaults.HouseholdConfig:
+            classes[name] = cls
+            classes[name[len('Household'):-len('Config')]] = cls
+    return classes
+
+
+def household_configs_from_counts(households: list) -> list:
+    classes = household_config_classes()
+    householdConfigs = []
+    for household in households:
+        if not isinstance(household, dict) or 'type' not in household:
+            raise ConfigError("Each household entry must be a table with at least a type")
+        options = dict(household)
+        typeName = options.pop('type')
+        count = options.pop('count', 1)
+        if typeName not in classes:
+            raise ConfigError("Unknown household type " + str(typeName))
+        if not isinstance(count, int) or isinstance(count, bool) or count < 0:
+            raise ConfigError("The count of households of type " + typeName + " must be a non-negative integer")
+        fields = [field.name for field in dataclasses.fields(classes[typeName])] if dataclasses.is_dataclass(classes[typeName]) else []
+        for option, value in options.items():
+            if option not in fields or not isinstance(value, bool):
+                raise ConfigError("Invalid option " + option + " for household type " + typeName)
+        householdConfigs.extend([classes[typeName](**options)] * count)
+    return householdConfigs
+
+
+def config_from_dict(values: dict) -> Config:
+    from alpg import config as defaults
+
+    config = defaults.Config()
+    set_config_values(config, values)
+    return config
+
+
+def set_config_values(config: Config, values: dict) -> None:
+    # Sets the attributes of a config from plain values, as in declarative configs. Also used for the overrides of the
+    # jobs of a batch run.
+    from alpg import config as defaults
+    from alpg import writer
+    from astral import Location
+
+    for name, value in values.items():
+        if name == 'households':
+            config.householdConfigs = household_configs_from_counts(value)
+        elif name == 'writer':
+            writer_class = getattr(writer, str(value), None)
+            if not isinstance(writer_class, type) or not issubclass(writer_class, writer.AbstractWriter):
+                raise ConfigError("Unknown writer " + str(value))
+            config.writer_class = writer_class
+        elif name == 'location':
+            if not isinstance(value, dict):
+                raise ConfigError("The location must be a table")
+            location = Location()
+            for attr in ('latitude', 'longitude', 'timezone', 'elevation', 'solar_depression'):
+                setattr(location, attr, getattr(defaults.Config.location, attr))
+            for attr, attrValue in value.items():
+                if attr not in ('latitude', 'longitude', 'timezone', 'elevation', 'solar_depression'):
+                    raise ConfigError("Unknown location attribute " + attr)
+                setattr(location, attr, attrValue)
+            config.location = location
+        elif name == 'outputs':
+            if not isinstance(value, list) or not all(isinstance(channel, str) for channel in value):
+                raise ConfigError("The outputs must be a list of output channels")
+            config.outputs = value
+        elif name.startswith('_') or not hasattr(defaults.Config, name) or name in ('householdConfigs', 'writer_class'):
+            raise ConfigError("Unknown config attribute " + name)
+        else:
+            default = getattr(defaults.Config, name)
+            if default is None:
+                # Optional settings, checked by validate_config()
+                valid = isinstance(value, (str, int, float))
+            elif isinstance(default, bool) or isinstance(value, bool):
+                valid = isinstance(value, bool) and isinstance(default, bool)
+            elif isinstance(default, (int, float)):
+                valid = isinstance(value, (int, float)) and (isinstance(default, float) or isinstance(value, int))
+            else:
+                valid = isinstance(value, type(default))
+            if not valid:
+                raise ConfigError("Invalid value for " + name + ": expected " + type(default).__name__)
+            setattr(config, name, value)
+
+
+def load_declarative_config(fname: str) -> Config:
+    if fname.endswith('.toml'):
+        import tomllib
+        with open(fname, 'rb') as f:
+            try:
+                values = tomllib.load(f)
+            except tomllib.TOMLDecodeError as e:
+                raise ConfigError("Invalid TOML in " + fname + ": " + str(e))
+    else:
+        with open(fname) as f:
+            try:
+                values = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ConfigError("Invalid JSON in " + fname + ": " + str(e))
+    if not isinstance(values, dict):
+        raise ConfigError("The config in " + fname + " must be a table")
+    return config_from_dict(values)
+
+
+def create_households(config: Config) -> None:
+    # Seed before creating the households, such that their parameters are reproducible as well
+    rng.seed(config.seed)
+    config.householdList = [householdCnf.to_model(config) for householdCnf in config.householdConfigs]
 
 
 def init_config(config: Config) -> Config:
+    validate_config(config)
+
     config.writer = config.writer_class(config)
-    config.householdList = [householdCnf.to_model(config) for householdCnf in config.householdConfigs]
+    create_households(config)
     return config
 
 
-def load_config(cmd_options: CommandLineOptions) -> Config:
-    config_module = importlib.import_module(cmd_options.cfgFile)
-    config = config_module.Config()
-    config.config_file = cmd_options.cfgFile
-    config.output_dir = cmd_options.cfgOutputDir
+def load_config(cmd_options: CommandLineOptions, overrides: Optional[dict] = None) -> Config:
+    config = read_config(cmd_options, overrides)
     init_config(config)
 
     return config
+
+
+def read_config(cmd_options: CommandLineOptions, overrides: Optional[dict] = None) -> Config:
+    # The config as given by the command line options, without its writer and households (see init_config()). overrides
+    # are plain values (as in declarative configs) replacing those of the config
+    if cmd_options.cfgFile.endswith(('.toml', '.json')):
+        fname = cmd_options.cfgFile
+        if not os.path.exists(fname):
+            fname = os.path.join('configs', fname)
+        config = load_declarative_config(fname)
+    else:
+        config_module = importlib.import_module(cmd_options.cfgFile)
+        config = config_module.Config()
+    config.config_file = cmd_options.cfgFile
+    config.output_dir = cmd_options.cfgOutputDir
+    if overrides:
+        set_config_values(config, overrides)
+    if cmd_options.outputs is not None:
+        config.outputs = cmd_options.outputs
+    return config
@@ -17,13 +17,159 @@
 
 import math
 import datetime
+import functools
 import linecache
-import random
+from typing import NamedTuple
 
+import numpy
+from astral import Location
+
+from alpg import rng
 from alpg import configLoader
 from alpg import profilegentools
 
 
+# Activations of devices that only run for a few minutes a day are recorded as sparse events, which are rendered into
+# a dense profile at once by renderEvents(). The pattern determines the power during the event:
+PATTERN_CONSTANT = 0	# power during the whole event
+PATTERN_CYCLE = 1		# power during the first head minutes, afterwards switching on and off every param minutes
+PATTERN_TWO_LEVEL = 2	# power during the first head minutes, afterwards param as (lower) power
+
+
+class DeviceEvent(NamedTuple):
+    start: int		# minute
+    duration: int	# minutes
+    power: int		# W
+    pattern: int = PATTERN_CONSTANT
+    head: int = 0
+    param: int = 0
+
+
+def shiftEvents(events, offset):
+    return [event._replace(start=event.start+offset) for event in events]
+
+
+def renderEvents(events, timeintervals):
+    profile = numpy.zeros(int(timeintervals), dtype=int)
+    events = [event for event in events if event.duration > 0]
+    if len(events) == 0:
+        return profile
+
+    start, duration, power, pattern, head, param = (numpy.array(field) for field in zip(*events))
+    offset = numpy.arange(duration.sum()) - numpy.repeat(numpy.cumsum(duration) - duration, duration)
+    m = numpy.repeat(start, duration) + offset
+    power, pattern, head, param = (numpy.repeat(field, duration) for field in (power, pattern, head, param))
+
+    # Cycles are relative to the minute of the day
+    cycle = numpy.maximum(param, 1)
+    cycleOn = (m % 1440) % (2*cycle) < cycle
+    value = numpy.where(pattern == PATTERN_CYCLE, power * cycleOn, numpy.where(pattern == PATTERN_TWO_LEVEL, param, power))
+    value = numpy.where(offset < head, power, value)
+
+    numpy.add.at(profile, m, value)
+    return profile
+
+
+# Registry of measured power profiles of a single run of a device, given as <profile>_active.csv and
+# <profile>_reactive.csv (W and var per minute, e.g. input/devices/washingmachine). Each profile is read only once and
+# shared by all devices that refer to it, new profiles can be added by placing these files and referring to them in the
+# config.
+class DeviceProfile(NamedTuple):
+    power: numpy.ndarray	# complex: active + reactive j, read-only
+    longProfile: str		# comma separated Python complex values, as written by the DEMKitWriter
+
+
+@functools.lru_cache(maxsize=None)
+def deviceProfile(profile):
+    try:
+        active = numpy.loadtxt(profile + '_active.csv', dtype=float, ndmin=1)
+        reactive = numpy.loadtxt(profile + '_reactive.csv', dtype=float, ndmin=1)
+    except (OSError, ValueError) as e:
+        raise configLoader.ConfigError("Could not read the device profile " + profile + ": " + str(e))
+    if len(active) != len(reactive):
+        raise configLoader.ConfigError("The active and reactive power of device profile " + profile + " differ in length")
+
+    power = active + 1j*reactive
+    power.setflags(write=False)
+    return DeviceProfile(power, ','.join('complex(%r, %r)' % (float(p.real), float(p.imag)) for p in power))
+
+
+def fftLength(n):
+    # Smallest length of at least n with only factors 2, 3 and 5, for which the FFT is fast
+    best = 1 << (n-1).bit_length()
+    power5 = 1
+    while power5 < best:
+        power35 = power5
+        while power35 < best:
+            best = min(best, power35 << ((n-1) // power35).bit_length())
+            power35 *= 3
+        power5 *= 5
+    return best
+
+
+def renderRuns(startTimes, profile, timeintervals, method='direct'):
+    # Dense (complex) power profiles of a device of which a run of the given profile starts at each start time, with one
+    # row per list of start times. This is the convolution of the impulse train of the start times with the profile:
+    # - 'direct': evaluated only at the impulses, all runs of all rows are placed at once (fast for sparse runs)
+    # - 'fft': through the FFT of the impulse trains, transforming a batch of rows at a time
+    # Runs that do not fit in the horizon are cut off.
+    timeintervals = int(timeintervals)
+    profile = numpy.asarray(profile, dtype=complex)
+    rows = numpy.repeat(numpy.arange(len(startTimes)), [len(starts) for starts in startTimes])
+    starts = numpy.concatenate([numpy.asarray(starts, dtype=int) for starts in startTimes] + [numpy.zeros(0, dtype=int)])
+    inside = (starts >= 0) & (starts < timeintervals)
+    rows, starts = rows[inside], starts[inside]
+    result = numpy.zeros((len(startTimes), timeintervals), dtype=complex)
+
+    if method == 'direct':
+        m = starts[:, None] + numpy.arange(len(profile))
+        fits = m < timeintervals
+        numpy.add.at(result, (numpy.broadcast_to(rows[:, None], m.shape)[fits], m[fits]),
+                     numpy.broadcast_to(profile, m.shape)[fits])
+    elif method == 'fft':
+        impulses = numpy.zeros(result.shape)
+        numpy.add.at(impulses, (rows, starts), 1)
+        n = fftLength(timeintervals + len(profile) - 1)
+        active = numpy.fft.rfft(profile.real, n)
+        reactive = numpy.fft.rfft(profile.imag, n)
+        for first in range(0, len(startTimes), 32):
+            transformed = numpy.fft.rfft(impulses[first:first+32], n, axis=1)
+            result[first:first+32].real = numpy.fft.irfft(transformed * active, n, axis=1)[:, :timeintervals]
+            result[first:first+32].imag = numpy.fft.irfft(transformed * reactive, n, axis=1)[:, :timeintervals]
+    else:
+        raise configLoader.ConfigError("Unknown rendering method " + str(method))
+    return result
+
+
+def renderCharging(evs, timeintervals, offset=0):
+    # Uncontrolled charging of a fleet of electric vehicles: each session charges at the maximum power (Consumption)
+    # from the moment the vehicle is plugged in, until the required energy (EnergyLoss, Wh) is charged or the vehicle
+    # leaves. One row per vehicle with the average power (W) per minute, all sessions are rendered at once.
+    # The session times are minutes since the start of the year, the profiles start at minute offset of the year.
+    timeintervals = int(timeintervals)
+    counts = [min(len(ev.StartTimes), len(ev.EndTimes), len(ev.EnergyLoss)) for ev in evs]
+    rows = numpy.repeat(numpy.arange(len(evs)), counts)
+    start = numpy.array([t for ev, n in zip(evs, counts) for t in ev.StartTimes[:n]], dtype=int) - offset
+    end = numpy.array([t for ev, n in zip(evs, counts) for t in ev.EndTimes[:n]], dtype=int) - offset
+    energy = numpy.array([e for ev, n in zip(evs, counts) for e in ev.EnergyLoss[:n]], dtype=float)
+    power = numpy.repeat(numpy.array([ev.Consumption for ev in evs], dtype=float), counts)
+
+    valid = (power > 0) & (energy > 0) & (start >= 0) & (start < timeintervals) & (end > start)
+    rows, start, end, energy, power = rows[valid], start[valid], numpy.minimum(end[valid], timeintervals), energy[valid], power[valid]
+
+    # Full power during the first minutes, the remaining energy in the minute after
+    duration = energy * 60 / power
+    full = numpy.minimum(numpy.floor(duration), end - start).astype(int)
+    remainder = numpy.where(start + full < end, duration - full, 0)
+
+    profile = numpy.zeros((len(evs), timeintervals + 1))
+    numpy.add.at(profile, (rows, start), power)
+    numpy.add.at(profile, (rows, start + full), -power)
+    profile = numpy.cumsum(profile, axis=1)
+    numpy.add.at(profile, (rows, start + full), power * remainder)
+    return profile[:, :timeintervals]
+
+
 class Device:
     def __init__(self, consumption = 0):
         self.generate(consumption)
@@ -34,10 +180,21 @@ class Device:
 
 
 class TimeShiftableDevice(Device):
-    def __init__(self, consumption = 0):
+    def __init__(self, consumption = 0, profile = None):
         self.generate(consumption)
         self.StartTimes = []
         self.EndTimes = []
+        if profile is not None:
+            self.ProfileId = profile
+
+    # Power profile of a single run out of the registry, see deviceProfile()
+    @property
+    def Profile(self):
+        return deviceProfile(self.ProfileId).power
+
+    @property
+    def LongProfile(self):
+        return deviceProfile(self.ProfileId).longProfile
 
     def generate(self, consumption = 0):
         self.State = 0
@@ -66,480 +223,565 @@ class DeviceFridge(Device):
         self.Consumption = consumption
         self.State = 0
 
-        self.RuntimeCycle = self.Runtime
-        self.OfftimeCycle = self.Offtime
-        self.CycleProgress = random.randint(0,self.Runtime+self.Offtime)
+        self.CycleProgress = rng.randint(0,self.Runtime+self.Offtime)
         if(self.CycleProgress < (self.Runtime+self.Offtime)):
             self.State = 1
 
     def __init__(self, consumption):
         self.generate(consumption)
 
+    def cycles(self, timeintervals):
+        # Compact description of the profile that simulate() will generate from the current state: the fridge is on
+        # during the first initialOn minutes and runs its regular cycle from minute restart onwards (-1 if never)
+        period = self.Runtime + self.Offtime
+        if self.CycleProgress >= period:
+            return {'power': self.Consumption, 'runtime': self.Runtime, 'offtime': self.Offtime,
+                    'initialOn': timeintervals * self.State, 'restart': -1}
+        restart = period - self.CycleProgress - 1
+        initialOn = restart * self.State
+        if self.CycleProgress < self.Runtime:
+            initialOn = min(initialOn, self.Runtime - self.CycleProgress - 1)
+        return {'power': self.Consumption, 'runtime': self.Runtime, 'offtime': self.Offtime,
+                'initialOn': min(initialOn, timeintervals), 'restart': restart if restart < timeintervals else -1}
+
     def simulate(self, config: configLoader.Config, timeintervals):
-        DeviceProfile = [0] * timeintervals
-        for t in range(0, timeintervals):
-            #simulate this thing
-            self.CycleProgress = self.CycleProgress + 1
-            if self.CycleProgress == (self.Runtime+self.Offtime):
-                self.State = 1
-                self.RuntimeCycle = random.randint(self.Runtime-2, self.Runtime+2)
-                self.OfftimeCycle = random.randint(self.Runtime-2, self.Runtime+2)
-                self.CycleProgress = 0
-            elif(self.CycleProgress == self.Runtime):
-                #Turn it Off
-                self.State = 0
-            DeviceProfile[t] = self.State * self.Consumption
-        return DeviceProfile
+        # The fridge follows a fixed cycle of Runtime minutes on and Offtime minutes off, so the profile for the whole
+        # horizon is generated at once. The cycle restarts (switched on) each time CycleProgress reaches the period.
+        period = self.Runtime + self.Offtime
+        t = numpy.arange(1, timeintervals+1)
+        progress = self.CycleProgress + t
+        if self.CycleProgress >= period:
+            # The cycle has been skipped and never restarts
+            State = numpy.full(timeintervals, self.State)
+            self.CycleProgress = self.CycleProgress + timeintervals
+        else:
+            # Before the first restart the fridge only switches off when reaching Runtime
+            restart = period - self.CycleProgress
+            State = numpy.where((self.CycleProgress < self.Runtime) & (progress >= self.Runtime), 0, self.State)
+            phase = (t - restart) % period
+            State = numpy.where(t >= restart, phase < self.Runtime, State).astype(int)
+            if timeintervals >= restart:
+                self.CycleProgress = int(phase[-1])
+            else:
+                self.CycleProgress = int(progress[-1])
+        self.State = int(State[-1]) if timeintervals > 0 else self.State
+        return State * self.Consumption
 
 
 
 class DeviceKettle(Device):
-    def simulate(self, config, timeintervals, occupancy):
-        DeviceProfile = [0] * timeintervals
+    def events(self, config, occupancy):
+        events = []
 
         m = 0
         while occupancy[m] == 0:
             m += 1
-        m = m + random.randint(10,20)
-        if(random.randint(1,10)<7):
-            for i in range(m, m+occupancy[m]):
-                DeviceProfile[i] = self.Consumption
+        m = m + rng.randint(10,20)
+        if(rng.randint(1,10)<7):
+            events.append(DeviceEvent(m, occupancy[m], self.Consumption))
 
         #12:00
-        m = random.randint(12*60, 14*60)
-        if occupancy[m] > 0 and (random.randint(1,10)<7):
-            for i in range(m, m+occupancy[m]):
-                DeviceProfile[i] = self.Consumption
+        m = rng.randint(12*60, 14*60)
+        if occupancy[m] > 0 and (rng.randint(1,10)<7):
+            events.append(DeviceEvent(m, occupancy[m], self.Consumption))
 
         #afternoon
-        m = random.randint(14*60, 17*60)
-        if occupancy[m] > 0 and (random.randint(1,10)<7):
-            for i in range(m, m+occupancy[m]):
-                DeviceProfile[i] = self.Consumption
+        m = rng.randint(14*60, 17*60)
+        if occupancy[m] > 0 and (rng.randint(1,10)<7):
+            events.append(DeviceEvent(m, occupancy[m], self.Consumption))
 
         #evening
-        m = random.randint(20*60, 21*60)
-        if occupancy[m] > 0 and (random.randint(1,10)<7):
-            for i in range(m, m+occupancy[m]):
-                DeviceProfile[i] = self.Consumption
+        m = rng.randint(20*60, 21*60)
+        if occupancy[m] > 0 and (rng.randint(1,10)<7):
+            events.append(DeviceEvent(m, occupancy[m], self.Consumption))
+
+        # There is only one kettle, so overlapping uses are merged
+        merged = []
+        for event in sorted(events):
+            if len(merged) > 0 and event.start < merged[-1].start + merged[-1].duration:
+                end = max(merged[-1].start + merged[-1].duration, event.start + event.duration)
+                merged[-1] = merged[-1]._replace(duration=end - merged[-1].start)
+            else:
+                merged.append(event)
+        return merged
 
-        return DeviceProfile
+    def simulate(self, config, timeintervals, occupancy):
+        return renderEvents(self.events(config, occupancy), timeintervals).tolist()
 
 
 class DeviceLighting(Device):
-    def simulate(self, config: configLoader.Config, timeintervals, occupancy, timestamp):
-        sun = config.location.sun(date=datetime.date.fromtimestamp(timestamp), local=True)
-        LightingOnProfile = [1] * 1440
-        LightingProfile = [0] * 1440
-        for m in range((sun['sunrise'].hour*60+sun['sunrise'].minute)+random.randint(-10,40), \
-                       (sun['sunset'].hour*60+sun['sunset'].minute)-random.randint(-10,40)):					# Lighting quite well does match sunrise and sunset. Cloud data can enhance this. based on own experiences :)
-            LightingOnProfile[m] = 0
-
-        for m in range(0, 1440):
-            if (occupancy[m] == 0 or LightingOnProfile[m] == 0):
-                LightingProfile[m] = 0
-            else:
-                LightingProfile[m] = LightingOnProfile[m] + ((occupancy[m] - 1)*0.2)
-        return LightingProfile
+    # Lighting is on when people are home, except between sunrise and sunset. Simulated for all days at once.
+    def simulate(self, config: configLoader.Config, startday, timeintervals, occupancy):
+        numDays = int(timeintervals / 1440)
+        occupancy = numpy.asarray(occupancy).reshape(numDays, 1440)
+
+        sunrise, sunset = sunTimes(locationKey(config.location), startday, numDays)
+
+        # Lighting quite well does match sunrise and sunset. Cloud data can enhance this. based on own experiences :)
+        offsets = profilegentools.numpyGenerator().integers(-10, 40, size=(numDays, 2), endpoint=True)
+        minutes = numpy.arange(1440)
+        daylight = (minutes >= sunrise + offsets[:, [0]]) & (minutes < sunset - offsets[:, [1]])
+
+        LightingProfile = numpy.where(daylight | (occupancy == 0), 0.0, 1 + ((occupancy - 1)*0.2))
+        return LightingProfile.ravel()
 
 
 class DeviceElectronics(Device):
+    # Electronics are switched on when a person arrives and stay on until this person leaves. Simulated for all days
+    # at once, where each day starts with everything switched off.
     def simulate(self, config: configLoader.Config, timeintervals, occupancy, occupancyPerson):
-        ElectronicsProfile = [0] * 1440
+        numDays = int(timeintervals / 1440)
+        occupancy = numpy.asarray(occupancy).reshape(numDays, 1440)
+        generator = profilegentools.numpyGenerator()
+        minutes = numpy.arange(1440)
+
+        ElectronicsProfile = numpy.zeros((numDays, 1440))
         for p in range(0, len(occupancyPerson)):
-            consuming = 0
-            for m in range(1,1440):
-                if(occupancyPerson[p][m] == 1 and occupancyPerson[p][m-1] == 0):
-                    #Person is activated, do something with it
-                    #treat the morning differently:
-                    if m < 13*60:
-                        if(random.random() < 0.8-(0.2*(occupancy[m]-1))):
-                            consuming = (random.randint(7,10) / 10)
-                            ElectronicsProfile[m] = ElectronicsProfile[m] + consuming
-                    else:
-                        if(random.random() < 0.8-(0.125*(occupancy[m]-1))):
-                            consuming = (random.randint(8,12) / 10)
-                            ElectronicsProfile[m] = ElectronicsProfile[m] + consuming
-                elif(occupancyPerson[p][m] == 0 and occupancyPerson[p][m-1] == 1 and consuming > 0):
-                    consuming = 0
-                ElectronicsProfile[m] = ElectronicsProfile[m] + consuming
-
-        return ElectronicsProfile
+            person = numpy.asarray(occupancyPerson[p]).reshape(numDays, 1440)
+            transitions = numpy.diff(person, axis=1)
+
+            # Person is activated, do something with it
+            # treat the morning differently:
+            day, m = numpy.nonzero(transitions == 1)
+            m = m + 1
+            morning = m < 13*60
+            chance = numpy.where(morning, 0.8-(0.2*(occupancy[day, m]-1)), 0.8-(0.125*(occupancy[day, m]-1)))
+            level = numpy.where(morning, generator.integers(7, 10, size=len(m), endpoint=True), generator.integers(8, 12, size=len(m), endpoint=True)) / 10
+            consuming = numpy.where(generator.random(len(m)) < chance, level, 0.0)
+
+            # Forward fill the consumption from each arrival until the next departure
+            values = numpy.zeros((numDays, 1440))
+            events = numpy.zeros((numDays, 1440), dtype=bool)
+            events[:, 0] = True
+            events[day, m] = True
+            values[day, m] = consuming
+            departureDay, departure = numpy.nonzero(transitions == -1)
+            events[departureDay, departure + 1] = True
+
+            last = numpy.maximum.accumulate(numpy.where(events, minutes, 0), axis=1)
+            ElectronicsProfile += numpy.take_along_axis(values, last, axis=1)
+
+            # The arrival itself is counted twice
+            ElectronicsProfile[day, m] += consuming
+
+        return ElectronicsProfile.ravel()
 
 
 class DeviceCooking(Device):
-    def simulate(self, config: configLoader.Config, timeintervals, occupancy, persons, startCooking, cookingDuration, hasInductionCooking, ventilation):
-        CookingProfile = [0] * 1440
-        cookingDuration = random.randint(20,40)
+    # Returns the cooking events and the events of the additional airflow of the cooker hood
+    def events(self, config: configLoader.Config, occupancy, persons, startCooking, cookingDuration, hasInductionCooking, ventilation):
+        events = []
+        ventilationEvents = []
+        cookingDuration = rng.randint(20,40)
 
 
         #Now see what well cook: Microwave, Oven or Stove (or Stove and Oven). Lets considder that the fryer will use approx the same amount of energy
         #Depends on the size of the family, a math.single person household will faster opt for the microwave ;-)
-        CookingType = random.randint(0,10)
+        CookingType = rng.randint(0,10)
         if CookingType == 10:
-            cookingDuration = random.randint(25,40)
-            randomCycle = random.randint(4,8)
-            for m in range(startCooking, startCooking+cookingDuration):
-                if m < 10+startCooking:
-                    CookingProfile[m] += config.ConsumptionOven
-                elif m%(randomCycle*2) < randomCycle:
-                    CookingProfile[m] += config.ConsumptionOven
-
-            cookingDuration = random.randint(35,45)
-            for m in range(startCooking, startCooking+cookingDuration):
-                ventilation.VentilationProfile[m] += ventilation.CookingAirFlow
-                ventilation.VentilationProfile[m] = min(ventilation.VentilationProfile[m], ventilation.MaxAirflow)
+            cookingDuration = rng.randint(25,40)
+            randomCycle = rng.randint(4,8)
+            events.append(DeviceEvent(startCooking, cookingDuration, config.ConsumptionOven, PATTERN_CYCLE, 10, randomCycle))
+
+            cookingDuration = rng.randint(35,45)
+            ventilationEvents.append(DeviceEvent(startCooking, cookingDuration, ventilation.CookingAirFlow))
             # CookingProfile[m] += config.ConsumptionStoveVentilation
 
             if(hasInductionCooking):
-                inductionRatio = random.randint(3,6)
-                for m in range(startCooking, startCooking+cookingDuration):
-                    if m < 6+startCooking:
-                        CookingProfile[m] += config.ConsumptionInductionStove
-                    else:
-                        CookingProfile[m] += round(config.ConsumptionInductionStove*(inductionRatio/10))
+                inductionRatio = rng.randint(3,6)
+                events.append(DeviceEvent(startCooking, cookingDuration, config.ConsumptionInductionStove, PATTERN_TWO_LEVEL, 6, round(config.ConsumptionInductionStove*(inductionRatio/10))))
 
         elif CookingType == 9:
             #Oven
-            randomCycle = random.randint(4,8)
-            cookingDuration = random.randint(25,40)
-            for m in range(startCooking, startCooking+cookingDuration):
-                if m < 10+startCooking:
-                    CookingProfile[m] += config.ConsumptionOven
-                elif m%(randomCycle*2) < randomCycle:
-                    CookingProfile[m] += config.ConsumptionOven
-
-            if random.random()<0.2:
-                cookingDuration = random.randint(4,6)
-                randomOffset = random.randint(5,15)
-                for m in range(startCooking+randomOffset, startCooking+cookingDuration):
-                    CookingProfile[m] += config.ConsumptionMicroWave
+            randomCycle = rng.randint(4,8)
+            cookingDuration = rng.randint(25,40)
+            events.append(DeviceEvent(startCooking, cookingDuration, config.ConsumptionOven, PATTERN_CYCLE, 10, randomCycle))
+
+            if rng.random()<0.2:
+                cookingDuration = rng.randint(4,6)
+                randomOffset = rng.randint(5,15)
+                events.append(DeviceEvent(startCooking+randomOffset, cookingDuration-randomOffset, config.ConsumptionMicroWave))
 
         elif((CookingType == 8) or (len(persons) == 2 and CookingType > 6) or (len(persons) == 1 and CookingType > 5)):
             #Microwave
-            cookingDuration = random.randint(4,6)
-            for m in range(startCooking, startCooking+cookingDuration):
-                CookingProfile[m] += config.ConsumptionMicroWave
+            cookingDuration = rng.randint(4,6)
+            events.append(DeviceEvent(startCooking, cookingDuration, config.ConsumptionMicroWave))
 
         else:
             #Stove
-            cookingDuration = random.randint(35,45)
-            for m in range(startCooking, startCooking+cookingDuration):
-                ventilation.VentilationProfile[m] += ventilation.CookingAirFlow
-                ventilation.VentilationProfile[m] = min(ventilation.VentilationProfile[m], ventilation.MaxAirflow)
+            cookingDuration = rng.randint(35,45)
+            ventilationEvents.append(DeviceEvent(startCooking, cookingDuration, ventilation.CookingAirFlow))
             # CookingProfile[m] += config.ConsumptionStoveVentilation
 
-            if random.random()<0.3:
-                cookingDuration = random.randint(4,6)
-                randomOffset = random.randint(5,15)
-                for m in range(startCooking+randomOffset, startCooking+cookingDuration):
-                    CookingProfile[m] += config.ConsumptionMicroWave
+            if rng.random()<0.3:
+                cookingDuration = rng.randint(4,6)
+                randomOffset = rng.randint(5,15)
+                events.append(DeviceEvent(startCooking+randomOffset, cookingDuration-randomOffset, config.ConsumptionMicroWave))
 
             if(hasInductionCooking):
-                inductionRatio = random.randint(3,6)
+                inductionRatio = rng.randint(3,6)
+                events.append(DeviceEvent(startCooking, cookingDuration, config.ConsumptionInductionStove, PATTERN_TWO_LEVEL, 6, round(config.ConsumptionInductionStove*(inductionRatio/10))))
 
-                for m in range(startCooking, startCooking+cookingDuration):
-                    if m < 6+startCooking:
-                        CookingProfile[m] += config.ConsumptionInductionStove
-                    else:
-                        CookingProfile[m] += round(config.ConsumptionInductionStove*(inductionRatio/10))
+            if rng.random() < 0.2:
+                inductionRatio = rng.randint(3,6)
+                randomOffset = rng.randint(6,12)
+                events.append(DeviceEvent(startCooking+randomOffset, cookingDuration-randomOffset, config.ConsumptionInductionStove, PATTERN_TWO_LEVEL, 18-randomOffset, round(config.ConsumptionInductionStove*(inductionRatio/10))))
 
-            if random.random() < 0.2:
-                inductionRatio = random.randint(3,6)
-                for m in range(startCooking+random.randint(6,12), startCooking+cookingDuration):
-                    if m < 18+startCooking:
-                        CookingProfile[m] += config.ConsumptionInductionStove
-                    else:
-                        CookingProfile[m] += round(config.ConsumptionInductionStove*(inductionRatio/10))
+        return events, ventilationEvents
 
-        return CookingProfile
+    def simulate(self, config: configLoader.Config, timeintervals, occupancy, persons, startCooking, cookingDuration, hasInductionCooking, ventilation):
+        events, ventilationEvents = self.events(config, occupancy, persons, startCooking, cookingDuration, hasInductionCooking, ventilation)
+        ventilation.boost(renderEvents(ventilationEvents, len(ventilation.VentilationProfile)))
+        return renderEvents(events, 1440).tolist()
 
 
 class DeviceVentilation(Device):
     # Determine the power consumption of the ventilationsystem baased on the requested air ventilation. NOTE using pointers here
     def simulate(self, config: configLoader.Config, timeintervals, ventilation):
-        VentilationProfile = []
-        for i in range(0, len(ventilation.VentilationProfile)):
-            VentilationProfile.append(int((ventilation.VentilationProfile[i]/ventilation.MaxAirflow) * self.Consumption))
-
-        return VentilationProfile
+        VentilationProfile = (numpy.asarray(ventilation.VentilationProfile) / ventilation.MaxAirflow) * self.Consumption
+        return VentilationProfile.astype(int).tolist()
 
 
 class DeviceIroning(Device):
-    def simulate(self, config: configLoader.Config, timeintervals, occupancy, numPersons):
-        IroningProfile = [0] * 1440
-        ironingDuration = random.randint(10,15) + numPersons*7
+    def events(self, config: configLoader.Config, occupancy, numPersons):
+        ironingDuration = rng.randint(10,15) + numPersons*7
         startIroning = 0
         count = 0
         while occupancy[startIroning] == 0 and count != 50:
             count += 1
             if(occupancy[16*60] > 0):
-                startIroning = random.randint(10*60, 17*60)
+                startIroning = rng.randint(10*60, 17*60)
             else:
-                startIroning = random.randint(20*60, 22*60)
+                startIroning = rng.randint(20*60, 22*60)
         if count != 50:
-            for m in range(startIroning, startIroning+ironingDuration):
-                if m < 6+startIroning:
-                    IroningProfile[m] += self.Consumption
-                elif m%4 < 2:
-                    IroningProfile[m] += self.Consumption
-        return IroningProfile
+            return [DeviceEvent(startIroning, ironingDuration, self.Consumption, PATTERN_CYCLE, 6, 2)]
+        return []
+
+    def simulate(self, config: configLoader.Config, timeintervals, occupancy, numPersons):
+        return renderEvents(self.events(config, occupancy, numPersons), 1440).tolist()
 
 
 class DeviceVacuumcleaner(Device):
-    def simulate(self, config: configLoader.Config, timeintervals, occupancy, numPersons):
-        VacuumProfile = [0] * 1440
-        vacuumDuration = random.randint(12,20) + numPersons*2
+    def events(self, config: configLoader.Config, occupancy, numPersons):
+        vacuumDuration = rng.randint(12,20) + numPersons*2
         startVacuum = 0
         count = 0
         while occupancy[startVacuum] == 0 and count != 50:
             count += 1
             if(occupancy[16*60] > 0):
-                startVacuum = random.randint(10*60, 17*60)
+                startVacuum = rng.randint(10*60, 17*60)
             else:
-                startVacuum = random.randint(20*60, 22*60)
+                startVacuum = rng.randint(20*60, 22*60)
         if count != 50:
-            for m in range(startVacuum, startVacuum+vacuumDuration):
-                VacuumProfile[m] += self.Consumption
-        return VacuumProfile
+            return [DeviceEvent(startVacuum, vacuumDuration, self.Consumption)]
+        return []
+
+    def simulate(self, config: configLoader.Config, timeintervals, occupancy, numPersons):
+        return renderEvents(self.events(config, occupancy, numPersons), 1440).tolist()
+
+
+# Solar positions per location and model time, equal for all houses
+solarPositions = {}
+
+
+def locationKey(location):
+    return (location.latitude, location.longitude, location.timezone, location.elevation, location.solar_depression)
+
+
+def locationFromKey(key):
+    location = Location()
+    location.latitude, location.longitude, location.timezone, location.elevation, location.solar_depression = key
+    return location
+
+
+def solarPosition(location, modeltime):
+    key = (locationKey(location), modeltime)
+    if key not in solarPositions:
+        d = datetime.datetime.utcfromtimestamp(1388534400 + modeltime)
+        solarPositions[key] = (location.solar_elevation(d), location.solar_azimuth(d), location.solar_zenith(d))
+    return solarPositions[key]
+
+
+class SkyIrradiance(NamedTuple):
+    # Per interval of the weather data: the position of the sun (degrees) and the global horizontal, diffuse horizontal
+    # and direct normal irradiance (W/m2). interval gives the interval of each minute of the horizon.
+    elevation: numpy.ndarray
+    azimuth: numpy.ndarray
+    zenith: numpy.ndarray
+    GHI: numpy.ndarray
+    DHI: numpy.ndarray
+    DNI: numpy.ndarray
+    interval: numpy.ndarray
+
+
+@functools.lru_cache(maxsize=None)
+def skyIrradiance(weather_irradiation, weather_timebaseDataset, location, startday, timeintervals):
+    # The irradiance that does not depend on the orientation of the panels, as read-only arrays shared by all houses of a
+    # horizon. The location is given by its locationKey(), such that the cache does not depend on the identity of the
+    # location object.
+    location = locationFromKey(location)
+    start = startday*24*60*60
+    times = start + 60*numpy.arange(timeintervals, dtype=numpy.int64)
+    intervals = times // weather_timebaseDataset
+    sky = {name: [] for name in SkyIrradiance._fields if name != 'interval'}
+
+    for interval in range(int(intervals[0]), int(intervals[-1]) + 1):
+        modeltime = int(interval*weather_timebaseDataset + int(weather_timebaseDataset / 2))
+
+        elevation, azimuth, zenith = solarPosition(location, modeltime)
+
+        index = int(math.floor(modeltime/weather_timebaseDataset))
+        index = max(index, 0)
+        try:
+            irradiation = float(linecache.getline(weather_irradiation, index+1))
+        except:
+            raise configLoader.ConfigError("An error occurred reading the solar irradiation file. Make sure that the file is correct (e.g. only contains numbers), is long enough (make sure that it has a bit more data than the actual simulation. And, make sure that the file exists!")
+
+        GHI = ( irradiation * 10000 ) / float(weather_timebaseDataset)
+
+        # Calculate diffused light
+
+        # Adapted from:
+        # https://github.com/jgoizueta/solar/blob/master/lib/solar/radiation.rb
+        Gmax = 1367 * math.sin(math.radians(elevation))
+
+        # Determine the clearness index
+        clearnessIndex = 0.0
+        if Gmax > 0.0:
+            clearnessIndex = GHI / Gmax
+
+        # Calculate the diffuse fraction
+        # Depends on clearness index and elevation
+        # Calculated using this method:
+        # 1982 Erbs, Klein, Duffie
+        diffuseFraction = 0.165
+        if clearnessIndex <= 0.0001:
+            diffuseFraction = 0.0
+        elif clearnessIndex <= 0.22:
+            diffuseFraction = (1.0-0.09*clearnessIndex)
+        elif clearnessIndex<= 0.8:
+            diffuseFraction = ( 0.9511-0.1604*clearnessIndex + \
+                                4.388 * math.pow(clearnessIndex, 2) - \
+                                16.638 * math.pow(clearnessIndex, 3) + \
+                                12.336 * (math.pow(clearnessIndex, 4)) )
+
+        # irradiance based on this fraction
+        DHI =  diffuseFraction * GHI # Diffuse Horizontal Irradiance
+
+        # Beam radiation
+        irradiationBeam = GHI - DHI
+
+        # And now calculate DNI based on the elevation of the sun
+        # Using this relation:	GHI = DHI + DNI*cos(solar zenith)
+        if elevation > 1 and math.sin(math.radians(elevation)) > 0.25:
+            DNI = min(1367.0, ( irradiationBeam * 1 / math.sin(math.radians(elevation)) ) )
+        # Avoid gigantic overshoots using the minimum here.
+        elif elevation > 0 and math.sin(math.radians(elevation)) <= 0.2:
+            # Avoiding weir corner case behaviour
+            DNI = min(2*irradiationBeam, ( irradiationBeam * 1 / math.sin(math.radians(elevation)) ) )
+        else:
+            DNI = 0.0
+
+        for name, value in (('elevation', elevation), ('azimuth', azimuth), ('zenith', zenith), ('GHI', GHI),
+                            ('DHI', DHI), ('DNI', DNI)):
+            sky[name].append(value)
+
+    sky = {name: numpy.array(values, dtype=float) for name, values in sky.items()}
+    sky['interval'] = intervals - intervals[0]
+    for values in sky.values():
+        values.setflags(write=False)
+    return SkyIrradiance(**sky)
+
+
+@functools.lru_cache(maxsize=None)
+def sunTimes(location, startday, numDays):
+    # Sunrise and sunset (minutes since midnight, local time) of each day as read-only arrays of (numDays, 1), shared by
+    # all houses. The location is given by its locationKey().
+    location = locationFromKey(location)
+    sunrise = numpy.zeros((numDays, 1))
+    sunset = numpy.zeros((numDays, 1))
+    for d in range(0, numDays):
+        sun = location.sun(date=datetime.date.fromtimestamp(1388534400+(3600*24*(startday+d))), local=True)
+        sunrise[d] = sun['sunrise'].hour*60+sun['sunrise'].minute
+        sunset[d] = sun['sunset'].hour*60+sun['sunset'].minute
+    sunrise.setflags(write=False)
+    sunset.setflags(write=False)
+    return sunrise, sunset
 
 
 class DeviceSolarPanel(Device):
     def simulate(self, config: configLoader.Config, startday, timeintervals, pvArea, pvEfficiency, pvAzimuth, pvElevation):
-        pvProfile = []
-
-        time = startday*24*60*60
-        while(time < (startday*24*60*60)+timeintervals*60):
-            modeltime = int(time - (time % config.weather_timebaseDataset) + int(config.weather_timebaseDataset / 2))
-
-            d = datetime.datetime.utcfromtimestamp(1388534400 + modeltime)
-            elevation = config.location.solar_elevation(d)
-            azimuth = config.location.solar_azimuth(d)
-            zenith = config.location.solar_zenith(d)
-
-            index = int(math.floor(modeltime/config.weather_timebaseDataset))
-            index = max(index, 0)
-            try:
-                irradiation = float(linecache.getline(config.weather_irradiation, index+1))
-            except:
-                print("An error occurred reading the solar irradiation file. Make sure that the file is correct (e.g. only contains numbers), is long enough (make sure that it has a bit more data than the actual simulation. And, make sure that the file exists!")
-                exit()
-
-            GHI = ( irradiation * 10000 ) / float(config.weather_timebaseDataset)
-
-            # Calculate diffused light
-
-            # Adapted from:
-            # https://github.com/jgoizueta/solar/blob/master/lib/solar/radiation.rb
-            Gmax = 1367 * math.sin(math.radians(elevation))
-
-            # Determine the clearness index
-            clearnessIndex = 0.0
-            if Gmax > 0.0:
-                clearnessIndex = GHI / Gmax
-
-            # Calculate the diffuse fraction
-            # Depends on clearness index and elevation
-            # Calculated using this method:
-            # 1982 Erbs, Klein, Duffie
-            diffuseFraction = 0.165
-            if clearnessIndex <= 0.0001:
-                diffuseFraction = 0.0
-            elif clearnessIndex <= 0.22:
-                diffuseFraction = (1.0-0.09*clearnessIndex)
-            elif clearnessIndex<= 0.8:
-                diffuseFraction = ( 0.9511-0.1604*clearnessIndex + \
-                                    4.388 * math.pow(clearnessIndex, 2) - \
-                                    16.638 * math.pow(clearnessIndex, 3) + \
-                                    12.336 * (math.pow(clearnessIndex, 4)) )
-
-            # irradiance based on this fraction
-            DHI =  diffuseFraction * GHI # Diffuse Horizontal Irradiance
-
-            # Beam radiation
-            irradiationBeam = GHI - DHI
-
-            # And now calculate DNI based on the elevation of the sun
-            # Using this relation:	GHI = DHI + DNI*cos(solar zenith)
-            if elevation > 1 and math.sin(math.radians(elevation)) > 0.25:
-                DNI = min(1367.0, ( irradiationBeam * 1 / math.sin(math.radians(elevation)) ) )
-            # Avoid gigantic overshoots using the minimum here.
-            elif elevation > 0 and math.sin(math.radians(elevation)) <= 0.2:
-                # Avoiding weir corner case behaviour
-                DNI = min(2*irradiationBeam, ( irradiationBeam * 1 / math.sin(math.radians(elevation)) ) )
-            else:
-                DNI = 0.0
-
-            # Now calculate the energy falling on a plane
-            # Based on the research by Marius Groen at Liandon
-            # Improvement of the Liandon EC Cablepooling Model (Public Version)
-            # Marius Groen
-
-            if GHI < 0.001 or elevation <= 1:
-                pvProfile.append(0)	# No power (significant) irradiation, avoid division by 0.
-            else:
-                # Calculate Incidence Angle (2.3) (theta_i)
-                planeIncidence = math.degrees( math.acos( \
-                    math.cos(math.radians(zenith)) * math.cos(math.radians(pvElevation)) + \
-                    ( math.sin(math.radians(zenith)) * math.sin(math.radians(pvElevation)) * \
-                      math.cos(math.radians(azimuth - pvAzimuth))	) \
-                    ) )
-
-                # Calculate Gdir (2.2)
-                Gdir = DNI * math.cos(math.radians(planeIncidence))
-
-                # Calculate the diffuse irradiance (Gdfs)
-                # First (2.5)
-                factorF = 1 - math.pow( (DHI / GHI) , 2)
-
-                # Now (2.4)
-                Gdfs = DHI * 	( \
-                            ( ( 1 + math.cos(math.radians(pvElevation))) / 2.0 ) * \
-                            ( 1 + factorF * math.pow(math.sin(math.radians(pvElevation / 2.0)), 3) ) * \
-                            ( 1 + factorF * math.pow(math.cos(math.radians(planeIncidence)), 2) * math.pow(math.sin(math.radians(zenith)), 3) ) \
-                    )
-
-                # Ground reflected Irradiance Gref ( 2.6)
-                Gref = GHI * 0.2 * ( (1 - math.cos(math.radians(pvElevation))) / 2.0 )
-
-                # Now according to 2.1 we can add these and return out results
-                total = max(0.0, Gdir + Gdfs + Gref)
-
-                pvProfile.append(-1 * total * (pvEfficiency/100.0) * pvArea)
-            # Increment time
-            time = time + 60
-
-        return pvProfile
+        # The irradiance on the plane is constant within an interval of the weather data, so it is calculated per interval
+        # and then spread over the minutes
+        sky = skyIrradiance(config.weather_irradiation, config.weather_timebaseDataset, locationKey(config.location), startday, int(timeintervals))
+        power = [0 if total is None else -1 * total * (pvEfficiency/100.0) * pvArea for total in planeIrradiance(sky, pvAzimuth, pvElevation)]
+        return numpy.array(power, dtype=object)[sky.interval].tolist()
+
+
+def planeIrradiance(sky, pvAzimuth, pvElevation):
+    # Irradiance (W/m2) on a plane for each interval of the SkyIrradiance, None when there is no significant irradiation
+    pvProfile = []
+
+    for elevation, azimuth, zenith, GHI, DHI, DNI in zip(sky.elevation.tolist(), sky.azimuth.tolist(), sky.zenith.tolist(),
+                                                          sky.GHI.tolist(), sky.DHI.tolist(), sky.DNI.tolist()):
+        # Now calculate the energy falling on a plane
+        # Based on the research by Marius Groen at Liandon
+        # Improvement of the Liandon EC Cablepooling Model (Public Version)
+        # Marius Groen
+
+        if GHI < 0.001 or elevation <= 1:
+            pvProfile.append(None)	# No power (significant) irradiation, avoid division by 0.
+        else:
+            # Calculate Incidence Angle (2.3) (theta_i)
+            planeIncidence = math.degrees( math.acos( \
+                math.cos(math.radians(zenith)) * math.cos(math.radians(pvElevation)) + \
+                ( math.sin(math.radians(zenith)) * math.sin(math.radians(pvElevation)) * \
+                  math.cos(math.radians(azimuth - pvAzimuth))	) \
+                ) )
+
+            # Calculate Gdir (2.2)
+            Gdir = DNI * math.cos(math.radians(planeIncidence))
+
+            # Calculate the diffuse irradiance (Gdfs)
+            # First (2.5)
+            factorF = 1 - math.pow( (DHI / GHI) , 2)
+
+            # Now (2.4)
+            Gdfs = DHI * 	( \
+                        ( ( 1 + math.cos(math.radians(pvElevation))) / 2.0 ) * \
+                        ( 1 + factorF * math.pow(math.sin(math.radians(pvElevation / 2.0)), 3) ) * \
+                        ( 1 + factorF * math.pow(math.cos(math.radians(planeIncidence)), 2) * math.pow(math.sin(math.radians(zenith)), 3) ) \
+                )
+
+            # Ground reflected Irradiance Gref ( 2.6)
+            Gref = GHI * 0.2 * ( (1 - math.cos(math.radians(pvElevation))) / 2.0 )
+
+            # Now according to 2.1 we can add these and return out results
+            total = max(0.0, Gdir + Gdfs + Gref)
+
+            pvProfile.append(total)
+
+    return pvProfile
+
+
+def placeRuns(generator, days, occupancy, moments, fallback, deadlines, minimumDuration):
+    # Places the runs of a timeshiftable device for the whole horizon at once, at most one per day. days are the
+    # (absolute) days with a run, occupancy the adult occupancy of these days and moments the preferred start per day.
+    # A run starts within half an hour of its moment, or as soon as someone is home. A negative moment means there
+    # is no preferred moment on that day; the start is drawn from the fallback window if given. The deadline window is
+    # looked up from the band (see deadlines) of the start time, and runs shorter than the minimum duration are dropped.
+    n = len(days)
+    start = moments - 30 + generator.integers(0, 59, size=n, endpoint=True)
+    if fallback is not None:
+        start = numpy.where(moments < 0, generator.integers(fallback[0], fallback[1], size=n, endpoint=True), start)
+
+    # Nobody is home, use the next possible moment. Starts before midnight look at the end of the same day first.
+    waiting = occupancy[numpy.arange(n), start % 1440] < 1
+    if numpy.any(waiting):
+        minutes = numpy.arange(-60, 1440)
+        occupied = (numpy.concatenate((occupancy[waiting, -60:], occupancy[waiting]), axis=1) > 0) & (minutes >= start[waiting, None])
+        found = numpy.argmax(occupied, axis=1)
+        start[waiting] = numpy.where(occupied[numpy.arange(len(found)), found], minutes[found], start[waiting])
+
+    bands = numpy.array([band[0] for band in deadlines[:-1]], dtype=int)
+    earliest = numpy.array([band[1] for band in deadlines], dtype=int)
+    latest = numpy.array([band[2] for band in deadlines], dtype=int)
+    draw = generator.random(n)
+
+    def deadline(start):
+        band = numpy.searchsorted(bands, start, side='right')
+        return 1440*days + earliest[band] + (draw*(latest[band] - earliest[band] + 1)).astype(int)
+
+    startTimes = 1440*days + start
+    endTimes = deadline(start)
+
+    # A run that starts before the deadline of the previous one starts an hour after it. Only a kept run of the previous
+    # day ending the next morning can overlap, and such a shifted run always ends on its own day, so runs never
+    # shift in a chain and all overlaps are resolved at once.
+    kept = endTimes >= startTimes + minimumDuration
+    overlap = numpy.zeros(n, dtype=bool)
+    overlap[1:] = (days[1:] == days[:-1] + 1) & kept[:-1] & (endTimes[:-1] >= startTimes[1:])
+    previousEnd = numpy.roll(endTimes, 1)
+    start = numpy.where(overlap, (previousEnd % 1440) + 60, start)
+    startTimes = numpy.where(overlap, previousEnd + 60, startTimes)
+    endTimes = deadline(start)
+
+    #check for overlap on endTimes:
+    kept = endTimes >= startTimes + minimumDuration
+    return startTimes[kept], endTimes[kept]
 
 
 class DeviceWashingMachine(TimeShiftableDevice):
-    def simulate(self, config: configLoader.Config, timeintervals, day, occupancy, washingMoment):
-        washingtimeintervals = washingMoment-30 + random.randint(0,59)
-        if(washingMoment < 0):
-            washingMoment = random.randint(20*60,(22*60-1))
-        if((washingtimeintervals < (22*60)) or (occupancy[washingtimeintervals] < 1)):
-            for i in range(washingtimeintervals, 1440):
-                #Nobody is home, use the next possible moment
-                if occupancy[i] > 0:
-                    washingtimeintervals = i
-                    break
-
-        #Starttimeintervals:
-        if(len(self.EndTimes) > 0):
-            if((washingtimeintervals + 1440*(day)) > self.EndTimes[len(self.EndTimes)-1]):
-                self.StartTimes.append(washingtimeintervals + (1440*(day)))
-            else:
-                self.StartTimes.append(self.EndTimes[len(self.EndTimes)-1]+60)
-                washingtimeintervals = (self.EndTimes[len(self.EndTimes)-1]%1440)+60
-        else:
-            self.StartTimes.append(washingtimeintervals + (1440*(day)))
-
-        if washingtimeintervals < 4*60:
-            self.EndTimes.append(1440*(day) + random.randint(6.5*60,7.5*60))
-        elif washingtimeintervals < 11*60:
-            self.EndTimes.append(1440*(day) + random.randint(14*60,17*60))
-        elif washingtimeintervals < 17*60:
-            self.EndTimes.append(1440*(day) + random.randint(20*60,22*60))
-        elif washingtimeintervals < 20*60:
-            self.EndTimes.append(1440*(day) + random.randint(22*60,23*60))
-        else:
-            self.EndTimes.append(1440*(day+1) + random.randint(6.5*60,7.5*60))
-
-        #check for overlap on endTimes:
-        if self.EndTimes[len(self.EndTimes)-1] < self.StartTimes[len(self.StartTimes)-1] + 90:
-            self.EndTimes.pop()
-            self.StartTimes.pop()
+    # Deadline windows (minutes from the start of the day of the run) per band of start times: (band end, earliest, latest)
+    Deadlines = [(4*60, 6.5*60, 7.5*60), (11*60, 14*60, 17*60), (17*60, 20*60, 22*60), (20*60, 22*60, 23*60),
+                 (24*60, 1440+6.5*60, 1440+7.5*60)]
+
+    # Simulated for all days at once: days are the days on which a run can be planned with the adult occupancy of these
+    # days, washingDays the days of the week with laundry and washingMoment the preferred moment per day of the week
+    def simulate(self, config: configLoader.Config, days, occupancy, washingDays, washingMoment):
+        generator = profilegentools.numpyGenerator()
+        dayOfWeek = days % 7
+        runs = (numpy.isin(dayOfWeek, list(washingDays)) & (generator.random(len(days)) < 0.9)) | (generator.random(len(days)) < 0.1)
+        moments = numpy.asarray(washingMoment, dtype=int)[dayOfWeek[runs]]
+        startTimes, endTimes = placeRuns(generator, days[runs], occupancy[runs], moments, None, self.Deadlines, 90)
+        self.StartTimes = startTimes.tolist()
+        self.EndTimes = endTimes.tolist()
 
     def generate(self, consumption = 0):
-        self.LongProfile = 'complex(66.229735, 77.4311402954),complex(119.35574, 409.21968),complex(162.44595, 516.545199388),complex(154.744551, 510.671236335),complex(177.089979, 584.413201848),complex(150.90621, 479.851164854),complex(170.08704, 540.84231703),complex(134.23536, 460.23552),complex(331.837935, 783.490514121),complex(2013.922272, 587.393996),complex(2032.267584, 592.744712),complex(2004.263808, 584.576944),complex(2023.32672, 590.13696),complex(2041.49376, 595.43568),complex(2012.8128, 587.0704),complex(2040.140352, 595.040936),complex(1998.124032, 582.786176),complex(2023.459776, 590.175768),complex(1995.309312, 581.965216),complex(2028.096576, 591.528168),complex(1996.161024, 582.213632),complex(552.525687, 931.898925115),complex(147.718924, 487.486021715),complex(137.541888, 490.4949133),complex(155.996288, 534.844416),complex(130.246299, 464.477753392),complex(168.173568, 497.908089133),complex(106.77933, 380.79103735),complex(94.445568, 323.813376),complex(130.56572, 317.819806804),complex(121.9515, 211.226194059),complex(161.905679, 360.175184866),complex(176.990625, 584.085324519),complex(146.33332, 501.71424),complex(173.06086, 593.35152),complex(145.07046, 517.342925379),complex(188.764668, 522.114985698),complex(88.4058, 342.394191108),complex(117.010432, 346.43042482),complex(173.787341, 326.374998375),complex(135.315969, 185.177207573),complex(164.55528, 413.181298415),complex(150.382568, 515.597376),complex(151.517898, 540.335452156),complex(154.275128, 509.122097304),complex(142.072704, 506.652479794),complex(171.58086, 490.815333752),complex(99.13293, 368.167736052),complex(94.5507, 366.193286472),complex(106.020684, 378.085592416),complex(194.79336, 356.012659157),complex(239.327564, 302.865870739),complex(152.75808, 209.046388964),complex(218.58576, 486.26562702),complex(207.109793, 683.481346289),complex(169.5456, 581.2992),complex(215.87571, 712.409677807),complex(186.858018, 573.073382584),complex(199.81808, 534.79864699),complex(108.676568, 403.611655607),complex(99.930348, 356.366544701),complex(151.759998, 358.315027653),complex(286.652289, 300.697988258),complex(292.921008, 266.244164873),complex(300.5829, 265.089200586),complex(296.20425, 261.22759426),complex(195.74251, 216.883021899),complex(100.34136, 260.038063655),complex(312.36975, 275.4842252),complex(287.90921, 261.688800332),complex(85.442292, 140.349851956),complex(44.8647, 109.208529515)'
+        self.ProfileId = 'input/devices/washingmachine'
         self.name = "WashingMachine"
 
 
 class DeviceDishwasher(TimeShiftableDevice):
-    def simulate(self, config: configLoader.Config, timeintervals, day, occupancy, washingMoment):
-        dishwashtimeintervals = washingMoment-30 + random.randint(0,59)
-        if(washingMoment < 0):
-            dishwashtimeintervals = random.randint(20*60,23*60)
-        if((dishwashtimeintervals < (22*60)) or (occupancy[dishwashtimeintervals] < 1)):
-            for i in range(dishwashtimeintervals, 1440):
-                #Nobody is home, use the next possible moment
-                if occupancy[i] > 0:
-                    dishwashtimeintervals = i
-                    break
-
-        #Starttimeintervals:
-        if(len(self.EndTimes) > 0):
-            if((dishwashtimeintervals + (1440*(day))) > self.EndTimes[len(self.EndTimes)-1]):
-                self.StartTimes.append(dishwashtimeintervals + (1440*(day)))
-            else:
-                self.StartTimes.append(self.EndTimes[len(self.EndTimes)-1]+60)
-                dishwashtimeintervals = (self.EndTimes[len(self.EndTimes)-1]%1440)+60
-        else:
-            self.StartTimes.append(dishwashtimeintervals + (1440*(day)))
-
-        if dishwashtimeintervals < 4*60:
-            self.EndTimes.append(1440*(day) + random.randint(6*60,7.60))
-        elif dishwashtimeintervals < 13*60:
-            self.EndTimes.append(1440*(day) + random.randint(17*60,18*60))
-        elif dishwashtimeintervals < 19.5*60:
-            self.EndTimes.append(1440*(day) + random.randint(22*60,23*60))
-        else:
-            self.EndTimes.append(1440*(day+1) + random.randint(6*60,7*60))
-
-        #check for overlap on endTimes:
-        if self.EndTimes[len(self.EndTimes)-1] < self.StartTimes[len(self.StartTimes)-1] + 2*60:
-            self.EndTimes.pop()
-            self.StartTimes.pop()
+    # Deadline windows (minutes from the start of the day of the run) per band of start times: (band end, earliest, latest)
+    Deadlines = [(4*60, 6*60, 7*60), (13*60, 17*60, 18*60), (19.5*60, 22*60, 23*60), (24*60, 1440+6*60, 1440+7*60)]
+
+    # Simulated for all days at once, see DeviceWashingMachine
+    def simulate(self, config: configLoader.Config, days, occupancy, dishwashDays, dishwashMoment):
+        generator = profilegentools.numpyGenerator()
+        dayOfWeek = days % 7
+        runs = (numpy.isin(dayOfWeek, list(dishwashDays)) & (generator.random(len(days)) < 0.9)) | (generator.random(len(days)) < 0.1)
+        moments = numpy.asarray(dishwashMoment, dtype=int)[dayOfWeek[runs]]
+        startTimes, endTimes = placeRuns(generator, days[runs], occupancy[runs], moments, (20*60, 23*60), self.Deadlines, 2*60)
+        self.StartTimes = startTimes.tolist()
+        self.EndTimes = endTimes.tolist()
 
     def generate(self, consumption = 0):
-        self.LongProfile = 'complex(2.343792, 9.91720178381),complex(0.705584, 8.79153133754),complex(0.078676, 7.86720661017),complex(0.078744, 7.87400627016),complex(0.078948, 7.89440525013),complex(0.079152, 7.91480423011),complex(0.079016, 7.90120491012),complex(0.078812, 7.88080593015),complex(0.941108, 3.10574286964),complex(10.449, 18.0981988883),complex(4.523148, 1.78766247656),complex(34.157214, 15.5624864632),complex(155.116416, 70.6731270362),complex(158.38641, 72.1629803176),complex(158.790988, 67.6446776265),complex(158.318433, 72.1320090814),complex(158.654276, 67.5864385584),complex(131.583375, 109.033724507),complex(13.91745, 13.0299198193),complex(4.489968, 1.91271835851),complex(1693.082112, 669.148867416),complex(3137.819256, 447.115028245),complex(3107.713851, 442.825240368),complex(3120.197256, 444.604029241),complex(3123.464652, 445.069607955),complex(3114.653256, 443.814052026),complex(3121.27497, 444.757595169),complex(3116.305863, 444.04953577),complex(3106.801566, 442.695246796),complex(3117.703743, 444.248722882),complex(3118.851648, 444.412290486),complex(3110.016195, 443.15330662),complex(3104.806122, 442.410911425),complex(1148.154728, 416.724520071),complex(166.342624, 70.8616610914),complex(161.205252, 68.6731497838),complex(160.049824, 68.1809395169),complex(158.772588, 67.6368392593),complex(158.208076, 67.3963581543),complex(157.926096, 67.2762351774),complex(157.01364, 66.8875305491),complex(112.30272, 108.243298437),complex(11.65632, 9.35164905552),complex(17.569056, 18.4299236306),complex(4.947208, 2.10750178285),complex(4.724016, 2.012422389),complex(143.12025, 65.2075123351),complex(161.129536, 68.6408949029),complex(160.671915, 63.501604078),complex(23.764224, 12.8265693277),complex(136.853808, 62.352437012),complex(159.11184, 62.8850229849),complex(159.464682, 63.0244750664),complex(159.04302, 62.8578235805),complex(36.68544, 55.7061505818),complex(9.767628, 7.07164059421),complex(4.902772, 2.08857212612),complex(2239.315008, 885.033921728),complex(3116.846106, 444.126516228),complex(3111.034014, 443.298337972),complex(3118.112712, 444.306997808),complex(3111.809778, 443.408878355),complex(3113.442189, 443.641484325),complex(3110.529708, 443.226478259),complex(3104.676432, 442.392431601),complex(3101.093424, 441.881880613),complex(3121.076178, 444.729268843),complex(1221.232208, 443.248103556),complex(159.964185, 63.2218912841),complex(2663.07828, 966.568347525),complex(272.524675, 436.038267268),complex(7.76832, 5.82624),complex(3.258112, 1.75854256572),complex(3.299408, 1.69033685682),complex(3.295136, 1.68814824631),complex(3.256704, 1.75778260783),complex(3.258112, 1.75854256572),complex(3.262336, 1.7608224394),complex(2224.648744, 807.439674778),complex(367.142872, 587.426961418),complex(4.711025, 11.8288968082)'
+        self.ProfileId = 'input/devices/dishwasher'
         self.name = "Dishwasher"
 
 
 class DeviceElectricalVehicle(BufferTimeshiftableDevice):
-    def simulate(self, config: configLoader.Config, day, person, eventStart, eventDuration):
-        dayOfWeek = day%7
-        if dayOfWeek in person.Workdays:
-            self.Setpoint.append(self.BufferCapacity)
-            energyLoss = round(person.DistanceToWork / (5+(random.randint(0,100)/100))) * 1000 * 2 #Round trip
-
-            if(random.randint(1,10) < 3):
-                #add a random trip:
-                self.StartTimes.append(1440*day + person.WorkdayArrival_Avg + random.randint(150,210))
-                energyLoss = energyLoss + round(random.randint(5,20) / (5+(random.randint(0,100)/100))) * 1000 * 2
-            else:
-                self.StartTimes.append(1440*day + person.WorkdayArrival_Avg + random.randint(0,30))
-
-            energyLoss = round(energyLoss + (energyLoss * 0.166 * ((math.cos((day/365) * 2 * math.pi ))))) #approx 25% less range in winter! Not considering heating here
-
-            #print(person.DistanceToWork)
-            if(energyLoss > self.BufferCapacity):
-                energyLoss = self.BufferCapacity
-            self.EnergyLoss.append(energyLoss) #Approx 5.5km/kWh for current (PH)EVs, positive ;-)
-
-            self.EndTimes.append(1440*(day+1) + person.WorkdayLeave_Avg - 30)
-
-
-        elif eventDuration > 0 and eventStart > 8*60 and random.randint(1,10)<8:
-            #Family event, lets use it!
-
-            #first make sure the car is filled:
-            if(len(self.EndTimes) > 0):
-                self.EndTimes.pop() #remove the dummy entry
-                self.EndTimes.append(1440*(day) + eventStart - random.randint(30,60))
-
-            self.Setpoint.append(self.BufferCapacity)
-            energyLoss = round(random.randint(20,150) / (5+(random.randint(0,100)/100))) * 1000 * 2 #Round trip
-            energyLoss = round(energyLoss + (energyLoss * 0.166 * ((math.cos((day/365) * 2 * math.pi ))))) #approx 25% less range in winter! Not considering heating here
-
-            self.StartTimes.append(1440*day + eventStart+eventDuration + random.randint(0,60))
-
-            #print(person.DistanceToWork)
-            if(energyLoss > self.BufferCapacity):
-                energyLoss = self.BufferCapacity
-            self.EnergyLoss.append(energyLoss) #Approx 5.5km/kWh for current (PH)EVs
-
-            self.EndTimes.append(1440*(day+1) + person.WorkdayLeave_Avg - 30)
-
-        if len(self.EndTimes) > 0 and len(self.StartTimes) > 0:
-            assert(self.EndTimes[-1] > 	(self.StartTimes[-1]))
+    # Simulated for all days at once: the car is charged after commuting on workdays, and after family events (given
+    # per day by eventStart and eventDuration) on other days
+    def simulate(self, config: configLoader.Config, days, person, eventStart, eventDuration):
+        generator = profilegentools.numpyGenerator()
+        n = len(days)
+        workday = numpy.isin(days % 7, list(person.Workdays))
+        event = ~workday & (eventDuration > 0) & (eventStart > 8*60) & (generator.integers(1, 10, size=n, endpoint=True) < 8)
+
+        speed = 5 + (generator.integers(0, 100, size=(n, 2), endpoint=True) / 100)
+        trip = generator.integers(1, 10, size=n, endpoint=True) < 3
+        commute = numpy.rint(person.DistanceToWork / speed[:, 0]) * 1000 * 2 #Round trip
+        extraTrip = numpy.rint(generator.integers(5, 20, size=n, endpoint=True) / speed[:, 1]) * 1000 * 2
+        outing = numpy.rint(generator.integers(20, 150, size=n, endpoint=True) / speed[:, 0]) * 1000 * 2 #Round trip
+        energyLoss = numpy.where(workday, commute + numpy.where(trip, extraTrip, 0), outing)
+        energyLoss = numpy.rint(energyLoss + (energyLoss * 0.166 * numpy.cos((days/365) * 2 * math.pi))) #approx 25% less range in winter! Not considering heating here
+        energyLoss = numpy.minimum(energyLoss, self.BufferCapacity) #Approx 5.5km/kWh for current (PH)EVs
+
+        arrival = numpy.where(trip, generator.integers(150, 210, size=n, endpoint=True), generator.integers(0, 30, size=n, endpoint=True))
+        startTimes = numpy.where(workday, 1440*days + person.WorkdayArrival_Avg + arrival,
+                                 1440*days + eventStart + eventDuration + generator.integers(0, 60, size=n, endpoint=True))
+        endTimes = 1440*(days+1) + person.WorkdayLeave_Avg - 30
+        # Family event: the car has to be filled before leaving, which ends the previous session
+        leave = 1440*days + eventStart - generator.integers(30, 60, size=n, endpoint=True)
+
+        sessions = workday | event
+        startTimes, endTimes, energyLoss, leave, event = startTimes[sessions], endTimes[sessions], energyLoss[sessions], leave[sessions], event[sessions]
+        endTimes[:-1] = numpy.where(event[1:], leave[1:], endTimes[:-1])
+        assert(numpy.all(endTimes > startTimes))
+
+        self.StartTimes = startTimes.tolist()
+        self.EndTimes = endTimes.tolist()
+        self.EnergyLoss = energyLoss.astype(int).tolist()
+        self.Setpoint = [self.BufferCapacity] * len(self.StartTimes)
@@ -23,8 +23,12 @@
 # based on the flexibility, the modelled zone, and the heating device, (optimizing) controllers can be implemented in the external too
 # such as DEMKit to simulate the temperature behaviour of the zone based on the control actions.
 
-import random
+import bisect
 
+import numpy
+
+from alpg import rng
+from alpg import profilegentools
 from alpg.configLoader import Config
 
 
@@ -43,48 +47,47 @@ class DHWDemand(HeatDevice):
         powerPerLitre = (4186 * (60-20)) /60.0
         # Note: Power consumption for a litre using the specific heat and assuming a temperature difference of ~40 times 60 as we use minutes
 
+        # Scheduling is done on intervals [start, end) of minutes instead of scanning all minutes of the day
         result = [0] * 1440
-        showerOccupancy = [0] * 1440
+        showerOccupancy = []
 
         cookingIncluded = False
         if cookingDuration == 0:
             cookingIncluded = True
 
         for p in range(0, len(persons)):
-            pResult = [0] * 1440
+            pResult = {}
+            occupied = profilegentools.intervals(occupancyPerson[p])
 
             showerStart = None
             showerDuration = 0
-            rand = random.randint(0, 100)
+            rand = rng.randint(0, 100)
             if (dayOfWeek in persons[p].showerDays or rand < 15) and not rand >= 85:
-                showerDuration = random.randint(persons[p].showerDuration-1, persons[p].showerDuration+1)
+                showerDuration = rng.randint(persons[p].showerDuration-1, persons[p].showerDuration+1)
 
             if showerDuration > 0: #actually use the shower
                 # First obtain a shower profile for this person
+                # A shower (including 5 minutes margin) must fit within a free window, i.e. the person is home and the
+                # shower is not occupied, and the minute after this window must be free as well
+                window = showerDuration+5
                 showerOptions = []
-                for i in range(0, 1440 - (showerDuration+5)):
-                    option = True
-                    if showerOccupancy[i] == 0 and occupancyPerson[p][i] > 0 and occupancyPerson[p][i+showerDuration+5] > 0 and showerOccupancy[i+showerDuration+5] == 0:
-                        # Check for sure:
-                        for j in range(i, i+showerDuration+5):
-                            if showerOccupancy[j] != 0 or occupancyPerson[p][j] == 0:
-                                option = False
-                                break
-                            if cookingIncluded == False and j >= cookingTime and j <= (cookingTime+cookingDuration):
-                                option = False
-                                break
-                        if option:
-                            showerOptions.append(i)
+                for start, end in profilegentools.subtractIntervals(occupied, showerOccupancy):
+                    showerOptions.append((start, min(end-window, 1440-window)))
+                if cookingIncluded == False:
+                    # The shower itself cannot overlap with cooking
+                    showerOptions = profilegentools.subtractIntervals(showerOptions, [(cookingTime-window+1, cookingTime+cookingDuration+1)])
+                showerOptions = [(start, end) for start, end in showerOptions if start < end]
+                numOfOptions = profilegentools.intervalsLength(showerOptions)
 
                 # Now determine when to shower exactly:
-                if persons[p].showerMorning and len(showerOptions) > 0:
+                if persons[p].showerMorning and numOfOptions > 0:
                     # Try to get the earliest possible moment
-                    showerStart = showerOptions[0]
-                elif len(showerOptions) > 0:
+                    showerStart = showerOptions[0][0]
+                elif numOfOptions > 0:
                     # Most likely in the evening, after dinner, so >=  19 o clock:
                     tries = 0
                     while tries < 10:
-                        showerStart = random.sample(showerOptions, 1)[0]
+                        showerStart = profilegentools.intervalsElements(showerOptions, rng.sample(range(numOfOptions), 1))[0]
                         if showerStart > 19*60:
                             break
                         tries += 1
@@ -94,20 +97,19 @@ class DHWDemand(HeatDevice):
                     for i in range(showerStart, showerStart+showerDuration):
                         pResult[i] = 0.083 * powerPerLitre * 60
 
-                    for i in range(showerStart, showerStart+showerDuration+5):
-                        showerOccupancy[i] = 1
+                    bisect.insort(showerOccupancy, (showerStart, showerStart+showerDuration+5))
 
             # Determine DHW usage for cooking (First person only):
             if cookingIncluded == False:
                 # select some random moments during cooking:
                 cookingmoments = range(cookingTime, cookingTime+cookingDuration)
-                tapUsage = random.sample(cookingmoments, random.randint(1, 4))
+                tapUsage = rng.sample(cookingmoments, rng.randint(1, 4))
                 for i in tapUsage:
-                    pResult[i] = 0.083 * powerPerLitre * rand.randInt(30, 60)
+                    pResult[i] = 0.083 * powerPerLitre * rng.randint(30, 60)
 
                 # Now check for dishes or precleaning
-                if not hasDishwasher or random.randint(0,10) < 4:
-                    dishmoment = cookingTime + cookingDuration + random.randint(30,45)
+                if not hasDishwasher or rng.randint(0,10) < 4:
+                    dishmoment = cookingTime + cookingDuration + rng.randint(30,45)
                     if occupancyPerson[p][dishmoment] > 0:
                         pResult[dishmoment] = 0.083 * powerPerLitre * 60
                     if occupancyPerson[p][dishmoment+1] > 0:
@@ -116,22 +118,20 @@ class DHWDemand(HeatDevice):
                 cookingIncluded = True
 
             # Now determine normal hot water usage
-            options = []
-            # First fill a list with appropriate moments to use hot water:
-            for i in range(0, 1440):
-                if occupancyPerson[p][i] > 0 and pResult[i] == 0:
-                    # filter out cooking and showering/bathing
-                    if (i < cookingTime or i > cookingTime + cookingDuration + 30):
-                        options.append(i)
+            # First obtain the appropriate moments to use hot water, filtering out cooking and showering/bathing
+            options = profilegentools.subtractIntervals(occupied, profilegentools.intervalsFromMinutes(pResult))
+            if cookingTime is not None:
+                options = profilegentools.subtractIntervals(options, [(cookingTime, cookingTime + cookingDuration + 31)])
+            numOfOptions = profilegentools.intervalsLength(options)
 
             # Now calculate the tap usage based on the time being active
-            tapmoments = random.sample(options, (int(len(options) / random.randint(120, 150))))
+            tapmoments = profilegentools.intervalsElements(options, rng.sample(range(numOfOptions), (int(numOfOptions / rng.randint(120, 150)))))
             for i in tapmoments:
-                pResult[i] = 0.083 * powerPerLitre * random.randint(25,50)
+                pResult[i] = 0.083 * powerPerLitre * rng.randint(25,50)
 
             # Merge the result
-            for i in range(0, len(pResult)):
-                result[i] += pResult[i]
+            for i, value in pResult.items():
+                result[i] += value
 
         return result
 
@@ -143,40 +143,30 @@ class Thermostat(HeatDevice):
         self.Setpoints = [0.0]
         self.StartTimes = [0]
 
-    def simulate(self, timeintervals, day, persons, occupancy):
+    # Simulated for all days at once, startday is the day of the first interval. Edges are taken within each day.
+    def simulate(self, timeintervals, startday, persons, occupancy):
         # First select the highest setpoint
-        heatingSetpoint = 0.0
-        for p in persons:
-            if p.thermostatSetpoint > heatingSetpoint:
-                heatingSetpoint = p.thermostatSetpoint
+        heatingSetpoint = max([0.0] + [p.thermostatSetpoint for p in persons])
 
         # Make a vector with all the temps
-        setpoints = [0.0] * timeintervals
-        for i in range(0, timeintervals):
-            if occupancy[i] > 0:
-                setpoints[i] = heatingSetpoint
+        setpoints = numpy.where(numpy.asarray(occupancy).reshape(-1, 1440) > 0, heatingSetpoint, 0.0)
 
         # Now select the edges
-        for i in range(1, timeintervals):
-            if setpoints[i] != setpoints[i-1]:
-                #Edge
-                #Random higher setpoint
-                if setpoints[i] > 0.001 and random.randint(0,9) < 2:
-                    self.Setpoints.append(setpoints[i]+1.0)
-                    self.StartTimes.append(day*1440 + i)
-                else:
-                    self.Setpoints.append(setpoints[i])
-                    self.StartTimes.append(day*1440 + i)
-
-# Heat generated by persons
+        day, i = numpy.nonzero(numpy.diff(setpoints, axis=1) != 0)
+        i = i + 1
+        values = setpoints[day, i]
+
+        #Random higher setpoint
+        higher = (values > 0.001) & (profilegentools.numpyGenerator().integers(0, 9, size=len(values), endpoint=True) < 2)
+        self.Setpoints.extend(numpy.where(higher, values+1.0, values).tolist())
+        self.StartTimes.extend(((startday + day)*1440 + i).tolist())
+
+# Heat generated by persons, the occupancy of each person weighted by their heat generation
 class PersonGain(HeatDevice):
     def simulate(self, timeintervals, persons, occupancyPerson):
-        HeatProfile = [0] * timeintervals
-        for p in range(0, len(persons)):
-            for i in range(0, len(occupancyPerson[p])):
-                HeatProfile[i] += occupancyPerson[p][i] * persons[p].heatGeneration
-
-        return HeatProfile
+        heatGeneration = numpy.array([person.heatGeneration for person in persons])
+        occupancy = numpy.array(occupancyPerson, dtype=int).reshape(len(persons), timeintervals)
+        return (heatGeneration @ occupancy).tolist()
 
 
 class Ventilation(HeatDevice):
@@ -189,10 +179,11 @@ class Ventilation(HeatDevice):
         self.VentilationProfile = []
 
     def simulate(self, timeintervals, occupancy):
-        self.VentilationProfile = [self.IdleAirflow] * timeintervals
-        for i in range(0, len(occupancy)):
-            self.VentilationProfile[i] += occupancy[i] * self.PersonAirFlow
-            self.VentilationProfile[i] = min(self.VentilationProfile[i], self.MaxAirflow )
+        self.VentilationProfile = numpy.minimum(self.IdleAirflow + (numpy.asarray(occupancy) * self.PersonAirFlow), self.MaxAirflow).tolist()
 
         # Initial profile, notice that ventilation will be incremented using other activities such as cooking and showers!
         return self.VentilationProfile
+
+    def boost(self, airflow):
+        # Add additional airflow (e.g. of the cooker hood), limited by the maximum airflow
+        self.VentilationProfile = numpy.minimum(numpy.asarray(self.VentilationProfile) + airflow, self.MaxAirflow).tolist()
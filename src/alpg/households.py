@@ -16,8 +16,11 @@
 
 import math
 import copy
-import random
+import collections.abc
 
+import numpy
+
+from alpg import rng
 from alpg import configLoader
 from alpg import profilegentools
 from alpg import persons
@@ -30,6 +33,108 @@ WASHING_MACHINE_DEVICE = 'WashingMachine'
 DISHWASHER_DEVICE = 'DishwashMachine'
 THERMOSTAT_DEVICE = 'Thermostat'
 
+# Output channels of the domestic hot water demand, it is only simulated when one of these is selected
+DHW_CHANNELS = ('Heatdemand_Profile', 'Heatdemand_Profile_DHWTap')
+
+def renderTimeshiftable(households, startday, timeintervals, method='direct'):
+    # Optional rendering stage: the (uncontrolled) power profiles of the washing machines and dishwashers of the given
+    # households, with the device profile placed at every start time. The start times are minutes since the start of
+    # the year, the profiles start at startday
+    for household in households:
+        if household.TimeshiftableConsumption is None:
+            household.TimeshiftableConsumption = {}
+            household.TimeshiftableReactiveConsumption = {}
+
+    for device in (WASHING_MACHINE_DEVICE, DISHWASHER_DEVICE):
+        profileIds = {household.Devices[device].ProfileId for household in households}
+        for profileId in profileIds:
+            group = [household for household in households if household.Devices[device].ProfileId == profileId]
+            power = devices.renderRuns([numpy.asarray(household.Devices[device].StartTimes, dtype=int) - startday*1440 for household in group],
+                                       devices.deviceProfile(profileId).power, timeintervals, method)
+            for household, row in zip(group, power):
+                household.TimeshiftableConsumption[device] = row.real
+                household.TimeshiftableReactiveConsumption[device] = row.imag
+
+
+def renderElectricVehicles(households, startday, timeintervals):
+    # Optional rendering stage: the power profiles of the EVs of the given households when charging as soon as possible,
+    # starting at startday
+    power = devices.renderCharging([household.Devices[ELECTRIC_VEHICLE_DEVICE] for household in households], timeintervals, startday*1440)
+    for household, row in zip(households, power):
+        if household.TimeshiftableConsumption is None:
+            household.TimeshiftableConsumption = {}
+            household.TimeshiftableReactiveConsumption = {}
+        household.TimeshiftableConsumption[ELECTRIC_VEHICLE_DEVICE] = row
+
+
+class ReactiveProfiles(collections.abc.Mapping):
+    # Reactive power per device group, derived from the active power when accessed (and not stored): the consumption of
+    # each group times the reactive part of its power factor, rounded, and the total of all groups
+    def __init__(self, consumption, factors):
+        self.consumption = consumption
+        self.factors = factors
+
+    def group(self, key):
+        factor = self.factors[key]
+        reactive = math.sqrt(1 - (factor*factor))
+        if factor < 0:
+            reactive = -1*reactive
+        return numpy.rint(numpy.asarray(self.consumption[key]) * reactive).astype(int)
+
+    def __getitem__(self, key):
+        if key == 'Total':
+            total = numpy.zeros(len(self.consumption['Total']), dtype=int)
+            for k in self.factors:
+                total += self.group(k)
+            return total.tolist()
+        return self.group(key).tolist()
+
+    def __iter__(self):
+        return iter(['Total'] + list(self.factors))
+
+    def __len__(self):
+        return len(self.factors) + 1
+
+
+class HeatGainProfiles(collections.abc.MutableMapping):
+    # Heat gains of a household. The gain of persons and the airflow of the ventilation are stored, the gain of devices (a
+    # share of the consumption of each device group, rounded) and the total gain are derived when accessed
+    DERIVED = ('DeviceGain', 'Total')
+
+    def __init__(self, stored, consumption, shares):
+        self.stored = stored
+        self.consumption = consumption
+        self.shares = shares
+
+    def deviceGain(self):
+        gain = numpy.zeros(len(self.stored['PersonGain']), dtype=int)
+        for k, v in self.shares.items():
+            gain += numpy.rint(numpy.asarray(self.consumption[k]) * v).astype(int)
+        return gain
+
+    def __getitem__(self, key):
+        if key == 'DeviceGain':
+            return self.deviceGain().tolist()
+        if key == 'Total':
+            # self.HeatGain['Total'] =  [sum(x) for x in zip(self.HeatGain['Total'], self.HeatGain['SolarGain'])]
+            return (numpy.asarray(self.stored['PersonGain'], dtype=int) + self.deviceGain()).tolist()
+        return self.stored[key]
+
+    def __setitem__(self, key, value):
+        if key in self.DERIVED:
+            raise KeyError(key + " is derived from the consumption and cannot be set")
+        self.stored[key] = value
+
+    def __delitem__(self, key):
+        del self.stored[key]
+
+    def __iter__(self):
+        return iter(list(self.stored) + list(self.DERIVED))
+
+    def __len__(self):
+        return len(self.stored) + len(self.DERIVED)
+
+
 class HouseholdModel:
     #Note to self, must simulate whole household at once!
 
@@ -66,11 +171,10 @@ class HouseholdModel:
                                       "Lighting"		: [], \
                                       "Standby"		: [] }
 
-        self.HeatGain = {			"PersonGain"	: [], \
-                                     "DeviceGain"	: [], \
+        # The gain of devices and the total gain are derived from the consumption, see HeatGainProfiles
+        self.StoredHeatGain = {		"PersonGain"	: [], \
                                      "SolarGain"		: [], \
-                                     "VentFlow"		: [], \
-                                     "Total"			: []}
+                                     "VentFlow"		: []}
 
         self.HeatDemand = {			"DHWDemand"		: [], \
                                        "Total"			: []}
@@ -82,29 +186,29 @@ class HouseholdModel:
                                       "Lighting"		: 0.8, \
                                       "Standby"		: 1.0 }
 
-        self.ReactiveConsumption = {"Total"			: [], \
-                                    "Other"			: [], \
-                                    "Inductive"		: [], \
-                                    "Fridges"		: [], \
-                                    "Electronics"	: [], \
-                                    "Lighting"		: [], \
-                                    "Standby"		: [] }
-
+        # The reactive power of each group follows from its consumption and power factor, see ReactiveProfiles
         self.ReactiveFactor = {	"Other"			: 1, \
-                                   "Inductive"		: (random.randint(70,90)/100), \
-                                   "Fridges"		: (random.randint(50,65)/100), \
-                                   "Electronics"	: -(random.randint(99,100)/100), \
-                                   "Lighting"		: -(random.randint(99,100)/100), \
-                                   "Standby"		: -(random.randint(75,85)/100) }
+                                   "Inductive"		: (rng.randint(70,90)/100), \
+                                   "Fridges"		: (rng.randint(50,65)/100), \
+                                   "Electronics"	: -(rng.randint(99,100)/100), \
+                                   "Lighting"		: -(rng.randint(99,100)/100), \
+                                   "Standby"		: -(rng.randint(75,85)/100) }
 
         self.PVProfile = []
 
-        self.Occupancy = []
+        # Power of the washing machine, dishwasher and EV when started as soon as possible, see renderTimeshiftable() and
+        # renderElectricVehicles()
+        self.TimeshiftableConsumption = None
+        self.TimeshiftableReactiveConsumption = None
 
+        self.Occupancy = []
 
+        # Sparse events of the devices in the 'Other' group and the cycles of the fridges at the start of the simulation
+        self.DeviceEvents = {}
+        self.FridgeCycles = []
 
         self.hasDishwasher = False
-        self.hasInductionCooking = random.randint(1,10)<4
+        self.hasInductionCooking = rng.randint(1,10)<4
         self.hasEV = False
         self.hasHP = False
         self.hasCHP = False
@@ -127,8 +231,8 @@ class HouseholdModel:
                             "Ventilation": devices.DeviceVentilation(self.config.ConsumptionHouseVentilation), \
                             "Ironing": devices.DeviceIroning(self.config.ConsumptionIron), \
                             "Vacuumcleaner": devices.DeviceVacuumcleaner(self.config.ConsumptionVacuumcleaner), \
-                            WASHING_MACHINE_DEVICE: devices.DeviceWashingMachine(), \
-                            DISHWASHER_DEVICE: devices.DeviceDishwasher(), \
+                            WASHING_MACHINE_DEVICE: devices.DeviceWashingMachine(profile=getattr(self.config, 'deviceProfileWashingMachine', None)), \
+                            DISHWASHER_DEVICE: devices.DeviceDishwasher(profile=getattr(self.config, 'deviceProfileDishwasher', None)), \
                             ELECTRIC_VEHICLE_DEVICE: devices.DeviceElectricalVehicle(), \
                             "PVPanel" : devices.DeviceSolarPanel()}
 
@@ -137,11 +241,34 @@ class HouseholdModel:
                                    "VentFlow": heatdemand.Ventilation(config), \
                                    "DHWDemand": heatdemand.DHWDemand(config) }
 
-        self.familyActivites = random.randint(self.config.familyOutingChanceMin, self.config.familyOutingChanceMax) / 100
+        self.familyActivites = rng.randint(self.config.familyOutingChanceMin, self.config.familyOutingChanceMax) / 100
 
     def setHouse(self, house):
         self.House = house
 
+    def releaseResults(self):
+        # Drops the simulated profiles of a household that has been written, such that it no longer takes memory. The
+        # settings of the household and the sessions of its devices are kept.
+        self.Consumption = {k: [] for k in self.Consumption}
+        self.consumptionFactor = {k: [] for k in self.consumptionFactor}
+        self.StoredHeatGain = {k: [] for k in self.StoredHeatGain}
+        self.HeatDemand = {k: [] for k in self.HeatDemand}
+        self.PVProfile = []
+        self.Occupancy = []
+        self.TimeshiftableConsumption = None
+        self.TimeshiftableReactiveConsumption = None
+        self.DeviceEvents = {}
+        self.FridgeCycles = []
+        self.HeatingDevices["VentFlow"].VentilationProfile = []
+
+    @property
+    def ReactiveConsumption(self):
+        return ReactiveProfiles(self.Consumption, self.ReactiveFactor)
+
+    @property
+    def HeatGain(self):
+        return HeatGainProfiles(self.StoredHeatGain, self.Consumption, self.HeatGainShare)
+
     def scaleProfile(self):
         totalShare = 0
         self.Consumption['Other'] = self.consumptionFactor['Other']
@@ -163,11 +290,11 @@ class HouseholdModel:
             ##NOTE: The following code breaks the random seed somehow, hence it is commented
             ##add a bit of noise to the signal:
             #for x in range(0, len(self.Consumption[k])):
-            #self.Consumption[k][x] = round(random.randint(int(round(0.93*self.Consumption[k][x])), int(round(1.07*self.Consumption[k][x]))))
+            #self.Consumption[k][x] = round(rng.randint(int(round(0.93*self.Consumption[k][x])), int(round(1.07*self.Consumption[k][x]))))
 
             ##add a sine wave
-            #sinePeriod = random.randint(120, 180)
-            #sineOffset = random.randint(0, sinePeriod)
+            #sinePeriod = rng.randint(120, 180)
+            #sineOffset = rng.randint(0, sinePeriod)
             #for i in range(0, len(self.Consumption[k])):
             #self.Consumption[k][x] = int(round(self.Consumption[k][i]+ (math.sin(((i+sineOffset)/sinePeriod)*(2*3.14)))*self.Consumption[k][i]*0.05))
             #for i in range(0,1440):
@@ -177,37 +304,8 @@ class HouseholdModel:
             self.Consumption['Total'] = [sum(x) for x in zip(self.Consumption['Total'], self.Consumption[k])]
 
 
-    def reactivePowerProfile(self):
-        self.ReactiveConsumption['Total'] = [0] * len(self.Consumption['Total'])
-
-        for k, v, in self.ReactiveFactor.items():
-            reactive = math.sqrt(1 - (self.ReactiveFactor[k]*self.ReactiveFactor[k]))
-            if self.ReactiveFactor[k] < 0:
-                reactive = -1*reactive
-
-            self.ReactiveConsumption[k] = [x * reactive for x in self.Consumption[k]]
-
-            #add some noise
-            #self.ReactiveConsumption[k] = [(x+round(x*(-0.5+random.random())/(10))) for x in self.ReactiveConsumption[k]]
-
-            self.ReactiveConsumption[k] = [round(x) for x in self.ReactiveConsumption[k]]
-            self.ReactiveConsumption['Total'] = [sum(x) for x in zip(self.ReactiveConsumption['Total'], self.ReactiveConsumption[k])]
-
-    def thermalGainProfile(self):
-        self.HeatGain['Total'] = list(self.HeatGain["PersonGain"])
-        # self.HeatGain['Total'] =  [sum(x) for x in zip(self.HeatGain['Total'], self.HeatGain['SolarGain'])]
-
-        self.HeatGain['DeviceGain'] = [0] * len(self.HeatGain["PersonGain"])
-
-        for k, v, in self.HeatGainShare.items():
-            gain = [round(x * v) for x in self.Consumption[k]]
-            self.HeatGain['DeviceGain'] = [sum(x) for x in zip(self.HeatGain['DeviceGain'], gain)]
-
-        self.HeatGain['Total'] =  [sum(x) for x in zip(self.HeatGain['Total'], self.HeatGain['DeviceGain'])]
-
-
     def generateWashingdays(self, days):
-        self.WashingDays = random.sample(range(0, 7), days)
+        self.WashingDays = rng.sample(range(0, 7), days)
         for i in range(0,7):
             if i in self.WashingDays:
                 notWorking = False
@@ -215,42 +313,48 @@ class HouseholdModel:
                     if p.Age > 25 and i not in p.Workdays:
                         notWorking = True
 
-                if notWorking and random.random() < 0.8:
-                    self.washingMoment[i] = random.randint((10*60), (17*60))
+                if notWorking and rng.random() < 0.8:
+                    self.washingMoment[i] = rng.randint((10*60), (17*60))
 
                 else:
-                    moment = random.random()
+                    moment = rng.random()
                     if(moment < 0.2):
                         #Washing in the morning
                         self.washingMoment[i] = self.Persons[0].WorkdayWakeUp_Avg + self.Persons[0].WorkdayWakeUp_Variate + 20
                     elif(moment < 0.8):
                         #Evening
-                        self.washingMoment[i] = random.randint((18*60), (21*60))
+                        self.washingMoment[i] = rng.randint((18*60), (21*60))
                     else:
                         #Later in the night
-                        self.washingMoment[i] = random.randint((21*60), (23*60))
+                        self.washingMoment[i] = rng.randint((21*60), (23*60))
 
 
 
     def generateDishwashdays(self, days):
-        self.DishwashDays = random.sample(range(0, 7), days)
+        self.DishwashDays = rng.sample(range(0, 7), days)
         for i in range(0,7):
             if i in self.DishwashDays:
-                moment = random.random()
+                moment = rng.random()
                 if(moment < 0.2):
                     #Washing in the morning
                     self.DishwashMoment[i] = self.Persons[0].WorkdayWakeUp_Avg + self.Persons[0].WorkdayWakeUp_Variate + 20
                 elif(moment < 0.7):
                     #Evening
-                    self.DishwashMoment[i] = random.randint((19*60), (20*60))
+                    self.DishwashMoment[i] = rng.randint((19*60), (20*60))
                 else:
                     #Later in the night
-                    self.DishwashMoment[i] = random.randint((22*60), (23.5*60))
+                    self.DishwashMoment[i] = rng.randint((22*60), (23.5*60))
 
     def simulate(self):
+        occupancyPersonsYear = [[] for x in range(0, len(self.Persons))]
+        occupancyAdultsYear = []
+        ventilationEvents = []
+        eventStarts = []
+        eventDurations = []
+        cookingTimes = []
+        self.DeviceEvents = {"Cooking": [], "Kettle": [], "Ironing": [], "Vacuumcleaner": []}
+        self.FridgeCycles = [fridge.cycles(self.config.numDays*1440) for fridge in self.Fridges]
         for day in range(self.config.startDay, self.config.numDays+self.config.startDay):
-            dayOfWeek = day%7
-
             #Select occupancy profiles for each person
             self.OccupancyPersonsDay = [0] * 1440
             self.OccupancyAdultsDay = [0] * 1440
@@ -267,22 +371,22 @@ class HouseholdModel:
             #Activities for the whole family
             eventDuration = 0;
             eventStart = 0;
-            if (day%7==0 or day%7==6) and random.random() < self.familyActivites:
+            if (day%7==0 or day%7==6) and rng.random() < self.familyActivites:
                 #Only on Sundays we will have outings
                 #see whether it takes whole day or just a visit to other family members
                 #Notice that for now there is no relation between the individual family members and this outing!
                 eventDuration = 0;
-                if(random.random() < 0.2):
+                if(rng.random() < 0.2):
                     #Long event
-                    eventDuration = random.randint(6*60,9*60)
-                    eventStart = random.randint(10*60,12*60)
+                    eventDuration = rng.randint(6*60,9*60)
+                    eventStart = rng.randint(10*60,12*60)
                 else:
                     #short event, family visit or shopping.
-                    eventDuration = random.randint(3*60,4*60)
+                    eventDuration = rng.randint(3*60,4*60)
                     if(day%7==0):
-                        eventStart = random.randint(15*60,16*60)
+                        eventStart = rng.randint(15*60,16*60)
                     else:
-                        eventStart = random.randint(13*60,14*60)
+                        eventStart = rng.randint(13*60,14*60)
 
                 #Make these entries empty, no-one is home!
                 for t in range(eventStart, eventStart+eventDuration):
@@ -293,12 +397,12 @@ class HouseholdModel:
 
 
             #Select cooking time
-            cookingTime = random.randint(17*60,19.5*60)
+            cookingTime = rng.randint(17*60,19.5*60)
             startCooking = cookingTime;
             cookingDuration = 0
             count = 0;
             while self.OccupancyPersonsDay[startCooking] == 0 and count != 100:
-                startCooking = random.randint(17*60,19.5*60)
+                startCooking = rng.randint(17*60,19.5*60)
                 count += 1
                 if count == 99:
                     startCooking = -1
@@ -307,85 +411,72 @@ class HouseholdModel:
                     break
 
             #Empty consumption patterns
-            ElectronicsProfile = [0] * 1440
-            LightingProfile = [0] * 1440
-            OtherProfile = [0] * 1440
-            InductiveProfile = [0] * 1440
             StandbyProfile = [1] * 1440 # Standby is fixed load, but will be scaled!
 
-            # Simualate Heating devices and gains
-            # Person gain
-            HeatPersonGain = self.HeatingDevices["PersonGain"].simulate(1440, self.Persons, self.OccupancyPerson)
-
-            # Device heat gain is done through rescaling
-            # Thermostat
-            self.HeatingDevices[THERMOSTAT_DEVICE].simulate(1440, day, self.Persons, self.OccupancyPersonsDay)
-
-            # Initialize the ventilation profile
-            self.HeatingDevices["VentFlow"].simulate(1440, self.OccupancyPersonsDay)
-
-            # FIXME Add DHW simulation here
-            # persons, occupancyPerson, dayOfWeek, cookingTime = None, cookingDuration = None, hasDishwasher = None):
-            DHWDemandProfile = self.HeatingDevices["DHWDemand"].simulate(self.Persons, self.OccupancyPerson, dayOfWeek, cookingTime, cookingDuration, self.hasDishwasher)
-
             #Kitchen
+            dayOffset = (day-self.config.startDay)*1440
             if startCooking != -1:
-                OtherProfile = self.Devices["Cooking"].simulate(self.config, 1440, self.OccupancyAdultsDay, self.Persons, startCooking, cookingDuration, self.hasInductionCooking, self.HeatingDevices["VentFlow"])
-            OtherProfile = [sum(x) for x in zip(OtherProfile, self.Devices['Kettle'].simulate(self.config, 1440, self.OccupancyPersonsDay))]
-
-            FridgeProfile = [0] * 1440
-            for f in range(0, len(self.Fridges)):
-                profile = self.Fridges[f].simulate(self.config, 1440)
-                FridgeProfile = [sum(x) for x in zip(FridgeProfile, profile)]
+                cookingEvents, cookerHoodEvents = self.Devices["Cooking"].events(self.config, self.OccupancyAdultsDay, self.Persons, startCooking, cookingDuration, self.hasInductionCooking, self.HeatingDevices["VentFlow"])
+                ventilationEvents.extend(devices.shiftEvents(cookerHoodEvents, dayOffset))
+                self.DeviceEvents["Cooking"].extend(devices.shiftEvents(cookingEvents, dayOffset))
+            self.DeviceEvents["Kettle"].extend(devices.shiftEvents(self.Devices['Kettle'].events(self.config, self.OccupancyPersonsDay), dayOffset))
 
             #Household and whitegoods
             #ironing
-            if random.randint(1,7) == 1:
-                OtherProfile = [sum(x) for x in zip(OtherProfile, self.Devices["Ironing"].simulate(self.config, 1440, self.OccupancyAdultsDay, len(self.Persons)))]
+            if rng.randint(1,7) == 1:
+                self.DeviceEvents["Ironing"].extend(devices.shiftEvents(self.Devices["Ironing"].events(self.config, self.OccupancyAdultsDay, len(self.Persons)), dayOffset))
 
             #Vacuumcleaning
-            if random.randint(1,7) == 1:
-                OtherProfile = [sum(x) for x in zip(OtherProfile, self.Devices["Vacuumcleaner"].simulate(self.config, 1440, self.OccupancyAdultsDay, len(self.Persons)))]
-
-            #Smart devices
-            if day-self.config.startDay < self.config.numDays - 1:
-                #Making sure that we dont run out of the simulation time
-
-                #Whats for EV?
-                if self.hasEV > 0:
-                    self.Devices[ELECTRIC_VEHICLE_DEVICE].simulate(self.config, day, self.Persons[0], eventStart, eventDuration)
-
-                if (((dayOfWeek in self.WashingDays) and (random.random()  < 0.9)) or (random.random()  < 0.1)):
-                    self.Devices["WashingMachine"].simulate(self.config, 1440, day, self.OccupancyAdultsDay, self.washingMoment[dayOfWeek])
-
-                #check if household has a dishwashmachine!
-                if(self.hasDishwasher == True):
-                    if (((dayOfWeek in self.DishwashDays) and (random.random()  < 0.9)) or (random.random()  < 0.1)):
-                        self.Devices["DishwashMachine"].simulate(self.config, 1440, day, self.OccupancyAdultsDay, self.DishwashMoment[dayOfWeek])
-
-            #Simulate individual devices
-            LightingProfile = self.Devices["Lighting"].simulate(self.config, 1440, self.OccupancyPersonsDay, 1388534400+(3600*24*day))
-            ElectronicsProfile = self.Devices["Electronics"].simulate(self.config, 1440, self.OccupancyPersonsDay, self.OccupancyPerson)
-            InductiveProfile = self.Devices["Ventilation"].simulate(self.config, 1440, self.HeatingDevices["VentFlow"])
-
+            if rng.randint(1,7) == 1:
+                self.DeviceEvents["Vacuumcleaner"].extend(devices.shiftEvents(self.Devices["Vacuumcleaner"].events(self.config, self.OccupancyAdultsDay, len(self.Persons)), dayOffset))
 
             # Bookkeeping
-            self.consumptionFactor['Electronics'].extend(ElectronicsProfile)
-            self.consumptionFactor['Lighting'].extend(LightingProfile)
             self.consumptionFactor['Standby'].extend(StandbyProfile)
-            self.consumptionFactor['Other'].extend(OtherProfile)
-            self.consumptionFactor['Inductive'].extend(InductiveProfile)
-            self.consumptionFactor['Fridges'].extend(FridgeProfile)
-
-            # Extend the heating vectors
-            self.HeatGain['PersonGain'].extend(HeatPersonGain)
-            self.HeatGain['VentFlow'].extend(self.HeatingDevices["VentFlow"].VentilationProfile)
-
-            self.HeatDemand['DHWDemand'].extend(DHWDemandProfile)
-            self.HeatDemand['Total'].extend(DHWDemandProfile)
 
             self.Occupancy.extend(self.OccupancyPersonsDay)
-
+            for p in range(0, len(self.Persons)):
+                occupancyPersonsYear[p].extend(self.OccupancyPerson[p])
+            occupancyAdultsYear.append(self.OccupancyAdultsDay)
+            eventStarts.append(eventStart)
+            eventDurations.append(eventDuration)
+            cookingTimes.append((cookingTime, cookingDuration))
+
+        # Simualate Heating devices and gains for the whole horizon at once
+        # Thermostat
+        self.HeatingDevices[THERMOSTAT_DEVICE].simulate(self.config.numDays*1440, self.config.startDay, self.Persons, self.Occupancy)
+
+        # Person gain, device heat gain is done through rescaling
+        self.HeatGain['PersonGain'] = self.HeatingDevices["PersonGain"].simulate(self.config.numDays*1440, self.Persons, occupancyPersonsYear)
+
+        # Ventilation profile, with the additional airflow of the cooker hood
+        self.HeatingDevices["VentFlow"].simulate(self.config.numDays*1440, self.Occupancy)
+        self.HeatingDevices["VentFlow"].boost(devices.renderEvents(ventilationEvents, self.config.numDays*1440))
+        self.HeatGain['VentFlow'] = self.HeatingDevices["VentFlow"].VentilationProfile
+        self.consumptionFactor['Inductive'] = self.Devices["Ventilation"].simulate(self.config, self.config.numDays*1440, self.HeatingDevices["VentFlow"])
+
+        #Smart devices are simulated for the whole horizon at once
+        #Making sure that we dont run out of the simulation time, there are no sessions on the last day
+        days = numpy.arange(self.config.startDay, self.config.numDays+self.config.startDay-1)
+        occupancyAdults = numpy.array(occupancyAdultsYear[:len(days)], dtype=int).reshape(len(days), 1440)
+
+        #Whats for EV?
+        if self.hasEV > 0:
+            self.Devices[ELECTRIC_VEHICLE_DEVICE].simulate(self.config, days, self.Persons[0], numpy.array(eventStarts[:len(days)], dtype=int), numpy.array(eventDurations[:len(days)], dtype=int))
+
+        self.Devices["WashingMachine"].simulate(self.config, days, occupancyAdults, self.WashingDays, self.washingMoment)
+
+        #check if household has a dishwashmachine!
+        if(self.hasDishwasher == True):
+            self.Devices["DishwashMachine"].simulate(self.config, days, occupancyAdults, self.DishwashDays, self.DishwashMoment)
+
+        #Fridges, lighting and electronics are simulated for the whole horizon at once, other devices are rendered from their events
+        self.consumptionFactor['Other'] = devices.renderEvents(sum(self.DeviceEvents.values(), []), self.config.numDays*1440).tolist()
+        FridgeProfile = numpy.zeros(self.config.numDays*1440, dtype=int)
+        for f in range(0, len(self.Fridges)):
+            FridgeProfile += self.Fridges[f].simulate(self.config, self.config.numDays*1440)
+        self.consumptionFactor['Fridges'] = FridgeProfile.tolist()
+        self.consumptionFactor['Lighting'] = self.Devices["Lighting"].simulate(self.config, self.config.startDay, self.config.numDays*1440, self.Occupancy).tolist()
+        self.consumptionFactor['Electronics'] = self.Devices["Electronics"].simulate(self.config, self.config.numDays*1440, self.Occupancy, occupancyPersonsYear).tolist()
 
         #Now simulate the PV Profile
         if self.House.hasPV:
@@ -394,6 +485,18 @@ class HouseholdModel:
         else:
             self.PVProfile = [0] * self.config.numDays * int(24*3600/60)
 
+        # Domestic hot water comes last, such that skipping it (see outputs in the config) does not change the random
+        # numbers drawn for the other profiles
+        if configLoader.outputSelected(self.config, DHW_CHANNELS):
+            for d in range(0, self.config.numDays):
+                dayOfWeek = (d + self.config.startDay)%7
+                occupancyPerson = [occupancyPersonsYear[p][d*1440:(d+1)*1440] for p in range(0, len(self.Persons))]
+                cookingTime, cookingDuration = cookingTimes[d]
+                # persons, occupancyPerson, dayOfWeek, cookingTime = None, cookingDuration = None, hasDishwasher = None):
+                DHWDemandProfile = self.HeatingDevices["DHWDemand"].simulate(self.Persons, occupancyPerson, dayOfWeek, cookingTime, cookingDuration, self.hasDishwasher)
+                self.HeatDemand['DHWDemand'].extend(DHWDemandProfile)
+                self.HeatDemand['Total'].extend(DHWDemandProfile)
+
     def saveToFile(self, num):
         self.config.writer.writeHousehold(self, self.config, num)
 
@@ -403,7 +506,7 @@ class HouseholdSingleWorkerModel(HouseholdModel):
         super(HouseholdSingleWorkerModel, self).__init__(config)
         self.ConsumptionYearly		= profilegentools.gaussMinMax(2010,400)*self.config.consumptionFactor #kWh http://www.nibud.nl/uitgaven/huishouden/gas-elektriciteit-en-water.html
 
-        self.Persons = [ persons.PersonWorker(self.config, random.randint(26,65))]
+        self.Persons = [ persons.PersonWorker(self.config, rng.randint(26,65))]
 
         #For information about commuters, see this:
         #http://www.kimnet.nl/publicatie/mobiliteitsbalans-2013
@@ -414,18 +517,18 @@ class HouseholdSingleWorkerModel(HouseholdModel):
         #However 30 is also mentioned: http://www.nederlandheeftwerk.nl/index.php/cms_categorie/58707/bb/1/id/58707
         #Depends also on the region and work in vicinity.
 
-        self.Persons[0].setDistanceToWork(round(max(0, random.gauss(self.config.commuteDistanceMean, self.config.commuteDistanceSigma))))
+        self.Persons[0].setDistanceToWork(round(max(0, rng.gauss(self.config.commuteDistanceMean, self.config.commuteDistanceSigma))))
 
-        if(random.randint(1,2) == 1):
-            self.Fridges = [ devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeBigMin,self.config.ConsumptionFridgeBigMax)) ]
+        if(rng.randint(1,2) == 1):
+            self.Fridges = [ devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeBigMin,self.config.ConsumptionFridgeBigMax)) ]
         else:
-            self.Fridges = [ devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)), devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)) ]
+            self.Fridges = [ devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)), devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)) ]
 
         #We synchronize the dishwasher and dryer based on the annual consumption. Furthermore, this also influences the number of washes.
-        self.hasDishwasher = random.randint(0,5) == 0 	#20%
+        self.hasDishwasher = rng.randint(0,5) == 0 	#20%
 
         #Determine washing days
-        self.generateWashingdays(random.randint(2,3))
+        self.generateWashingdays(rng.randint(2,3))
 
 
         #Dermine Dishwasher times
@@ -438,7 +541,7 @@ class HouseholdSingleJoblessModel(HouseholdModel):
         super(HouseholdSingleJoblessModel, self).__init__(config)
         self.ConsumptionYearly		= profilegentools.gaussMinMax(2010,400)*self.config.consumptionFactor #kWh http://www.nibud.nl/uitgaven/huishouden/gas-elektriciteit-en-water.html
 
-        self.Persons = [ persons.PersonJobless(self.config, random.randint(26,65))]
+        self.Persons = [ persons.PersonJobless(self.config, rng.randint(26,65))]
 
         #For information about commuters, see this:
         #http://www.kimnet.nl/publicatie/mobiliteitsbalans-2013
@@ -449,16 +552,16 @@ class HouseholdSingleJoblessModel(HouseholdModel):
         #However 30 is also mentioned: http://www.nederlandheeftwerk.nl/index.php/cms_categorie/58707/bb/1/id/58707
         #Depends also on the region and work in vicinity.
 
-        if(random.randint(1,2) == 1):
-            self.Fridges = [ devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeBigMin,self.config.ConsumptionFridgeBigMax)) ]
+        if(rng.randint(1,2) == 1):
+            self.Fridges = [ devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeBigMin,self.config.ConsumptionFridgeBigMax)) ]
         else:
-            self.Fridges = [ devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)), devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)) ]
+            self.Fridges = [ devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)), devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)) ]
 
         #We synchronize the dishwasher and dryer based on the annual consumption. Furthermore, this also influences the number of washes.
-        self.hasDishwasher = random.randint(0,5) == 0 	#20%
+        self.hasDishwasher = rng.randint(0,5) == 0 	#20%
 
         #Determine washing days
-        self.generateWashingdays(random.randint(2,3))
+        self.generateWashingdays(rng.randint(2,3))
 
 
         #Dermine Dishwasher times
@@ -470,7 +573,7 @@ class HouseholdSingleParttimeModel(HouseholdModel):
         super(HouseholdSingleParttimeModel, self).__init__(config)
         self.ConsumptionYearly		= profilegentools.gaussMinMax(2010,400)*self.config.consumptionFactor #kWh http://www.nibud.nl/uitgaven/huishouden/gas-elektriciteit-en-water.html
 
-        self.Persons = [ persons.PersonParttimeWorker(self.config, random.randint(26,65))]
+        self.Persons = [ persons.PersonParttimeWorker(self.config, rng.randint(26,65))]
 
         #For information about commuters, see this:
         #http://www.kimnet.nl/publicatie/mobiliteitsbalans-2013
@@ -481,16 +584,16 @@ class HouseholdSingleParttimeModel(HouseholdModel):
         #However 30 is also mentioned: http://www.nederlandheeftwerk.nl/index.php/cms_categorie/58707/bb/1/id/58707
         #Depends also on the region and work in vicinity.
 
-        if(random.randint(1,2) == 1):
-            self.Fridges = [ devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeBigMin,self.config.ConsumptionFridgeBigMax)) ]
+        if(rng.randint(1,2) == 1):
+            self.Fridges = [ devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeBigMin,self.config.ConsumptionFridgeBigMax)) ]
         else:
-            self.Fridges = [ devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)), devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)) ]
+            self.Fridges = [ devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)), devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)) ]
 
         #We synchronize the dishwasher and dryer based on the annual consumption. Furthermore, this also influences the number of washes.
-        self.hasDishwasher = random.randint(0,5) == 0 	#20%
+        self.hasDishwasher = rng.randint(0,5) == 0 	#20%
 
         #Determine washing days
-        self.generateWashingdays(random.randint(2,3))
+        self.generateWashingdays(rng.randint(2,3))
 
 
         #Dermine Dishwasher times
@@ -505,7 +608,7 @@ class HouseholdCoupleModel(HouseholdModel):
 
         assert(parttime == False or jobless == False) # ONLY one van be active
 
-        age = random.randint(26,65)
+        age = rng.randint(26,65)
         if parttime == True:
             self.Persons = [ persons.PersonWorker(self.config, age), persons.PersonParttimeWorker(self.config, age)]
         elif jobless == True:
@@ -514,18 +617,18 @@ class HouseholdCoupleModel(HouseholdModel):
             self.Persons = [ persons.PersonWorker(self.config, age), persons.PersonWorker(self.config, age)]
 
         #To make life easy, only one persons.Person will use the electric vehicle, so only the main persons.Person will receive a driving distance
-        self.Persons[0].setDistanceToWork(round(max(0, random.gauss(self.config.commuteDistanceMean, self.config.commuteDistanceSigma))))
+        self.Persons[0].setDistanceToWork(round(max(0, rng.gauss(self.config.commuteDistanceMean, self.config.commuteDistanceSigma))))
 
-        if(random.randint(1,2) == 1):
-            self.Fridges = [ devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeBigMin,self.config.ConsumptionFridgeBigMax)) ]
+        if(rng.randint(1,2) == 1):
+            self.Fridges = [ devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeBigMin,self.config.ConsumptionFridgeBigMax)) ]
         else:
-            self.Fridges = [ devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)), devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)) ]
+            self.Fridges = [ devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)), devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)) ]
 
 
-        self.hasDishwasher = random.randint(0,5) < 2 	#40%
+        self.hasDishwasher = rng.randint(0,5) < 2 	#40%
 
         #Determine washing days
-        self.generateWashingdays(random.randint(3,4))
+        self.generateWashingdays(rng.randint(3,4))
 
         #Dermine Dishwasher times
         if self.hasDishwasher:
@@ -542,29 +645,30 @@ class HouseholdFamilyDualParentModel(HouseholdModel):
     # Select whether the second adult is a fulltime worker (both false), parttime or jobless
     def __init__(self, config: configLoader.Config, parttime=False, jobless=False):
         super(HouseholdFamilyDualParentModel, self).__init__(config)
-        numKids = round(max(min(4, random.gauss(1.7, 0.4)), 1))	# http://www.cbs.nl/nl-NL/menu/themas/bevolking/faq/specifiek/faq-hoeveel-kinderen.htm
+        numKids = round(max(min(4, rng.gauss(1.7, 0.4)), 1))	# http://www.cbs.nl/nl-NL/menu/themas/bevolking/faq/specifiek/faq-hoeveel-kinderen.htm
 
         self.ConsumptionYearly		= profilegentools.gaussMinMax(2010+(700*numKids),500+(numKids*100))*self.config.consumptionFactor #kWh http://www.nibud.nl/uitgaven/huishouden/gas-elektriciteit-en-water.html
 
-        ageParents = random.randint(40,55)
+        ageParents = rng.randint(40,55)
         if parttime == True:
             self.Persons = [ persons.PersonWorker(self.config, ageParents), persons.PersonParttimeWorker(self.config, ageParents)]
         elif jobless == True:
             self.Persons = [ persons.PersonWorker(self.config, ageParents), persons.PersonJobless(self.config, ageParents)]
         else:
             self.Persons = [ persons.PersonWorker(self.config, ageParents)]
-            self.Persons.append(copy.deepcopy(self.Persons[0]))  #Make a copy, we expect a household to be rather synchronized!
+            # The copy shares the config, which holds objects that cannot be deep-copied (e.g. the astral Location)
+            self.Persons.append(copy.deepcopy(self.Persons[0], {id(self.config): self.config}))  #Make a copy, we expect a household to be rather synchronized!
 
         #To make life easy, only one persons.Person will use the electric vehicle, so only the main persons.Person will receive a driving distance
-        self.Persons[0].setDistanceToWork(round(max(0, random.gauss(self.config.commuteDistanceMean, self.config.commuteDistanceSigma))))
+        self.Persons[0].setDistanceToWork(round(max(0, rng.gauss(self.config.commuteDistanceMean, self.config.commuteDistanceSigma))))
 
         #now add the kids
         for i in range(0,numKids):
-            self.Persons.append(persons.PersonStudent(self.config, random.randint(ageParents-3,ageParents+3)-30))
+            self.Persons.append(persons.PersonStudent(self.config, rng.randint(ageParents-3,ageParents+3)-30))
 
-        self.Fridges = [ devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)), devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)) ]
+        self.Fridges = [ devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)), devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)) ]
 
-        self.hasDishwasher = random.randint(0,5) < 4 #60%
+        self.hasDishwasher = rng.randint(0,5) < 4 #60%
 
         #Determine washing days
         self.generateWashingdays(min(5+numKids, 7))
@@ -583,11 +687,11 @@ class HouseholdFamilyDualWorkerModel(HouseholdFamilyDualParentModel):
 class HouseholdFamilySingleParentModel(HouseholdModel):
     def __init__(self, config: configLoader.Config, parttime=False, jobless=False):
         super(HouseholdFamilySingleParentModel, self).__init__(config)
-        numKids = round(max(min(4, random.gauss(1.7, 0.4)), 1))	# http://www.cbs.nl/nl-NL/menu/themas/bevolking/faq/specifiek/faq-hoeveel-kinderen.htm
+        numKids = round(max(min(4, rng.gauss(1.7, 0.4)), 1))	# http://www.cbs.nl/nl-NL/menu/themas/bevolking/faq/specifiek/faq-hoeveel-kinderen.htm
 
         self.ConsumptionYearly		= profilegentools.gaussMinMax(3360+(700*numKids),500+(numKids*100))*self.config.consumptionFactor #kWh http://www.nibud.nl/uitgaven/huishouden/gas-elektriciteit-en-water.html
 
-        ageParents = random.randint(40,55)
+        ageParents = rng.randint(40,55)
         if parttime == True:
             self.Persons = [ persons.PersonParttimeWorker(self.config, ageParents) ]
         elif jobless == True:
@@ -597,15 +701,15 @@ class HouseholdFamilySingleParentModel(HouseholdModel):
 
         if not jobless:
             #To make life easy, only one persons.Person will use the electric vehicle, so only the main persons.Person will receive a driving distance
-            self.Persons[0].setDistanceToWork(round(max(0, random.gauss(self.config.commuteDistanceMean, self.config.commuteDistanceSigma))))
+            self.Persons[0].setDistanceToWork(round(max(0, rng.gauss(self.config.commuteDistanceMean, self.config.commuteDistanceSigma))))
 
         #now add the kids
         for i in range(0,numKids):
-            self.Persons.append(persons.PersonStudent(self.config, random.randint(ageParents-3,ageParents+3)-30))
+            self.Persons.append(persons.PersonStudent(self.config, rng.randint(ageParents-3,ageParents+3)-30))
 
-        self.Fridges = [ devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)), devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)) ]
+        self.Fridges = [ devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)), devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)) ]
 
-        self.hasDishwasher = random.randint(0,5) < 4 #60%
+        self.hasDishwasher = rng.randint(0,5) < 4 #60%
 
         #Determine washing days
         self.generateWashingdays(min(5+numKids, 7))
@@ -620,18 +724,18 @@ class HouseholdDualRetiredModel(HouseholdModel):
         super(HouseholdDualRetiredModel, self).__init__(config)
         self.ConsumptionYearly		= profilegentools.gaussMinMax(3360,600)*self.config.consumptionFactor #kWh http://www.nibud.nl/uitgaven/huishouden/gas-elektriciteit-en-water.html
 
-        age = random.triangular(65, 85, 70)
+        age = rng.triangular(65, 85, 70)
         self.Persons = [ persons.PersonRetired(self.config, age), persons.PersonRetired(self.config, age)]
 
-        if(random.randint(1,2) == 1):
-            self.Fridges = [ devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeBigMin,self.config.ConsumptionFridgeBigMax)) ]
+        if(rng.randint(1,2) == 1):
+            self.Fridges = [ devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeBigMin,self.config.ConsumptionFridgeBigMax)) ]
         else:
-            self.Fridges = [ devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)), devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)) ]
+            self.Fridges = [ devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)), devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)) ]
 
-        self.hasDishwasher = random.randint(0,5) < 3 #40%
+        self.hasDishwasher = rng.randint(0,5) < 3 #40%
 
         #Determine washing days
-        self.generateWashingdays(random.randint(3,4))
+        self.generateWashingdays(rng.randint(3,4))
 
         #Dermine Dishwasher times
         if self.hasDishwasher:
@@ -643,18 +747,18 @@ class HouseholdSingleRetiredModel(HouseholdModel):
         super(HouseholdSingleRetiredModel, self).__init__(config)
         self.ConsumptionYearly		= profilegentools.gaussMinMax(2010,400)*self.config.consumptionFactor #kWh http://www.nibud.nl/uitgaven/huishouden/gas-elektriciteit-en-water.html
 
-        age = random.triangular(65, 85, 70)
+        age = rng.triangular(65, 85, 70)
         self.Persons = [ persons.PersonRetired(self.config, age)]
 
-        if(random.randint(1,2) == 1):
-            self.Fridges = [ devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeBigMin,self.config.ConsumptionFridgeBigMax)) ]
+        if(rng.randint(1,2) == 1):
+            self.Fridges = [ devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeBigMin,self.config.ConsumptionFridgeBigMax)) ]
         else:
-            self.Fridges = [ devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)), devices.DeviceFridge(random.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)) ]
+            self.Fridges = [ devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)), devices.DeviceFridge(rng.randint(self.config.ConsumptionFridgeSmallMin,self.config.ConsumptionFridgeSmallMax)) ]
 
-        self.hasDishwasher = random.randint(0,5) < 3 #40%
+        self.hasDishwasher = rng.randint(0,5) < 3 #40%
 
         #Determine washing days
-        self.generateWashingdays(random.randint(2, 3))
+        self.generateWashingdays(rng.randint(2, 3))
 
         #Dermine Dishwasher times
         if self.hasDishwasher:
@@ -14,8 +14,8 @@
 #You should have received a copy of the GNU General Public License
 #along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import random
 
+from alpg import rng
 from alpg import configLoader
 from alpg import profilegentools
 
@@ -29,7 +29,7 @@ class House:
     def addPV(self, area):
         self.hasPV = True
         self.pvArea = area
-        self.pvEfficiency = random.randint(self.config.PVEfficiencyMin, self.config.PVEfficiencyMax)
+        self.pvEfficiency = rng.randint(self.config.PVEfficiencyMin, self.config.PVEfficiencyMax)
         self.pvAzimuth = profilegentools.gaussMinMax(self.config.PVAzimuthMean, self.config.PVAzimuthSigma)
         if(self.pvAzimuth < 0):
             self.pvAzimuth = self.pvAzimuth + 360
@@ -0,0 +1,279 @@
+#Copyright (C) 2023 University of Twente
+
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Persistent library of pre-simulated households (archetypes) and composition of neighbourhoods out of it.
+# For large neighbourhoods, only a limited number of archetypes per household type is simulated. Each household in
+# the neighbourhood is then drawn from these archetypes, after which its days are permuted (within the same weekday
+# and month) and its profiles are shifted by a few minutes to keep the diversity in the neighbourhood. Only the
+# assignment of technologies (PV, EV, batteries, heating) is done for every household, using neighbourhood().
+# Induction cooking changes the cooking events, so archetypes are simulated with and without it, and households are
+# drawn from the archetypes with the same induction cooking.
+
+import hashlib
+import json
+import logging
+import os
+from typing import Optional
+
+import numpy
+
+from alpg import rng
+from alpg import cache
+from alpg import configLoader
+from alpg import houses
+from alpg import neighbourhood
+from alpg.households import (HouseholdModel, ELECTRIC_VEHICLE_DEVICE, WASHING_MACHINE_DEVICE, DISHWASHER_DEVICE,
+                             THERMOSTAT_DEVICE)
+
+logger = logging.getLogger(__name__)
+
+
+# Config attributes which only influence the assignment of technologies and hence are not part of an archetype
+COMPOSITION_ATTRIBUTE_PREFIXES = ('penetration', 'capacity', 'power', 'PV', 'householdConfigs', 'seed', 'library')
+
+# Devices with start and end times that move along with the days of the archetype
+SESSION_DEVICES = (ELECTRIC_VEHICLE_DEVICE, WASHING_MACHINE_DEVICE, DISHWASHER_DEVICE)
+
+MAX_TIME_SHIFT = 15  # minutes
+
+
+def library_signature(config: configLoader.Config) -> str:
+    signature = {name: value for name, value in configLoader.canonical_config(config).items()
+                 if not name.startswith(COMPOSITION_ATTRIBUTE_PREFIXES)}
+    signature['weather'] = cache.file_digest(config.weather_irradiation)
+    # Entries stored with other result attributes cannot be restored
+    signature['attributes'] = list(cache.RESULT_ATTRIBUTES)
+    return hashlib.sha256(json.dumps(signature, sort_keys=True).encode()).hexdigest()
+
+
+def household_config_key(householdConfig) -> str:
+    return json.dumps(configLoader.canonical_value(householdConfig), sort_keys=True)
+
+
+class ProfileLibrary:
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+        self.index = []
+        if os.path.exists(self.index_file()):
+            with open(self.index_file()) as f:
+                self.index = json.load(f)
+
+    def index_file(self) -> str:
+        return os.path.join(self.directory, 'index.json')
+
+    def save_index(self) -> None:
+        with open(self.index_file() + '.tmp', 'w') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(self.index_file() + '.tmp', self.index_file())
+
+    def entries(self, signature: str, householdConfig, hasInductionCooking: Optional[bool] = None) -> list[dict]:
+        key = household_config_key(householdConfig)
+        return [entry for entry in self.index if entry['signature'] == signature and entry['householdConfig'] == key
+                and hasInductionCooking in (None, entry['attributes']['hasInductionCooking'])]
+
+    def add(self, signature: str, householdConfig, household: HouseholdModel) -> dict:
+        key = household_config_key(householdConfig)
+        number = len(self.entries(signature, householdConfig))
+        entry = {'id': hashlib.sha256((signature + key + str(number)).encode()).hexdigest(),
+                 'signature': signature,
+                 'householdConfig': key,
+                 'type': type(household).__name__,
+                 'attributes': {'numPersons': len(household.Persons),
+                                'ConsumptionYearly': household.ConsumptionYearly,
+                                'DistanceToWork': household.Persons[0].DistanceToWork,
+                                'hasDishwasher': household.hasDishwasher,
+                                'hasInductionCooking': household.hasInductionCooking}}
+        cache.dump_state(self.path(entry), cache.household_state(household))
+        self.index.append(entry)
+        self.save_index()
+        return entry
+
+    def path(self, entry: dict) -> str:
+        return os.path.join(self.directory, entry['id'] + '.pickle.z')
+
+    def load(self, entry: dict) -> dict:
+        return cache.load_state(self.path(entry))
+
+
+def simulate_archetype(config: configLoader.Config, householdConfig, seed: str, hasInductionCooking: bool) -> HouseholdModel:
+    rng.seed(seed)
+    household = householdConfig.to_model(config)
+    household.hasInductionCooking = hasInductionCooking
+
+    # Always generate EV sessions, composition decides whether the household actually has an EV
+    household.hasEV = True
+    household.Devices[ELECTRIC_VEHICLE_DEVICE].BufferCapacity = config.capacityEV
+    household.Devices[ELECTRIC_VEHICLE_DEVICE].Consumption = config.powerEV
+
+    # PV is added during composition
+    household.setHouse(houses.House(config))
+
+    household.simulate()
+    household.scaleProfile()
+    return household
+
+
+def fill_library(config: configLoader.Config, library: ProfileLibrary, archetypes: int, induction: list[bool]) -> None:
+    # Make sure that the library contains enough archetypes for all household configs in the config, with the induction
+    # cooking of the households (in the order of config.householdConfigs)
+    signature = library_signature(config)
+    needed = {(household_config_key(householdConfig), hasInductionCooking): householdConfig
+              for householdConfig, hasInductionCooking in zip(config.householdConfigs, induction)}
+    for (key, hasInductionCooking), householdConfig in needed.items():
+        for num in range(len(library.entries(signature, householdConfig, hasInductionCooking)), archetypes):
+            logger.info("Simulating archetype " + str(num + 1) + " of " + str(archetypes) + " for " + type(householdConfig).__name__ +
+                        (" with" if hasInductionCooking else " without") + " induction cooking")
+            # Numbered over all archetypes of the household config, such that every archetype has its own seed
+            number = len(library.entries(signature, householdConfig))
+            household = simulate_archetype(config, householdConfig, str(config.seed) + '-' + key + '-' + str(number), hasInductionCooking)
+            library.add(signature, householdConfig, household)
+
+
+def day_permutation(config: configLoader.Config) -> numpy.ndarray:
+    # Days are only swapped with the same weekday within the same 4 weeks, such that week patterns and seasons remain
+    permutation = numpy.arange(config.numDays)
+    for blockStart in range(0, config.numDays, 28):
+        for weekday in range(0, 7):
+            days = list(range(blockStart + weekday, min(blockStart + 28, config.numDays), 7))
+            shuffled = list(days)
+            rng.shuffle(shuffled)
+            permutation[days] = shuffled
+    return permutation
+
+
+def shift_profile(profile: numpy.ndarray, shift: int) -> numpy.ndarray:
+    # Moves the profile shift minutes later (earlier when negative). The first (last) value is repeated at the edge of
+    # the horizon instead of wrapping around, in the same way as permute_sessions() drops the sessions moved outside it
+    if shift > 0:
+        return numpy.concatenate((numpy.repeat(profile[:1], shift), profile[:-shift]))
+    if shift < 0:
+        return numpy.concatenate((profile[-shift:], numpy.repeat(profile[-1:], -shift)))
+    return profile
+
+
+def permute_profile(profile, permutation: numpy.ndarray, shift: int) -> list:
+    profile = numpy.asarray(profile).reshape(len(permutation), 1440)[permutation].ravel()
+    return shift_profile(profile, shift).tolist()
+
+
+def permute_sessions(device, config: configLoader.Config, newDay: numpy.ndarray, shift: int) -> None:
+    # Move every session along with the day it starts on and drop sessions that overlap after moving them
+    parallel = [attr for attr in ('EnergyLoss', 'Setpoint') if len(getattr(device, attr, [])) == len(device.StartTimes)]
+    sessions = []
+    for i in range(0, len(device.StartTimes)):
+        day = device.StartTimes[i] // 1440 - config.startDay
+        offset = (newDay[day] - day) * 1440 + shift
+        sessions.append((device.StartTimes[i] + offset, device.EndTimes[i] + offset, [getattr(device, attr)[i] for attr in parallel]))
+    sessions.sort(key=lambda session: session[0])
+
+    horizonStart = config.startDay * 1440
+    horizonEnd = (config.startDay + config.numDays) * 1440
+    device.StartTimes = []
+    device.EndTimes = []
+    for attr in parallel:
+        setattr(device, attr, [])
+    for start, end, values in sessions:
+        if start < horizonStart or end > horizonEnd or (len(device.EndTimes) > 0 and start <= device.EndTimes[-1]):
+            continue
+        device.StartTimes.append(int(start))
+        device.EndTimes.append(int(end))
+        for attr, value in zip(parallel, values):
+            getattr(device, attr).append(value)
+
+
+def permute_thermostat(thermostat, config: configLoader.Config, permutation: numpy.ndarray, shift: int) -> None:
+    horizonStart = config.startDay * 1440
+    starts = numpy.asarray(thermostat.StartTimes) - horizonStart
+    setpoints = numpy.asarray(thermostat.Setpoints)
+    profile = setpoints[numpy.searchsorted(starts, numpy.arange(config.numDays * 1440), side='right') - 1]
+    profile = numpy.asarray(permute_profile(profile, permutation, shift))
+    edges = numpy.flatnonzero(numpy.diff(profile)) + 1
+    thermostat.StartTimes = [0] + (edges + horizonStart).tolist()
+    thermostat.Setpoints = [float(profile[0])] + profile[edges].tolist()
+
+
+def diversify(household: HouseholdModel, config: configLoader.Config) -> None:
+    permutation = day_permutation(config)
+    newDay = numpy.argsort(permutation)
+    shift = rng.randint(-MAX_TIME_SHIFT, MAX_TIME_SHIFT)
+
+    # The reactive power and the heat gain of devices follow the permuted consumption
+    for channels in (household.Consumption, household.StoredHeatGain, household.HeatDemand):
+        for name in channels:
+            if len(channels[name]) == config.numDays * 1440:
+                channels[name] = permute_profile(channels[name], permutation, shift)
+    household.Occupancy = permute_profile(household.Occupancy, permutation, shift)
+
+    # The device events and fridge cycles no longer match the permuted profiles, writers fall back to the profiles
+    household.DeviceEvents = None
+    household.FridgeCycles = None
+
+    for name in SESSION_DEVICES:
+        permute_sessions(household.Devices[name], config, newDay, shift)
+    permute_thermostat(household.HeatingDevices[THERMOSTAT_DEVICE], config, permutation, shift)
+
+
+def compose(config: configLoader.Config, library: ProfileLibrary) -> None:
+    # Replaces the simulation of all households in config.householdList by archetypes out of the library
+    # Induction cooking is assigned first, as it determines the archetypes a household can be drawn from
+    rng.seed(str(config.seed) + '-induction')
+    neighbourhood.assignInductionCooking(config)
+    householdList = list(config.householdList)
+    induction = [household.hasInductionCooking for household in householdList]
+
+    fill_library(config, library, getattr(config, 'libraryArchetypes', 10), induction)
+    signature = library_signature(config)
+
+    rng.seed(config.seed)
+    numOfHouseholds = len(config.householdList)
+    # Each archetype is read from the library once, the households drawn from it get a copy
+    states = {}
+    for hnum, (household, householdConfig) in enumerate(zip(config.householdList, config.householdConfigs)):
+        logger.info("Composing household " + str(hnum + 1) + " of " + str(numOfHouseholds))
+        entry = rng.choice(library.entries(signature, householdConfig, induction[hnum]))
+        if entry['id'] not in states:
+            states[entry['id']] = library.load(entry)
+        cache.restore_household_state(household, cache.copy_state(states[entry['id']]))
+
+        # Attributes used by the assignment of technologies
+        household.ConsumptionYearly = entry['attributes']['ConsumptionYearly']
+        household.Persons[0].DistanceToWork = entry['attributes']['DistanceToWork']
+        household.hasDishwasher = entry['attributes']['hasDishwasher']
+        household.hasEV = False
+        household.Devices[ELECTRIC_VEHICLE_DEVICE].BufferCapacity = 0
+        household.Devices[ELECTRIC_VEHICLE_DEVICE].Consumption = 0
+
+        diversify(household, config)
+
+    neighbourhood.neighbourhood(config)
+
+    # Keep the induction cooking of the archetypes, neighbourhood() assigns it again
+    for household, hasInductionCooking in zip(householdList, induction):
+        household.hasInductionCooking = hasInductionCooking
+
+    for household in config.householdList:
+        ev = household.Devices[ELECTRIC_VEHICLE_DEVICE]
+        if household.hasEV:
+            ev.EnergyLoss = [min(energyLoss, ev.BufferCapacity) for energyLoss in ev.EnergyLoss]
+        else:
+            ev.StartTimes = []
+            ev.EndTimes = []
+            ev.EnergyLoss = []
+            ev.Setpoint = []
+
+        if household.House.hasPV:
+            household.PVProfile = household.Devices['PVPanel'].simulate(config, config.startDay, config.numDays*((3600*24)/60), household.House.pvArea, household.House.pvEfficiency, household.House.pvAzimuth, household.House.pvElevation)
@@ -14,98 +14,91 @@
 #You should have received a copy of the GNU General Public License
 #along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import random
+import logging
 
+from alpg import rng
 from alpg.configLoader import Config
 from alpg import houses
 from alpg.households import ELECTRIC_VEHICLE_DEVICE
 
+logger = logging.getLogger(__name__)
+
+
+def sampleIndices(eligible, num):
+    # Random selection of num distinct indices out of the eligible ones. At most all eligible indices are returned,
+    # where rejection sampling used to loop forever.
+    return rng.sample(eligible, min(max(0, num), len(eligible)))
+
+
+def assignInductionCooking(config: Config) -> None:
+    # Induction cooking on top of the households that already cook on induction, see penetrationInductioncooking
+    numOfHouseholds = len(config.householdList)
+    numOfInductioncooking = round(numOfHouseholds*(config.penetrationInductioncooking/100))
+    inductioncookingList = [1] * numOfInductioncooking + [0] * (numOfHouseholds - numOfInductioncooking)
+    rng.shuffle(inductioncookingList)
+    for i in range(0, numOfHouseholds):
+        if inductioncookingList[i] == 1:
+            config.householdList[i].hasInductionCooking = True
+
 
 def neighbourhood(config: Config) -> None:
-    print("Creating Neighbourhood")
-    houseList = []
-    pvList = [0] * len(config.householdList)
-    batteryList = [0] * len(config.householdList)
-    inductioncookingList = [0] * len(config.householdList)
-
-    for i in range(0, len(config.householdList)):
-        houseList.append(houses.House(config))
-    
+    logger.info("Creating Neighbourhood")
+    numOfHouseholds = len(config.householdList)
+    houseList = [houses.House(config) for i in range(0, numOfHouseholds)]
+    batteryList = [0] * numOfHouseholds
+
     #Add PV to houses:
-    for i in range(0, len(config.householdList)):
-        if i < (round(len(config.householdList)*(config.penetrationPV/100))):
-            pvList[i] = 1
-    
+    numOfPV = round(numOfHouseholds*(config.penetrationPV/100))
+    pvList = [1] * numOfPV + [0] * (numOfHouseholds - numOfPV)
+
     #And randomize:
-    random.shuffle(pvList)
+    rng.shuffle(pvList)
 
     #Add induction cooking
-    for i in range(0, len(config.householdList)):
-        if i < (round(len(config.householdList)*(config.penetrationInductioncooking/100))):
-            inductioncookingList[i] = 1
-    random.shuffle(inductioncookingList)
-    for i in range(0, len(config.householdList)):
-        if inductioncookingList[i] == 1:
-            config.householdList[i].hasInductionCooking = True
-    
+    assignInductionCooking(config)
+
     # Add Combined Heat Power
-    i = 0
-    while i < (round(len(config.householdList)*(config.penetrationCHP/100))) - (round(len(config.householdList)*(config.penetrationPV/100))):
-        j = random.randint(0,len(config.householdList)-1)
-        if config.householdList[j].hasCHP == False and pvList[j] == 0: # First supply houses without PV
+    # Note that all technologies below are allocated by sampling without replacement from the eligible houses
+    numOfCHP = round(numOfHouseholds*(config.penetrationCHP/100))
+
+    # First supply houses without PV
+    eligible = [j for j in range(0, numOfHouseholds) if pvList[j] == 0]
+    for j in sampleIndices(eligible, numOfCHP - numOfPV):
+        config.householdList[j].hasCHP = True
+    if numOfPV > numOfCHP: # If there are too much CHPs compared to PV, add some more CHPS
+        eligible = [j for j in range(0, numOfHouseholds) if not config.householdList[j].hasCHP]
+        for j in sampleIndices(eligible, numOfCHP):
             config.householdList[j].hasCHP = True
-            i = i + 1
-    if (round(len(config.householdList)*(config.penetrationPV/100))) > (round(len(config.householdList)*(config.penetrationCHP/100))): # If there are too much CHPs compared to PV, add some more CHPS
-        while i < (round(len(config.householdList)*(config.penetrationCHP/100))):
-            j = random.randint(0,len(config.householdList)-1)
-            if config.householdList[j].hasCHP == False: # First supply houses without PV
-                config.householdList[j].hasCHP = True
-                i = i + 1
-            
+
     # Add heat pumps
-    i = 0
-    while i < (round(len(config.householdList)*(config.penetrationHeatPump/100))):
-        j = random.randint(0,len(config.householdList)-1)
-        if config.householdList[j].hasHP == False and config.householdList[j].hasCHP == False:
-            config.householdList[j].hasHP = True
-            i = i + 1
+    eligible = [j for j in range(0, numOfHouseholds) if not config.householdList[j].hasHP and not config.householdList[j].hasCHP]
+    for j in sampleIndices(eligible, round(numOfHouseholds*(config.penetrationHeatPump/100))):
+        config.householdList[j].hasHP = True
 
     #Now add batteries
-    i = 0
-    while i < (round(len(config.householdList)*(config.penetrationBattery/100))):
-        j = random.randint(0,len(config.householdList)-1)
-        if (pvList[j] == 1 or config.householdList[j].hasCHP) and batteryList[j] == 0:
-            batteryList[j] = 1
-            i = i + 1
+    eligible = [j for j in range(0, numOfHouseholds) if (pvList[j] == 1 or config.householdList[j].hasCHP) and batteryList[j] == 0]
+    for j in sampleIndices(eligible, round(numOfHouseholds*(config.penetrationBattery/100))):
+        batteryList[j] = 1
 
     # Add EVs
-    drivingDistance = [0] * len(config.householdList)
-    for i in range(0, len(config.householdList)):
-        drivingDistance[i] = config.householdList[i].Persons[0].DistanceToWork
-        drivingDistance = sorted(drivingDistance, reverse=True)
-    for i in range(0, len(drivingDistance)):
-        if i < (round(len(config.householdList)*(config.penetrationEV/100))+round(len(config.householdList)*(config.penetrationPHEV/100))):
-            #We can still add an EV
-            added = False
-            j = 0
-            while added == False:
-                if config.householdList[j].Persons[0].DistanceToWork == drivingDistance[i]:
-                    if config.householdList[j].hasEV == False:
-                        if i < (round(len(config.householdList)*(config.penetrationEV/100))):
-                            config.householdList[j].Devices[ELECTRIC_VEHICLE_DEVICE].BufferCapacity = config.capacityEV
-                            config.householdList[j].Devices[ELECTRIC_VEHICLE_DEVICE].Consumption = config.powerEV
-                        else:
-                            config.householdList[j].Devices[ELECTRIC_VEHICLE_DEVICE].BufferCapacity = config.capacityPHEV
-                            config.householdList[j].Devices[ELECTRIC_VEHICLE_DEVICE].Consumption = config.powerPHEV
-                        config.householdList[j].hasEV = True
-                        added = True
-                j = j + 1
-    
+    # Households with larger driving distances receive EVs first, ties are resolved in order of the household list
+    numOfEV = round(numOfHouseholds*(config.penetrationEV/100))
+    numOfPHEV = round(numOfHouseholds*(config.penetrationPHEV/100))
+    drivingOrder = sorted(range(0, numOfHouseholds), key=lambda j: config.householdList[j].Persons[0].DistanceToWork, reverse=True)
+    for i, j in enumerate(drivingOrder[:numOfEV+numOfPHEV]):
+        if i < numOfEV:
+            config.householdList[j].Devices[ELECTRIC_VEHICLE_DEVICE].BufferCapacity = config.capacityEV
+            config.householdList[j].Devices[ELECTRIC_VEHICLE_DEVICE].Consumption = config.powerEV
+        else:
+            config.householdList[j].Devices[ELECTRIC_VEHICLE_DEVICE].BufferCapacity = config.capacityPHEV
+            config.householdList[j].Devices[ELECTRIC_VEHICLE_DEVICE].Consumption = config.powerPHEV
+        config.householdList[j].hasEV = True
+
     #Shuffle
-    random.shuffle(config.householdList)
+    rng.shuffle(config.householdList)
         
     #And then map households to houses
-    for i in range(0,len(config.householdList)):
+    for i in range(0, numOfHouseholds):
         config.householdList[i].setHouse(houseList[i])
         #add solar panels according to the size of the annual consumption:
         if pvList[i] == 1:
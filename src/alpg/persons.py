@@ -15,8 +15,8 @@
 #along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-import random
 
+from alpg import rng
 from alpg import configLoader
 from alpg import profilegentools
 
@@ -39,7 +39,7 @@ class Person:
         self.WorkdaySportDuration_Variate 	= 10
         self.WorkdayBedTime_Avg				= self.WorkdayWakeUp_Avg + profilegentools.gaussMinMax(15.5*60,30)
         self.WorkdayBedTime_Variate			= 15
-        self.WorkdayActivities 				= random.randint(config.personWeekdayActivityChanceMin, config.personWeekdayActivityChanceMax) / 100 #Chance to conduct random activities
+        self.WorkdayActivities 				= rng.randint(config.personWeekdayActivityChanceMin, config.personWeekdayActivityChanceMax) / 100 #Chance to conduct random activities
 
         self.WeekendWakeUp_Avg 				= profilegentools.gaussMinMax(9*60, 2*60)
         self.WeekendWakeUp_Variate 			= 20
@@ -49,11 +49,11 @@ class Person:
         self.WeekendSportDuration_Variate 	= 30
         self.WeekendBedTime_Avg				= profilegentools.gaussMinMax(23*60, 30)
         self.WeekendBedTime_Variate			= 10
-        self.WeekendActivities				= random.randint(config.personWeekendActivityChanceMin, config.personWeekendActivityChanceMax) / 100
+        self.WeekendActivities				= rng.randint(config.personWeekendActivityChanceMin, config.personWeekendActivityChanceMax) / 100
 
         #For a new deepcopy, the following values should be regenerated
-        self.WorkdaySportday = 1 + random.randint(1,5)
-        self.WeekendSportday = 6*random.randint(0,1)
+        self.WorkdaySportday = 1 + rng.randint(1,5)
+        self.WeekendSportday = 6*rng.randint(0,1)
         self.Workdays = range(1,6)
         self.DistanceToWork  = 0
 
@@ -68,24 +68,24 @@ class Person:
         self.generateHeatParams()
 
     # def generateActivity(self):
-    # 	self.WorkdaySportday = 1 + random.randint(1,5)
-    # 	self.WeekendSportday = 6 + random.randint(0,1)
+    # 	self.WorkdaySportday = 1 + rng.randint(1,5)
+    # 	self.WeekendSportday = 6 + rng.randint(0,1)
 
     def generateWorkdays(self, days):
-        self.Workdays = random.sample(range(1, 6), days)
+        self.Workdays = rng.sample(range(1, 6), days)
 
     def generateHeatParams(self):
         # Thermostat setpoint preference
         if self.Age > 80:
-            self.thermostatSetpoint = random.randint(int(21*2), int(24*2)) / 2.0
+            self.thermostatSetpoint = rng.randint(int(21*2), int(24*2)) / 2.0
         elif self.Age > 75:
-            self.thermostatSetpoint = random.randint(int(20.5*2), int(23*2)) / 2.0
+            self.thermostatSetpoint = rng.randint(int(20.5*2), int(23*2)) / 2.0
         elif self.Age > 65:
-            self.thermostatSetpoint = random.randint(int(20*2), int(22.5*2)) / 2.0
+            self.thermostatSetpoint = rng.randint(int(20*2), int(22.5*2)) / 2.0
         elif self.Age > 50:
-            self.thermostatSetpoint = random.randint(int(19*2), int(21.5*2)) / 2.0
+            self.thermostatSetpoint = rng.randint(int(19*2), int(21.5*2)) / 2.0
         else:
-            self.thermostatSetpoint = random.randint(int(18.5*2), int(20.5*2)) / 2.0
+            self.thermostatSetpoint = rng.randint(int(18.5*2), int(20.5*2)) / 2.0
 
         # Heat production by person, see ASHRAE chapter 18
         self.heatGeneration = 120 # int(130*(92.5)) #Watts. Note that we lack male/female differnce
@@ -94,25 +94,25 @@ class Person:
 
         # Showering schedule
         # More info: E.J.M. Blokker, "Stochastic water demand modelling for a better understanding of hydraulics in water distribution networks". PhD Thesis TU Delft, 2010
-        numOfShowerDays = random.randint(4, 6)
+        numOfShowerDays = rng.randint(4, 6)
         if self.Age > 40:
-            numOfShowerDays -= max(3, random.randint(1, 2)) #Minum of 3x per week
+            numOfShowerDays -= max(3, rng.randint(1, 2)) #Minum of 3x per week
         else:
-            numOfShowerDays += random.randint(0, 1) # Younger people shower a bit more often
+            numOfShowerDays += rng.randint(0, 1) # Younger people shower a bit more often
         # Now select the days
-        self.showerDays = random.sample(self.showerDays, numOfShowerDays)
+        self.showerDays = rng.sample(self.showerDays, numOfShowerDays)
 
         # Preferred shower time:
         # 65% showers in the morning:
         self.showerMorning = True
-        r = random.randint(0, 100)
+        r = rng.randint(0, 100)
         if r >= 65:
             self.showerMorning = False
 
         # Shower time, avg = 8 minutes
         if self.Age >= 10 and self.Age <= 20:
             # Teens shower (much) longer:
-            self.showerDuration += random.randint(5, 10)
+            self.showerDuration += rng.randint(5, 10)
 
 
 
@@ -127,26 +127,26 @@ class Person:
     def simulateWorkday(self, day):
         #select variables
         eventList = []
-        self.WorkdayWakeUp = random.randint((self.WorkdayWakeUp_Avg - self.WorkdayWakeUp_Variate), (self.WorkdayWakeUp_Avg + self.WorkdayWakeUp_Variate))
+        self.WorkdayWakeUp = rng.randint((self.WorkdayWakeUp_Avg - self.WorkdayWakeUp_Variate), (self.WorkdayWakeUp_Avg + self.WorkdayWakeUp_Variate))
         eventList.append(self.WorkdayWakeUp)
-        self.WorkdayLeave = random.randint((self.WorkdayLeave_Avg - self.WorkdayLeave_Variate), (self.WorkdayLeave_Avg + self.WorkdayLeave_Variate))
+        self.WorkdayLeave = rng.randint((self.WorkdayLeave_Avg - self.WorkdayLeave_Variate), (self.WorkdayLeave_Avg + self.WorkdayLeave_Variate))
         eventList.append(self.WorkdayLeave)
-        self.WorkdayArrival = random.randint((self.WorkdayArrival_Avg - self.WorkdayArrival_Variate), (self.WorkdayArrival_Avg + self.WorkdayArrival_Variate))
+        self.WorkdayArrival = rng.randint((self.WorkdayArrival_Avg - self.WorkdayArrival_Variate), (self.WorkdayArrival_Avg + self.WorkdayArrival_Variate))
         eventList.append(self.WorkdayArrival)
 
         if ((day%7) == self.WorkdaySportday):
             #Today this person will go to sport or have an activity. Times are synchronized to keep it easy
-            self.WorkdayActivity = random.randint((self.WorkdaySport_Avg - self.WorkdaySport_Variate), (self.WorkdaySport_Avg + self.WorkdaySport_Variate))
+            self.WorkdayActivity = rng.randint((self.WorkdaySport_Avg - self.WorkdaySport_Variate), (self.WorkdaySport_Avg + self.WorkdaySport_Variate))
             eventList.append(self.WorkdayActivity)
-            self.WorkdayActivityEnd = self.WorkdayActivity + random.randint((self.WorkdaySportDuration_Avg - self.WorkdaySportDuration_Variate), (self.WorkdaySportDuration_Avg + self.WorkdaySportDuration_Variate))
+            self.WorkdayActivityEnd = self.WorkdayActivity + rng.randint((self.WorkdaySportDuration_Avg - self.WorkdaySportDuration_Variate), (self.WorkdaySportDuration_Avg + self.WorkdaySportDuration_Variate))
             eventList.append(self.WorkdayActivityEnd)
-        elif (random.random() < self.WorkdayActivities):
-            self.WorkdayActivity = random.randint((self.WorkdaySport_Avg - self.WorkdaySport_Variate), (self.WorkdaySport_Avg + self.WorkdaySport_Variate))
+        elif (rng.random() < self.WorkdayActivities):
+            self.WorkdayActivity = rng.randint((self.WorkdaySport_Avg - self.WorkdaySport_Variate), (self.WorkdaySport_Avg + self.WorkdaySport_Variate))
             eventList.append(self.WorkdayActivity)
-            self.WorkdayActivityEnd = self.WorkdayActivity + random.randint((self.WorkdaySportDuration_Avg - self.WorkdaySportDuration_Variate), (self.WorkdaySportDuration_Avg + self.WorkdaySportDuration_Variate))
+            self.WorkdayActivityEnd = self.WorkdayActivity + rng.randint((self.WorkdaySportDuration_Avg - self.WorkdaySportDuration_Variate), (self.WorkdaySportDuration_Avg + self.WorkdaySportDuration_Variate))
             eventList.append(self.WorkdayActivityEnd)
 
-        self.WorkdayBedTime = min(1439, random.randint((self.WorkdayBedTime_Avg - self.WorkdayBedTime_Variate), (self.WorkdayBedTime_Avg + self.WorkdayBedTime_Variate)))
+        self.WorkdayBedTime = min(1439, rng.randint((self.WorkdayBedTime_Avg - self.WorkdayBedTime_Variate), (self.WorkdayBedTime_Avg + self.WorkdayBedTime_Variate)))
         eventList.append(self.WorkdayBedTime)
 
         active = 0 #start asleep
@@ -166,46 +166,46 @@ class Person:
 
         #basically this simulates a free day. On normal days one will wake up more early
         if((day%7)==0 or (day%7)==6):
-            self.WeekendWakeUp = random.randint((self.WeekendWakeUp_Avg - self.WeekendWakeUp_Variate), (self.WeekendWakeUp_Avg + self.WeekendWakeUp_Variate))
+            self.WeekendWakeUp = rng.randint((self.WeekendWakeUp_Avg - self.WeekendWakeUp_Variate), (self.WeekendWakeUp_Avg + self.WeekendWakeUp_Variate))
         else:
             #Day off, get out of bed earlier
-            self.WeekendWakeUp = random.randint((self.WeekendWakeUp_Avg - self.WeekendWakeUp_Variate - 60), (self.WeekendWakeUp_Avg + self.WeekendWakeUp_Variate - 60))
+            self.WeekendWakeUp = rng.randint((self.WeekendWakeUp_Avg - self.WeekendWakeUp_Variate - 60), (self.WeekendWakeUp_Avg + self.WeekendWakeUp_Variate - 60))
         eventList.append(self.WeekendWakeUp)
 
         if (((day%7) == self.WeekendSportday)):
             #Today this person will go to sport or have an activity. Times are synchronized to keep it easy
-            self.WeekendActivity = random.randint((self.WeekendSport_Avg - self.WeekendSport_Variate), (self.WeekendSport_Avg + self.WeekendSport_Variate))
+            self.WeekendActivity = rng.randint((self.WeekendSport_Avg - self.WeekendSport_Variate), (self.WeekendSport_Avg + self.WeekendSport_Variate))
             eventList.append(self.WeekendActivity)
-            self.WeekendActivityEnd = self.WeekendActivity + random.randint((self.WeekendSportDuration_Avg - self.WeekendSportDuration_Variate), (self.WeekendSportDuration_Avg + self.WeekendSportDuration_Variate))
+            self.WeekendActivityEnd = self.WeekendActivity + rng.randint((self.WeekendSportDuration_Avg - self.WeekendSportDuration_Variate), (self.WeekendSportDuration_Avg + self.WeekendSportDuration_Variate))
             eventList.append(self.WeekendActivityEnd)
         elif ((day%7) == self.WorkdaySportday):
             #Today this person will go to sport or have an activity. Times are synchronized to keep it easy
-            self.WorkdayActivity = random.randint((self.WorkdaySport_Avg - self.WorkdaySport_Variate), (self.WorkdaySport_Avg + self.WorkdaySport_Variate))
+            self.WorkdayActivity = rng.randint((self.WorkdaySport_Avg - self.WorkdaySport_Variate), (self.WorkdaySport_Avg + self.WorkdaySport_Variate))
             eventList.append(self.WorkdayActivity)
-            self.WorkdayActivityEnd = self.WorkdayActivity + random.randint((self.WorkdaySportDuration_Avg - self.WorkdaySportDuration_Variate), (self.WorkdaySportDuration_Avg + self.WorkdaySportDuration_Variate))
+            self.WorkdayActivityEnd = self.WorkdayActivity + rng.randint((self.WorkdaySportDuration_Avg - self.WorkdaySportDuration_Variate), (self.WorkdaySportDuration_Avg + self.WorkdaySportDuration_Variate))
             eventList.append(self.WorkdayActivityEnd)
-        elif (random.random() < self.WeekendActivities):
-            duration = random.randint(90,8*60)
+        elif (rng.random() < self.WeekendActivities):
+            duration = rng.randint(90,8*60)
             if duration > 6*60:
                 #all-day event
-                if random.randint(0,1) == 0: #Note: For retired people we might need to add a restriction here
-                    self.WeekendActivity = self.WeekendWakeUp + random.randint(60,90)
+                if rng.randint(0,1) == 0: #Note: For retired people we might need to add a restriction here
+                    self.WeekendActivity = self.WeekendWakeUp + rng.randint(60,90)
                 else:
-                    self.WeekendActivity = random.randint(13*60,15*60)
+                    self.WeekendActivity = rng.randint(13*60,15*60)
             elif duration > 3*60:
                 #Afternoon activity
-                self.WeekendActivity = random.randint(14*60,15*60)
-            elif random.randint(0,1) == 0:
+                self.WeekendActivity = rng.randint(14*60,15*60)
+            elif rng.randint(0,1) == 0:
                 #Morning event
-                self.WeekendActivity = self.WeekendWakeUp + random.randint(60,90)
+                self.WeekendActivity = self.WeekendWakeUp + rng.randint(60,90)
             else:
                 #night event
-                self.WeekendActivity = random.randint(20*60,21*60)
+                self.WeekendActivity = rng.randint(20*60,21*60)
             eventList.append(self.WeekendActivity)
             self.WeekendActivityEnd = self.WeekendActivity + duration
             eventList.append(self.WeekendActivityEnd)
 
-        self.WeekendBedTime = random.randint((self.WeekendBedTime_Avg - self.WeekendBedTime_Variate), (self.WeekendBedTime_Avg + self.WeekendBedTime_Variate))
+        self.WeekendBedTime = rng.randint((self.WeekendBedTime_Avg - self.WeekendBedTime_Variate), (self.WeekendBedTime_Avg + self.WeekendBedTime_Variate))
         eventList.append(self.WeekendBedTime)
 
         active = 0 #start asleep
@@ -223,7 +223,7 @@ class Person:
 
     def simulate(self, day):
         if (day%7) in self.Workdays:
-            if((day%7)==0 or (day%7)==6 or random.randint(0,(100-len(self.Workdays)*10))==0):
+            if((day%7)==0 or (day%7)==6 or rng.randint(0,(100-len(self.Workdays)*10))==0):
                 return self.simulateWeekend(day)
             else:
                 return self.simulateWorkday(day)
@@ -235,7 +235,7 @@ class PersonWorker(Person):
     def __init__(self, config: configLoader.Config, age):
         super(PersonWorker, self).__init__(config, age)
 
-        if age>55 or random.randint(0,2)==0: #Older people can get a day off sometimes, such as BAPO in the education. Furthermore 33% has a home working day: http://www.kamer033.nl/nieuws/in-8-tips-een-productieve-thuiswerkdag/
+        if age>55 or rng.randint(0,2)==0: #Older people can get a day off sometimes, such as BAPO in the education. Furthermore 33% has a home working day: http://www.kamer033.nl/nieuws/in-8-tips-een-productieve-thuiswerkdag/
             self.generateWorkdays(4)
         else:
             self.generateWorkdays(5)
@@ -245,7 +245,7 @@ class PersonParttimeWorker(Person):
     def __init__(self, config: configLoader.Config, age):
         super(PersonParttimeWorker, self).__init__(config, age)
 
-        self.generateWorkdays(random.randint(2,3))
+        self.generateWorkdays(rng.randint(2,3))
 
 
 class PersonStudent(Person):
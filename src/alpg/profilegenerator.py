@@ -17,35 +17,62 @@
 
 
 import os
-import random
+import sys
+import logging
 from types import ModuleType
+from typing import Callable, Optional
 
+from alpg import rng
+from alpg import cache
 from alpg import configLoader
+from alpg import library
 from alpg import neighbourhood
-from alpg.writer import AbstractWriter, PandasWriter, DEMKitWriter
+from alpg import sweep
+from alpg.households import renderTimeshiftable, renderElectricVehicles
+from alpg.writer import AbstractWriter, ArrayWriter, BackgroundWriter, NeighbourhoodResult, TIMESHIFTABLE_CHANNELS, ELECTRIC_VEHICLE_CHANNELS
 
 Writer = ModuleType
 
+logger = logging.getLogger(__name__)
+
+# Number of households of which the timeshiftable devices and EVs are rendered at once
+RENDER_BATCH = 16
+
+
+def prepare_output_directory(cmd_options: configLoader.CommandLineOptions, outputDir: Optional[str] = None) -> None:
+    if outputDir is None:
+        outputDir = cmd_options.cfgOutputDir
 
-def prepare_output_directory(cmd_options: configLoader.CommandLineOptions) -> None:
     # Check if the output dir exists, otherwise make it
-    os.makedirs(os.path.dirname(cmd_options.cfgOutputDir), exist_ok=True)
+    os.makedirs(os.path.dirname(outputDir), exist_ok=True)
 
-    if os.listdir(cmd_options.cfgOutputDir):
+    if os.listdir(outputDir):
         # Empty the directory
         if cmd_options.forceDeletion:
-            for tf in os.listdir(cmd_options.cfgOutputDir):
-                fp = os.path.join(cmd_options.cfgOutputDir, tf)
+            for tf in os.listdir(outputDir):
+                fp = os.path.join(outputDir, tf)
                 try:
                     if os.path.isfile(fp):
                         os.unlink(fp)
                 except Exception as e:
-                    print(e, flush=True)
+                    logger.warning(e)
         else:
             print("Output directory is not empty! Provide the --force flag to delete the contents", flush=True)
             exit()
 
 
+def render_devices(config: configLoader.Config, households: list) -> None:
+    # Optional stage rendering the runs of the washing machines and dishwashers and the charging of EVs, see
+    # renderTimeshiftable and renderElectricVehicles in the config. Skipped when none of their channels is selected by outputs
+    if len(households) == 0:
+        return
+    method = getattr(config, 'renderTimeshiftable', None)
+    if method is not None and configLoader.outputSelected(config, TIMESHIFTABLE_CHANNELS):
+        renderTimeshiftable(households, config.startDay, config.numDays*1440, method)
+    if getattr(config, 'renderElectricVehicles', False) and configLoader.outputSelected(config, ELECTRIC_VEHICLE_CHANNELS):
+        renderElectricVehicles(households, config.startDay, config.numDays*1440)
+
+
 def write_output(config: configLoader.Config) -> AbstractWriter:
     # Create empty files
     config.writer.createEmptyFiles()
@@ -55,16 +82,21 @@ def write_output(config: configLoader.Config) -> AbstractWriter:
 
     config.writer.writeNeighbourhood(hnum)
     for household in config.householdList:
-        print("Writing Household "+str(hnum+1)+" of "+str(numOfHouseholds), flush=True)
+        if hnum % RENDER_BATCH == 0:
+            render_devices(config, config.householdList[hnum:hnum+RENDER_BATCH])
+        logger.info("Writing Household "+str(hnum+1)+" of "+str(numOfHouseholds))
         config.writer.writeHousehold(config, household, hnum)
         hnum = hnum + 1
 
+    config.writer.finalize()
     return config.writer
 
 
-def simulate(config: configLoader.Config):
+def simulate(config: configLoader.Config, resultCache: Optional[cache.ResultCache] = None,
+             householdDone: Optional[Callable] = None):
+    # householdDone(hnum, household) is called for each household as soon as it is simulated (or loaded)
     # Randomize using the seed
-    random.seed(config.seed)
+    rng.seed(config.seed)
 
     neighbourhood.neighbourhood(config)
 
@@ -72,17 +104,94 @@ def simulate(config: configLoader.Config):
     numOfHouseholds = len(config.householdList)
 
     for household in config.householdList:
-        print("Simulating household " + str(hnum + 1) + " of " + str(numOfHouseholds), flush=True)
+        # Each household has its own random sequence, such that its simulation does not depend on other households
+        rng.seed(str(config.seed) + '-' + str(hnum))
+
+        if resultCache is not None:
+            keys = cache.household_keys(config, hnum)
+            state = resultCache.lookup(keys)
+            if state is not None:
+                logger.info("Loading household " + str(hnum + 1) + " of " + str(numOfHouseholds) + " from cache")
+                cache.restore_household_state(household, state)
+                if householdDone is not None:
+                    householdDone(hnum, household)
+                hnum = hnum + 1
+                continue
+
+        logger.info("Simulating household " + str(hnum + 1) + " of " + str(numOfHouseholds))
         household.simulate()
 
         # Warning: On my PC the random number is still the same at this point, but after calling scaleProfile() it isn't!!!
         household.scaleProfile()
-        household.reactivePowerProfile()
-        household.thermalGainProfile()
+
+        if resultCache is not None:
+            resultCache.put(keys[-1], cache.household_state(household))
+        if householdDone is not None:
+            householdDone(hnum, household)
         hnum = hnum + 1
 
 
+def write_pipelined(config: configLoader.Config, resultCache: Optional[cache.ResultCache] = None) -> AbstractWriter:
+    # Simulate and write at the same time: each household is handed to a writer thread as soon as it is simulated
+    backgroundWriter = BackgroundWriter(config, len(config.householdList), getattr(config, 'writerQueueSize', 4)).start()
+
+    def householdDone(hnum, household):
+        render_devices(config, [household])
+        backgroundWriter.put(hnum, household)
+
+    try:
+        simulate(config, resultCache, householdDone)
+    except BaseException:
+        # Stop the writer thread, the error of the simulation is the relevant one
+        backgroundWriter.stop()
+        raise
+    return backgroundWriter.close()
+
+
+def generate(config: configLoader.Config, resultCache: Optional[cache.ResultCache] = None) -> NeighbourhoodResult:
+    # In-process generation for use as a library: simulates the households of an in-memory config and returns their
+    # profiles and flexibility as arrays. Nothing is read from configs/ or written to output/, and progress is only
+    # reported through logging. config.writer and config.output_dir are not used.
+    configLoader.validate_config(config)
+    configLoader.create_households(config)
+    simulate(config, resultCache)
+
+    writer = ArrayWriter(config)
+    for hnum, household in enumerate(config.householdList):
+        if hnum % RENDER_BATCH == 0:
+            render_devices(config, config.householdList[hnum:hnum+RENDER_BATCH])
+        writer.writeHousehold(config, household, hnum)
+    return writer.result
+
+
+def run(config: configLoader.Config, cmd_options: configLoader.CommandLineOptions) -> None:
+    # Simulates and writes a loaded config as given by the command line options, used by main() and by the batch runner
+    resultCache = None
+    if cmd_options.useCache:
+        resultCache = cache.open_cache(config)
+
+    if cmd_options.sweep:
+        sweep.simulate_base(config, resultCache)
+        for name, scenarioConfig in sweep.scenarios(config):
+            scenarioConfig.output_dir = cmd_options.cfgOutputDir + name + '/'
+            prepare_output_directory(cmd_options, scenarioConfig.output_dir)
+            scenarioConfig.writer = scenarioConfig.writer_class(scenarioConfig)
+            write_output(scenarioConfig)
+        return
+
+    if cmd_options.libraryDir is not None:
+        library.compose(config, library.ProfileLibrary(cmd_options.libraryDir))
+        write_output(config)
+    elif cmd_options.pipeline:
+        write_pipelined(config, resultCache)
+    else:
+        simulate(config, resultCache)
+        write_output(config)
+
+
 def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stdout)
+
     print("Profilegenerator 1.3.2\n", flush=True)
     print("Copyright (C) 2023 University of Twente", flush=True)
     print("This program comes with ABSOLUTELY NO WARRANTY.", flush=True)
@@ -90,27 +199,25 @@ def main():
     print("See the acompanying license for more information.\n", flush=True)
 
     cmd_options = configLoader.parse_cmdline_options()
+    try:
+        config = configLoader.load_config(cmd_options)
+        if cmd_options.sweep:
+            sweep.validate_scenarios(config)
+    except configLoader.ConfigError as e:
+        print("Error: " + str(e), flush=True)
+        exit()
     prepare_output_directory(cmd_options)
-    config = configLoader.load_config(cmd_options)
 
     print('Loading config: '+cmd_options.cfgFile, flush=True)
     print("The current config will create and simulate "+str(len(config.householdList))+" households", flush=True)
     print("Results will be written into: "+cmd_options.cfgOutputDir+"\n", flush=True)
     print("NOTE: Simulation may take a (long) while...\n", flush=True)
 
-    # Check the config:
-    if config.penetrationEV + config.penetrationPHEV > 100:
-        print("Error, the combined penetration of EV and PHEV exceed 100!", flush=True)
+    try:
+        run(config, cmd_options)
+    except configLoader.ConfigError as e:
+        print("Error: " + str(e), flush=True)
         exit()
-    if config.penetrationPV < config.penetrationBattery:
-        print("Error, the penetration of PV must be equal or higher than PV!", flush=True)
-        exit()
-    if config.penetrationHeatPump + config.penetrationCHP > 100:
-        print("Error, the combined penetration of heatpumps and CHPs exceed 100!", flush=True)
-        exit()
-
-    simulate(config)
-    write_output(config)
 
 
 if __name__ == '__main__':
@@ -15,13 +15,21 @@
 #along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-import random
+import bisect
+
+import numpy
+
+from alpg import rng
 
 def gaussMinMax(mu, deviation):
     assert(deviation > 0)
-    n = random.gauss(mu, round(deviation/3))
+    n = rng.gauss(mu, round(deviation/3))
     return round(max(min((mu+deviation), n), mu-deviation))
 
+def numpyGenerator():
+    # Numpy generator for batches of random numbers, seeded from rng to keep runs reproducible
+    return numpy.random.default_rng(rng.getrandbits(64))
+
 def roundToTimeBase(time, timeBase=60):
     return round(time/timeBase) * timeBase
 
@@ -35,36 +43,25 @@ def roundList(listIn, rate):
     return result
 
 
+def clampToDeadlines(listIn, compare, multiplier=1, margin=60):
+    # Batch check of times against deadlines for the compare argument of createStringList(). Each time is scaled by the
+    # multiplier. When the (unscaled) time is not below the scaled deadline of the next entry minus margin, that moment is
+    # used instead. The last time is only scaled. None of the writers clamp, such that all of them write the session
+    # times as simulated and their outputs agree.
+    assert(len(listIn) == len(compare))
+    if len(listIn) == 0:
+        return []
+    out = [time*multiplier if time < (deadline*multiplier-margin) else deadline*multiplier-margin
+           for time, deadline in zip(listIn[:-1], compare[1:])]
+    out.append(listIn[len(listIn)-1]*multiplier)
+    return out
+
 def createStringList(listIn, compare=None, multiplier=1, rescale=True):
-    if compare == None:
-        out = str(listIn[0]*multiplier)
-        for i in range(1, len(listIn)):
-            out = out + ',' + str(listIn[i]*multiplier)
-        return out
+    if compare is None:
+        return ','.join([str(value*multiplier) for value in listIn])
 
     #Check if the deadline is before the next time
-    else:
-        first = True
-        out = ''
-        assert(len(listIn) == len(compare))
-        for i in range(0, len(listIn)-1):
-            if(listIn[i] < (compare[i+1]*multiplier-60)):
-                if first:
-                    out = str(listIn[i]*multiplier)
-                    first = False
-                else:
-                    out = out + ',' + str(listIn[i]*multiplier)
-            else:
-                if first:
-                    out = str(compare[i+1]*multiplier-60)
-                    first = False
-                else:
-                    out = out + ',' + str(compare[i+1]*multiplier-60)
-        if first:
-            out = str(listIn[len(listIn)-1]*multiplier)
-        else:
-            out = out + ',' + str(listIn[len(listIn)-1]*multiplier)
-        return out
+    return ','.join([str(value) for value in clampToDeadlines(listIn, compare, multiplier)])
 
 
 def resample(listIn, rate):
@@ -80,3 +77,74 @@ def resample(listIn, rate):
         total = total + listIn[idx]
         idx += 1
     return result
+
+
+# Interval arithmetic on lists of sorted, non-overlapping [start, end) intervals in minutes
+def intervals(listIn):
+    result = []
+    start = None
+    for i, value in enumerate(listIn):
+        if value:
+            if start is None:
+                start = i
+        elif start is not None:
+            result.append((start, i))
+            start = None
+    if start is not None:
+        result.append((start, len(listIn)))
+    return result
+
+
+def intervalsFromMinutes(minutes):
+    result = []
+    for m in sorted(minutes):
+        if result and result[-1][1] == m:
+            result[-1] = (result[-1][0], m+1)
+        else:
+            result.append((m, m+1))
+    return result
+
+
+def subtractIntervals(intervalsIn, removed):
+    result = []
+    j = 0
+    for start, end in intervalsIn:
+        while j < len(removed) and removed[j][1] <= start:
+            j += 1
+        k = j
+        while start < end and k < len(removed) and removed[k][0] < end:
+            if removed[k][0] > start:
+                result.append((start, removed[k][0]))
+            start = max(start, removed[k][1])
+            k += 1
+        if start < end:
+            result.append((start, end))
+    return result
+
+
+def intervalsLength(intervalsIn):
+    return sum(end - start for start, end in intervalsIn)
+
+
+def intervalsElements(intervalsIn, indices):
+    # Map positions in the concatenation of all intervals to the actual minutes
+    offsets = []
+    total = 0
+    for start, end in intervalsIn:
+        offsets.append(total)
+        total += end - start
+    result = []
+    for idx in indices:
+        k = bisect.bisect_right(offsets, idx) - 1
+        result.append(intervalsIn[k][0] + idx - offsets[k])
+    return result
+
+
+def runs(listIn):
+    # Run-length encoding of a profile: start, length and value of each run of equal values
+    values = numpy.asarray(listIn)
+    if len(values) == 0:
+        return [], [], []
+    starts = numpy.concatenate(([0], numpy.flatnonzero(values[1:] != values[:-1]) + 1))
+    lengths = numpy.diff(numpy.append(starts, len(values)))
+    return starts.tolist(), lengths.tolist(), values[starts].tolist()
@@ -0,0 +1,22 @@
+
+#Copyright (C) 2023 University of Twente
+
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Random numbers of the simulation. All models draw through the functions of this module (rng.randint(), rng.random(),
+# ...), which are those of the random module of Python, such that the sequence for a seed is fixed for a given version
+# of the code. Vectorised models draw from a numpy Generator seeded from this module, see profilegentools.numpyGenerator().
+
+from random import seed, random, randint, gauss, triangular, choice, shuffle, sample, getrandbits
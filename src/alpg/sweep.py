@@ -0,0 +1,159 @@
+#Copyright (C) 2023 University of Twente
+
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Penetration sweeps: the same neighbourhood with different penetrations of technologies.
+# The behaviour of the households does not depend on the penetration of PV, batteries, EVs and heating systems. Hence,
+# the households are simulated only once (always generating EV sessions) and for each scenario only the assignment of
+# technologies (neighbourhood()), the EV sessions and the PV profiles are derived.
+
+import copy
+import logging
+from typing import Iterator, Optional
+
+from alpg import rng
+from alpg import cache
+from alpg import configLoader
+from alpg import houses
+from alpg import neighbourhood
+from alpg.households import ELECTRIC_VEHICLE_DEVICE
+
+logger = logging.getLogger(__name__)
+
+
+# Config attributes that may differ between scenarios, as these only influence the assignment of technologies
+SCENARIO_ATTRIBUTE_PREFIXES = ('penetration', 'capacity', 'power', 'PV')
+
+# The cooking behaviour of the households depends on induction cooking, so this one is fixed for a sweep
+FIXED_ATTRIBUTES = ('penetrationInductioncooking',)
+
+
+def penetrationSteps(attribute: str, values) -> list[dict]:
+    # Scenarios for a range of penetrations of a single technology, e.g. penetrationSteps('penetrationPV', range(0, 101, 10))
+    return [{attribute: value} for value in values]
+
+
+def scenario_name(scenario: dict) -> str:
+    if 'name' in scenario:
+        return str(scenario['name'])
+    return '_'.join(name + str(value) for name, value in sorted(scenario.items()))
+
+
+def scenario_config(config: configLoader.Config, scenario: dict) -> configLoader.Config:
+    scenarioConfig = copy.copy(config)
+    for name, value in scenario.items():
+        if name == 'name':
+            continue
+        if not name.startswith(SCENARIO_ATTRIBUTE_PREFIXES) or name in FIXED_ATTRIBUTES or not hasattr(config, name):
+            raise configLoader.ConfigError("The attribute " + name + " cannot be varied in a sweep")
+        setattr(scenarioConfig, name, value)
+    configLoader.validate_config(scenarioConfig)
+    return scenarioConfig
+
+
+def validate_scenarios(config: configLoader.Config) -> None:
+    scenarios = getattr(config, 'sweepScenarios', [])
+    if not isinstance(scenarios, (list, tuple)) or not all(isinstance(scenario, dict) for scenario in scenarios):
+        raise configLoader.ConfigError("The sweepScenarios must be a list of dicts!")
+    if len(scenarios) == 0:
+        raise configLoader.ConfigError("The config does not contain any sweepScenarios!")
+    names = [scenario_name(scenario) for scenario in scenarios]
+    if len(set(names)) != len(names):
+        raise configLoader.ConfigError("The names of the sweep scenarios must be unique!")
+    for scenario in scenarios:
+        scenario_config(config, scenario)
+
+
+def simulate_base(config: configLoader.Config, resultCache: Optional[cache.ResultCache] = None) -> None:
+    # Simulate the behaviour of all households once, including the EV sessions of every household
+    validate_scenarios(config)
+    configs = [config] + [scenario_config(config, scenario) for scenario in config.sweepScenarios]
+    capacity = max(max(c.capacityEV, c.capacityPHEV) for c in configs)
+
+    # Assign induction cooking the same way as a normal run does, the other technologies are assigned per scenario
+    householdList = list(config.householdList)
+    rng.seed(config.seed)
+    neighbourhood.neighbourhood(config)
+    config.householdList = householdList
+
+    numOfHouseholds = len(config.householdList)
+    for hnum, household in enumerate(config.householdList):
+        household.hasEV = True
+        household.Devices[ELECTRIC_VEHICLE_DEVICE].BufferCapacity = capacity
+        household.Devices[ELECTRIC_VEHICLE_DEVICE].Consumption = config.powerEV
+        household.setHouse(houses.House(config))
+
+        rng.seed(str(config.seed) + '-' + str(hnum))
+        if resultCache is not None:
+            keys = cache.household_keys(config, 'sweep-' + str(hnum) + '-' + str(capacity))
+            state = resultCache.lookup(keys)
+            if state is not None:
+                logger.info("Loading household " + str(hnum + 1) + " of " + str(numOfHouseholds) + " from cache")
+                cache.restore_household_state(household, state)
+                continue
+
+        logger.info("Simulating household " + str(hnum + 1) + " of " + str(numOfHouseholds))
+        household.simulate()
+        household.scaleProfile()
+
+        if resultCache is not None:
+            resultCache.put(keys[-1], cache.household_state(household))
+
+
+def scenarios(config: configLoader.Config) -> Iterator[tuple[str, configLoader.Config]]:
+    # Yields the name and config of each scenario, with its householdList ready to be written. The households are shared
+    # between the scenarios, so each scenario must be written before continuing with the next one.
+    householdList = list(config.householdList)
+    induction = [household.hasInductionCooking for household in householdList]
+    sessions = [(list(ev.StartTimes), list(ev.EndTimes), list(ev.EnergyLoss))
+                for ev in (household.Devices[ELECTRIC_VEHICLE_DEVICE] for household in householdList)]
+
+    for scenario in config.sweepScenarios:
+        name = scenario_name(scenario)
+        logger.info("Assigning technologies for scenario " + name)
+        scenarioConfig = scenario_config(config, scenario)
+        scenarioConfig.householdList = list(householdList)
+
+        for household in householdList:
+            household.hasEV = False
+            household.hasHP = False
+            household.hasCHP = False
+            household.Devices[ELECTRIC_VEHICLE_DEVICE].BufferCapacity = 0
+            household.Devices[ELECTRIC_VEHICLE_DEVICE].Consumption = 0
+
+        rng.seed(config.seed)
+        neighbourhood.neighbourhood(scenarioConfig)
+
+        for household, hasInductionCooking, (startTimes, endTimes, energyLoss) in zip(householdList, induction, sessions):
+            household.hasInductionCooking = hasInductionCooking
+
+            ev = household.Devices[ELECTRIC_VEHICLE_DEVICE]
+            if household.hasEV:
+                ev.StartTimes = list(startTimes)
+                ev.EndTimes = list(endTimes)
+                ev.EnergyLoss = [min(loss, ev.BufferCapacity) for loss in energyLoss]
+                ev.Setpoint = [ev.BufferCapacity] * len(startTimes)
+            else:
+                ev.StartTimes = []
+                ev.EndTimes = []
+                ev.EnergyLoss = []
+                ev.Setpoint = []
+
+            if household.House.hasPV:
+                household.PVProfile = household.Devices['PVPanel'].simulate(scenarioConfig, scenarioConfig.startDay, scenarioConfig.numDays*((3600*24)/60), household.House.pvArea, household.House.pvEfficiency, household.House.pvAzimuth, household.House.pvElevation)
+            else:
+                household.PVProfile = [0] * scenarioConfig.numDays * int(24*3600/60)
+
+        yield name, scenarioConfig
@@ -14,20 +14,155 @@
 #You should have received a copy of the GNU General Public License
 #along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from __future__ import annotations
+
+import io
 import abc
 import os
+import gzip
+import queue
+import shutil
+import tempfile
+import logging
+import threading
 from dataclasses import dataclass
 from datetime import timedelta
 from enum import Enum
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 
-import pandas
+import numpy
 
 from alpg import profilegentools
-from alpg.configLoader import Config
+from alpg.configLoader import Config, ConfigError
 from alpg.devices import DeviceElectricalVehicle, DeviceWashingMachine, DeviceDishwasher
 from alpg.heatdemand import Thermostat
-from alpg.households import THERMOSTAT_DEVICE, ELECTRIC_VEHICLE_DEVICE, DISHWASHER_DEVICE, WASHING_MACHINE_DEVICE
+from alpg.configLoader import outputSelected
+from alpg.households import THERMOSTAT_DEVICE, ELECTRIC_VEHICLE_DEVICE, DISHWASHER_DEVICE, WASHING_MACHINE_DEVICE, DHW_CHANNELS
+
+logger = logging.getLogger(__name__)
+
+# pandas is only imported by the PandasWriter when it is used, it takes longer to import than a small simulation takes
+if TYPE_CHECKING:
+    import pandas
+
+# The dense profiles of a household, by the name of their DEMKit output file: (attribute of the household, key)
+CHANNELS = {'Electricity_Profile': ('Consumption', 'Total'),
+            'Electricity_Profile_GroupOther': ('Consumption', 'Other'),
+            'Electricity_Profile_GroupInductive': ('Consumption', 'Inductive'),
+            'Electricity_Profile_GroupFridges': ('Consumption', 'Fridges'),
+            'Electricity_Profile_GroupElectronics': ('Consumption', 'Electronics'),
+            'Electricity_Profile_GroupLighting': ('Consumption', 'Lighting'),
+            'Electricity_Profile_GroupStandby': ('Consumption', 'Standby'),
+            'Reactive_Electricity_Profile': ('ReactiveConsumption', 'Total'),
+            'Reactive_Electricity_Profile_GroupOther': ('ReactiveConsumption', 'Other'),
+            'Reactive_Electricity_Profile_GroupInductive': ('ReactiveConsumption', 'Inductive'),
+            'Reactive_Electricity_Profile_GroupFridges': ('ReactiveConsumption', 'Fridges'),
+            'Reactive_Electricity_Profile_GroupElectronics': ('ReactiveConsumption', 'Electronics'),
+            'Reactive_Electricity_Profile_GroupLighting': ('ReactiveConsumption', 'Lighting'),
+            'Reactive_Electricity_Profile_GroupStandby': ('ReactiveConsumption', 'Standby'),
+            'Electricity_Profile_PVProduction': ('PVProfile', None),
+            'Heatgain_Profile': ('HeatGain', 'Total'),
+            'Heatgain_Profile_Persons': ('HeatGain', 'PersonGain'),
+            'Heatgain_Profile_Devices': ('HeatGain', 'DeviceGain'),
+            'Heatdemand_Profile': ('HeatDemand', 'Total'),
+            'Heatdemand_Profile_DHWTap': ('HeatDemand', 'DHWDemand'),
+            'Airflow_Profile_Ventilation': ('HeatGain', 'VentFlow'),
+            # Only with renderTimeshiftable set in the config
+            'Electricity_Profile_WashingMachine': ('TimeshiftableConsumption', WASHING_MACHINE_DEVICE),
+            'Electricity_Profile_Dishwasher': ('TimeshiftableConsumption', DISHWASHER_DEVICE),
+            'Reactive_Electricity_Profile_WashingMachine': ('TimeshiftableReactiveConsumption', WASHING_MACHINE_DEVICE),
+            'Reactive_Electricity_Profile_Dishwasher': ('TimeshiftableReactiveConsumption', DISHWASHER_DEVICE),
+            # Only with renderElectricVehicles set in the config
+            'Electricity_Profile_ElectricVehicle': ('TimeshiftableConsumption', ELECTRIC_VEHICLE_DEVICE)}
+
+# Channels of the rendering stage of the timeshiftable devices
+TIMESHIFTABLE_CHANNELS = ('Electricity_Profile_WashingMachine', 'Electricity_Profile_Dishwasher',
+                          'Reactive_Electricity_Profile_WashingMachine', 'Reactive_Electricity_Profile_Dishwasher')
+ELECTRIC_VEHICLE_CHANNELS = ('Electricity_Profile_ElectricVehicle',)
+OPTIONAL_CHANNELS = TIMESHIFTABLE_CHANNELS + ELECTRIC_VEHICLE_CHANNELS
+
+
+def renderedChannels(config: Config) -> tuple:
+    # The optional channels of the rendered devices that are enabled in the config
+    channels = ()
+    if getattr(config, 'renderTimeshiftable', None) is not None:
+        channels += TIMESHIFTABLE_CHANNELS
+    if getattr(config, 'renderElectricVehicles', False):
+        channels += ELECTRIC_VEHICLE_CHANNELS
+    return channels
+
+
+def outputChannels(config: Config) -> tuple:
+    # The channels written by the writers: those selected by outputs in the config (all by default), of which the
+    # optional channels only when they are enabled
+    channels = tuple(channel for channel in CHANNELS if channel not in OPTIONAL_CHANNELS) + renderedChannels(config)
+    outputs = getattr(config, 'outputs', None)
+    if outputs is None:
+        return channels
+    return tuple(channel for channel in channels if channel in outputs)
+
+
+# Fields of the PandasHouseHold with the channels they hold
+PANDAS_CHANNELS = (('electricity_profile', 'Electricity_Profile'),
+                   ('electricity_profile_group_other', 'Electricity_Profile_GroupOther'),
+                   ('electricity_profile_group_inductive', 'Electricity_Profile_GroupInductive'),
+                   ('electricity_profile_group_fridges', 'Electricity_Profile_GroupFridges'),
+                   ('electricity_profile_group_electronics', 'Electricity_Profile_GroupElectronics'),
+                   ('electricity_profile_group_lighting', 'Electricity_Profile_GroupLighting'),
+                   ('electricity_profile_group_standby', 'Electricity_Profile_GroupStandby'),
+                   ('electricity_profile_pv_production', 'Electricity_Profile_PVProduction'),
+                   ('reactive_electricity_profile', 'Reactive_Electricity_Profile'),
+                   ('reactive_electricity_profile_group_other', 'Reactive_Electricity_Profile_GroupOther'),
+                   ('reactive_electricity_profile_group_inductive', 'Reactive_Electricity_Profile_GroupInductive'),
+                   ('reactive_electricity_profile_group_fridges', 'Reactive_Electricity_Profile_GroupFridges'),
+                   ('reactive_electricity_profile_group_electronics', 'Reactive_Electricity_Profile_GroupElectronics'),
+                   ('reactive_electricity_profile_group_lighting', 'Reactive_Electricity_Profile_GroupLighting'),
+                   ('reactive_electricity_profile_group_standby', 'Reactive_Electricity_Profile_GroupStandby'),
+                   ('heatgain_profile', 'Heatgain_Profile'),
+                   ('heatgain_profile_persons', 'Heatgain_Profile_Persons'),
+                   ('heatgan_profile_devices', 'Heatgain_Profile_Devices'),
+                   ('heatdemand_profile', 'Heatdemand_Profile'),
+                   ('heatdemand_profile_dhw_tap', 'Heatdemand_Profile_DHWTap'),
+                   ('airflow_profile_ventilation', 'Airflow_Profile_Ventilation'),
+                   ('washing_machine_power_profile', 'Electricity_Profile_WashingMachine'),
+                   ('washing_machine_reactive_power_profile', 'Reactive_Electricity_Profile_WashingMachine'),
+                   ('dishwasher_power_profile', 'Electricity_Profile_Dishwasher'),
+                   ('dishwasher_reactive_power_profile', 'Reactive_Electricity_Profile_Dishwasher'),
+                   ('electric_vehicle_power_profile', 'Electricity_Profile_ElectricVehicle'))
+
+
+# Columns and their types of the session tables of the PandasWriter, times are in minutes since the start of the year (as
+# in the other outputs of the sessions), not since startDay
+SESSION_COLUMNS = {'ev_sessions': {'house_number': numpy.int32, 'start': numpy.int32, 'end': numpy.int32,
+                                   'required_charge_watt_hour': numpy.float32},
+                   'washing_machine_runs': {'house_number': numpy.int32, 'start': numpy.int32, 'end': numpy.int32},
+                   'dishwasher_runs': {'house_number': numpy.int32, 'start': numpy.int32, 'end': numpy.int32},
+                   'thermostat_setpoints': {'house_number': numpy.int32, 'start': numpy.int32, 'setpoint': numpy.float32}}
+
+
+# Codecs for compressed output and the extension added to the file names
+COMPRESSION_EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+
+def openCompressed(fname: str, codec: str, level: Optional[int] = None):
+    # Text stream into a compressed file, which can be decompressed while streaming (e.g. zcat or zstdcat)
+    if codec == 'gzip':
+        return gzip.open(fname, 'wt', compresslevel=6 if level is None else level, newline='')
+    if codec == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ConfigError("zstd compression requires the zstandard package (pip install zstandard)")
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        return io.TextIOWrapper(compressor.stream_writer(open(fname, 'wb'), closefd=True), newline='')
+    raise ConfigError("Unknown output compression " + str(codec))
+
+
+def channelProfile(house, channel: str):
+    # None if the channel is not available for this household (e.g. the timeshiftable devices are not rendered)
+    attribute, key = CHANNELS[channel]
+    profile = getattr(house, attribute)
+    return profile if key is None or profile is None else profile.get(key)
 
 
 class AbstractWriter(abc.ABC):
@@ -45,16 +180,21 @@ class AbstractWriter(abc.ABC):
     def writeHousehold(self, config, house, num):
         pass
 
+    def finalize(self):
+        # Called after all households are written
+        pass
+
 
 @dataclass
 class TimeshiftableDevice(abc.ABC):
     active_power_profile: pandas.Series
     reactive_power_profile: pandas.Series
-    start_and_stop_moments: list[tuple[timedelta, timedelta]]  # In time since start of year!
+    start_and_stop_moments: Optional[list[tuple[timedelta, timedelta]]]  # In time since start of year! None without pandasSessionObjects
 
     def active_power_profile_with_time_index(self,
                                              global_start_timestamp: pandas.Timestamp,
                                              profile_start: timedelta) -> pandas.Series:
+        import pandas
         active_power_profile = self.active_power_profile.copy()
         profile_start_timestamp = global_start_timestamp + profile_start
         active_power_profile.index = profile_start_timestamp + pandas.to_timedelta(active_power_profile.index,
@@ -64,6 +204,7 @@ class TimeshiftableDevice(abc.ABC):
     def reactive_power_profile_with_time_index(self,
                                              global_start_timestamp: pandas.Timestamp,
                                              profile_start: timedelta) -> pandas.Series:
+        import pandas
         reactive_power_profile = self.reactive_power_profile.copy()
         profile_start_timestamp = global_start_timestamp + profile_start
         reactive_power_profile.index = profile_start_timestamp + pandas.to_timedelta(reactive_power_profile.index,
@@ -113,7 +254,7 @@ class EVChargeSession:
 class EVChargeSessions:
     capacity_watt_hour: float
     maximum_charging_power_watt: float
-    sessions: list[EVChargeSession]
+    sessions: Optional[list[EVChargeSession]]  # None without pandasSessionObjects, see PandasWriter.sessionTable()
 
 
 @dataclass
@@ -126,32 +267,34 @@ class ThermostatSetpoint:
 class PandasHouseHold:
     house_number: int
 
-    electricity_profile: pandas.Series
-    electricity_profile_group_other: pandas.Series
-    electricity_profile_group_inductive: pandas.Series
-    electricity_profile_group_fridges: pandas.Series
-    electricity_profile_group_electronics: pandas.Series
-    electricity_profile_group_lighting: pandas.Series
-    electricity_profile_group_standby: pandas.Series
-    electricity_profile_pv_production: pandas.Series
-
-    reactive_electricity_profile: pandas.Series
-    reactive_electricity_profile_group_other: pandas.Series
-    reactive_electricity_profile_group_inductive: pandas.Series
-    reactive_electricity_profile_group_fridges: pandas.Series
-    reactive_electricity_profile_group_electronics: pandas.Series
-    reactive_electricity_profile_group_lighting: pandas.Series
-    reactive_electricity_profile_group_standby: pandas.Series
+    # Channels that are not selected by outputs in the config are None
+
+    electricity_profile: Optional[pandas.Series]
+    electricity_profile_group_other: Optional[pandas.Series]
+    electricity_profile_group_inductive: Optional[pandas.Series]
+    electricity_profile_group_fridges: Optional[pandas.Series]
+    electricity_profile_group_electronics: Optional[pandas.Series]
+    electricity_profile_group_lighting: Optional[pandas.Series]
+    electricity_profile_group_standby: Optional[pandas.Series]
+    electricity_profile_pv_production: Optional[pandas.Series]
+
+    reactive_electricity_profile: Optional[pandas.Series]
+    reactive_electricity_profile_group_other: Optional[pandas.Series]
+    reactive_electricity_profile_group_inductive: Optional[pandas.Series]
+    reactive_electricity_profile_group_fridges: Optional[pandas.Series]
+    reactive_electricity_profile_group_electronics: Optional[pandas.Series]
+    reactive_electricity_profile_group_lighting: Optional[pandas.Series]
+    reactive_electricity_profile_group_standby: Optional[pandas.Series]
 
     heating_method: HouseHoldHeatingMethod
-    heatgain_profile: pandas.Series
-    heatgain_profile_persons: pandas.Series
-    heatgan_profile_devices: pandas.Series
+    heatgain_profile: Optional[pandas.Series]
+    heatgain_profile_persons: Optional[pandas.Series]
+    heatgan_profile_devices: Optional[pandas.Series]
 
-    heatdemand_profile: pandas.Series
-    heatdemand_profile_dhw_tap: pandas.Series
+    heatdemand_profile: Optional[pandas.Series]
+    heatdemand_profile_dhw_tap: Optional[pandas.Series]
 
-    airflow_profile_ventilation: pandas.Series
+    airflow_profile_ventilation: Optional[pandas.Series]
 
     battery_settings: Optional[BatterySettings]
     pv_settings: Optional[PVSettings]
@@ -159,7 +302,71 @@ class PandasHouseHold:
     ev_charge_sessions: EVChargeSessions
     washing_machine_executions: WashingMachineExecutions
     dishwasher_executions: DishwasherExecutions
-    thermostat_setpoints: list[ThermostatSetpoint]
+    thermostat_setpoints: Optional[list[ThermostatSetpoint]]
+
+    # Only with renderTimeshiftable set in the config
+    washing_machine_power_profile: Optional[pandas.Series] = None
+    washing_machine_reactive_power_profile: Optional[pandas.Series] = None
+    dishwasher_power_profile: Optional[pandas.Series] = None
+    dishwasher_reactive_power_profile: Optional[pandas.Series] = None
+
+    # Only with renderElectricVehicles set in the config
+    electric_vehicle_power_profile: Optional[pandas.Series] = None
+
+
+class BackgroundWriter:
+    # Writes households with the writer of the config in a separate thread, such that simulation (CPU bound) and
+    # writing (I/O bound) overlap. Households are written in the order in which they are put. When the writer falls
+    # behind, put() blocks once maxQueued households are waiting. The profiles of each household are released once it
+    # is written (see HouseholdModel.releaseResults), so together this caps the number of households of which the
+    # profiles are in memory. Errors of the writer are raised by the next put() or by close().
+    _STOP = object()
+
+    def __init__(self, config: Config, numOfHouseholds: int, maxQueued: int = 4):
+        self.config = config
+        self.numOfHouseholds = numOfHouseholds
+        self.queue = queue.Queue(maxsize=max(1, maxQueued))
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name='alpg-writer', daemon=True)
+
+    def start(self) -> 'BackgroundWriter':
+        self.config.writer.createEmptyFiles()
+        self.config.writer.writeNeighbourhood(0)
+        self.thread.start()
+        return self
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is self._STOP:
+                return
+            if self.error is not None:
+                # Keep taking households, such that put() never blocks on a writer that stopped
+                continue
+            hnum, household = item
+            try:
+                logger.info("Writing Household "+str(hnum+1)+" of "+str(self.numOfHouseholds))
+                self.config.writer.writeHousehold(self.config, household, hnum)
+                household.releaseResults()
+            except BaseException as e:
+                self.error = e
+
+    def put(self, hnum: int, household) -> None:
+        if self.error is not None:
+            raise self.error
+        self.queue.put((hnum, household))
+
+    def stop(self) -> None:
+        # Waits until all households that were put are written (or skipped after an error)
+        self.queue.put(self._STOP)
+        self.thread.join()
+
+    def close(self) -> AbstractWriter:
+        self.stop()
+        if self.error is not None:
+            raise self.error
+        self.config.writer.finalize()
+        return self.config.writer
 
 
 class PandasWriter(AbstractWriter):
@@ -168,7 +375,10 @@ class PandasWriter(AbstractWriter):
 
     def __init__(self, config: Config):
         self.config = config
+        self.channels = outputChannels(config)
         self.households = []
+        # Per session type and column, the arrays of all households written so far
+        self.sessionColumns = {table: {column: [] for column in columns} for table, columns in SESSION_COLUMNS.items()}
 
     def createEmptyFiles(self):
         pass
@@ -177,6 +387,7 @@ class PandasWriter(AbstractWriter):
         pass
 
     def writeHousehold(self, config, house, num):
+        import pandas
         if house.hasHP:
             heating_method = HouseHoldHeatingMethod.HEAT_PUMP
         elif house.hasCHP:
@@ -197,64 +408,78 @@ class PandasWriter(AbstractWriter):
                                      efficiency_perc=house.House.pvEfficiency,
                                      area_m2=house.House.pvArea)
 
+        ev = house.Devices[ELECTRIC_VEHICLE_DEVICE]
+        washingMachine = house.Devices[WASHING_MACHINE_DEVICE]
+        dishwasher = house.Devices[DISHWASHER_DEVICE]
+        thermostat = house.HeatingDevices[THERMOSTAT_DEVICE]
+        self.appendSessions('ev_sessions', num, start=ev.StartTimes, end=ev.EndTimes, required_charge_watt_hour=ev.EnergyLoss)
+        self.appendSessions('washing_machine_runs', num, start=washingMachine.StartTimes, end=washingMachine.EndTimes)
+        self.appendSessions('dishwasher_runs', num, start=dishwasher.StartTimes, end=dishwasher.EndTimes)
+        self.appendSessions('thermostat_setpoints', num, start=thermostat.StartTimes, setpoint=thermostat.Setpoints)
+
+        channels = {}
+        for field, channel in PANDAS_CHANNELS:
+            profile = channelProfile(house, channel) if channel in self.channels else None
+            channels[field] = pandas.Series(profile) if profile is not None else None
+
+        sessionObjects = getattr(config, 'pandasSessionObjects', True)
         household = PandasHouseHold(num,
                                     heating_method=heating_method,
                                     battery_settings=battery_settings,
                                     pv_settings=pv_settings,
-                                    ev_charge_sessions=self.writeElectricVehicle(house.Devices[ELECTRIC_VEHICLE_DEVICE]),
-                                    washing_machine_executions=self.writeDeviceWashingMachine(house.Devices[WASHING_MACHINE_DEVICE]),
-                                    dishwasher_executions=self.writeDeviceDishwasher(house.Devices[DISHWASHER_DEVICE]),
-                                    thermostat_setpoints=self.writeDeviceThermostat(house.HeatingDevices[THERMOSTAT_DEVICE]),
-                                    electricity_profile=pandas.Series(house.Consumption['Total']),
-                                    electricity_profile_group_other=pandas.Series(house.Consumption['Other']),
-                                    electricity_profile_group_inductive=pandas.Series(house.Consumption['Inductive']),
-                                    electricity_profile_group_fridges=pandas.Series(house.Consumption['Fridges']),
-                                    electricity_profile_group_electronics=pandas.Series(house.Consumption['Electronics']),
-                                    electricity_profile_group_lighting=pandas.Series(house.Consumption['Lighting']),
-                                    electricity_profile_group_standby=pandas.Series(house.Consumption['Standby']),
-                                    electricity_profile_pv_production=pandas.Series(house.PVProfile),
-                                    reactive_electricity_profile=pandas.Series(house.ReactiveConsumption['Total']),
-                                    reactive_electricity_profile_group_other=pandas.Series(house.ReactiveConsumption['Other']),
-                                    reactive_electricity_profile_group_inductive=pandas.Series(house.ReactiveConsumption['Inductive']),
-                                    reactive_electricity_profile_group_fridges=pandas.Series(house.ReactiveConsumption['Fridges']),
-                                    reactive_electricity_profile_group_electronics=pandas.Series(house.ReactiveConsumption['Electronics']),
-                                    reactive_electricity_profile_group_lighting=pandas.Series(house.ReactiveConsumption['Lighting']),
-                                    reactive_electricity_profile_group_standby=pandas.Series(house.ReactiveConsumption['Standby']),
-                                    heatgain_profile=pandas.Series(house.HeatGain['Total']),
-                                    heatgain_profile_persons=pandas.Series(house.HeatGain['PersonGain']),
-                                    heatgan_profile_devices=pandas.Series(house.HeatGain['DeviceGain']),
-                                    heatdemand_profile=pandas.Series(house.HeatDemand['Total']),
-                                    heatdemand_profile_dhw_tap=pandas.Series(house.HeatDemand['DHWDemand']),
-                                    airflow_profile_ventilation=pandas.Series(house.HeatGain['VentFlow']))
+                                    ev_charge_sessions=self.writeElectricVehicle(ev, sessionObjects),
+                                    washing_machine_executions=self.writeDeviceWashingMachine(washingMachine, sessionObjects),
+                                    dishwasher_executions=self.writeDeviceDishwasher(dishwasher, sessionObjects),
+                                    thermostat_setpoints=self.writeDeviceThermostat(thermostat) if sessionObjects else None,
+                                    **channels)
         self.households.append(household)
 
+    def appendSessions(self, table, num, **columns):
+        # Adds the sessions of a household to a session table, straight from the lists of the device
+        length = len(next(iter(columns.values())))
+        self.sessionColumns[table]['house_number'].append(numpy.full(length, num, dtype=SESSION_COLUMNS[table]['house_number']))
+        for column, values in columns.items():
+            self.sessionColumns[table][column].append(numpy.asarray(values, dtype=SESSION_COLUMNS[table][column]))
+
+    def sessionTable(self, table: str) -> pandas.DataFrame:
+        # The sessions of all households written so far as a DataFrame with a column per entry of SESSION_COLUMNS[table]:
+        # 'ev_sessions', 'washing_machine_runs', 'dishwasher_runs' or 'thermostat_setpoints'
+        import pandas
+        return pandas.DataFrame({column: numpy.concatenate(chunks) if len(chunks) > 0 else numpy.zeros(0, dtype=dtype)
+                                 for (column, chunks), dtype
+                                 in zip(self.sessionColumns[table].items(), SESSION_COLUMNS[table].values())})
+
     @staticmethod
-    def writeElectricVehicle(machine: DeviceElectricalVehicle) -> EVChargeSessions:
-        sessions = [EVChargeSession(timedelta(minutes=start_time_minutes),
-                                    timedelta(minutes=end_time_minutes),
-                                    required_charge_watt_hour)
-                    for start_time_minutes, end_time_minutes, required_charge_watt_hour
-                    in zip(machine.StartTimes, machine.EndTimes, machine.EnergyLoss)]
+    def writeElectricVehicle(machine: DeviceElectricalVehicle, sessionObjects: bool = True) -> EVChargeSessions:
+        sessions = None
+        if sessionObjects:
+            sessions = [EVChargeSession(timedelta(minutes=start_time_minutes),
+                                        timedelta(minutes=end_time_minutes),
+                                        required_charge_watt_hour)
+                        for start_time_minutes, end_time_minutes, required_charge_watt_hour
+                        in zip(machine.StartTimes, machine.EndTimes, machine.EnergyLoss)]
 
         return EVChargeSessions(capacity_watt_hour=machine.BufferCapacity,
                                 maximum_charging_power_watt=machine.Consumption,
                                 sessions=sessions)
 
-    def writeDeviceWashingMachine(self, machine: DeviceWashingMachine) -> WashingMachineExecutions:
-        active_power_profile, reactive_power_profile = self.convert_device_str_profile(machine.LongProfile)
+    def writeDeviceWashingMachine(self, machine: DeviceWashingMachine, sessionObjects: bool = True) -> WashingMachineExecutions:
+        active_power_profile, reactive_power_profile = self.convert_device_profile(machine.Profile)
         return WashingMachineExecutions(active_power_profile,
                                         reactive_power_profile,
-                                        [(timedelta(minutes=start_time_minutes), timedelta(minutes=end_time_minutes))
-                                         for start_time_minutes, end_time_minutes
-                                         in zip(machine.StartTimes, machine.EndTimes)])
+                                        self.startAndStopMoments(machine) if sessionObjects else None)
 
-    def writeDeviceDishwasher(self, machine: DeviceDishwasher) -> DishwasherExecutions:
-        active_power_profile, reactive_power_profile = self.convert_device_str_profile(machine.LongProfile)
+    def writeDeviceDishwasher(self, machine: DeviceDishwasher, sessionObjects: bool = True) -> DishwasherExecutions:
+        active_power_profile, reactive_power_profile = self.convert_device_profile(machine.Profile)
         return DishwasherExecutions(active_power_profile,
                                     reactive_power_profile,
-                                    [(timedelta(minutes=start_time_minutes), timedelta(minutes=end_time_minutes))
-                                     for start_time_minutes, end_time_minutes
-                                     in zip(machine.StartTimes, machine.EndTimes)])
+                                    self.startAndStopMoments(machine) if sessionObjects else None)
+
+    @staticmethod
+    def startAndStopMoments(machine) -> list[tuple[timedelta, timedelta]]:
+        return [(timedelta(minutes=start_time_minutes), timedelta(minutes=end_time_minutes))
+                for start_time_minutes, end_time_minutes
+                in zip(machine.StartTimes, machine.EndTimes)]
 
     def writeDeviceThermostat(self, machine: Thermostat) -> list[ThermostatSetpoint]:
         return [ThermostatSetpoint(timedelta(minutes=start_time_minutes),
@@ -262,26 +487,37 @@ class PandasWriter(AbstractWriter):
                 for start_time_minutes, setpoint in zip(machine.StartTimes, machine.Setpoints)]
 
     @staticmethod
-    def convert_device_str_profile(long_profile: str) -> tuple[pandas.Series, pandas.Series]:
-        complex_numbers = long_profile.split('),complex(')
-        active_power_profile = []
-        reactive_power_profile = []
-        for complex_number in complex_numbers:
-            cleaned_complex_number = complex_number.lstrip('complex(').rstrip(')')
-            active_power, _, reactive_power = cleaned_complex_number.partition(', ')
-            active_power_profile.append(float(active_power))
-            reactive_power_profile.append(float(reactive_power))
-
-        return pandas.Series(active_power_profile), pandas.Series(reactive_power_profile)
+    def convert_device_profile(profile: numpy.ndarray) -> tuple[pandas.Series, pandas.Series]:
+        import pandas
+        return pandas.Series(numpy.array(profile.real)), pandas.Series(numpy.array(profile.imag))
 
 
 class DEMKitWriter(AbstractWriter):
+    # With outputCompression set in the config, every file is written compressed. The text files are then kept open
+    # during the run, and the columns of the CSV files (one per household) are staged in a temporary folder, such that
+    # finalize() can write the CSV files row by row in a single compressed stream.
     output_folder: str
 
     def __init__(self, config: Config):
         self.output_folder = config.output_dir
+        self.channels = outputChannels(config)
+        self.compression = getattr(config, 'outputCompression', None)
+        self.compressionLevel = getattr(config, 'outputCompressionLevel', None)
+        self.streams = {}
+        self.columns = {}
+        self.stagingDir = None
+
+    def openStream(self, fname):
+        if fname not in self.streams:
+            self.streams[fname] = openCompressed(self.output_folder+'/'+fname+COMPRESSION_EXTENSIONS[self.compression],
+                                                 self.compression, self.compressionLevel)
+        return self.streams[fname]
 
     def writeCsvLine(self, fname, hnum, line):
+        if self.compression is not None:
+            self.openStream(fname).write(line + '\n')
+            return
+
         if not os.path.exists(self.output_folder+'/'+fname):
             #overwrite
             f = open(self.output_folder+'/'+fname, 'w')
@@ -292,6 +528,12 @@ class DEMKitWriter(AbstractWriter):
         f.close()
 
     def writeCsvRow(self, fname, hnum, data):
+        if self.compression is not None:
+            column = os.path.join(self.stagingDir, fname + '.' + str(hnum))
+            numpy.rint(numpy.asarray(data, dtype=float)).astype(numpy.int64).tofile(column)
+            self.columns.setdefault(fname, []).append(column)
+            return
+
         if hnum == 0:
             with open(self.output_folder+'/'+fname, 'w') as f:
                 for datum in data:
@@ -309,6 +551,13 @@ class DEMKitWriter(AbstractWriter):
                     j = j + 1
 
     def createFile(self, fname):
+        if self.compression is not None:
+            if fname.endswith('.csv'):
+                self.columns.setdefault(fname, [])
+            else:
+                self.openStream(fname)
+            return
+
         if os.path.exists(fname):
             os.utime(self.output_folder+'/'+fname, None)
         else:
@@ -316,25 +565,14 @@ class DEMKitWriter(AbstractWriter):
 
     def createEmptyFiles(self):
         # Function to create empty files to ensure that certain software doesn't crash for lack of files
-        self.createFile('Electricity_Profile.csv')
-        self.createFile('Electricity_Profile_GroupOther.csv')
-        self.createFile('Electricity_Profile_GroupInductive.csv')
-        self.createFile('Electricity_Profile_GroupFridges.csv')
-        self.createFile('Electricity_Profile_GroupElectronics.csv')
-        self.createFile('Electricity_Profile_GroupLighting.csv')
-        self.createFile('Electricity_Profile_GroupStandby.csv')
-
-        self.createFile('Reactive_Electricity_Profile.csv')
-        self.createFile('Reactive_Electricity_Profile_GroupOther.csv')
-        self.createFile('Reactive_Electricity_Profile_GroupInductive.csv')
-        self.createFile('Reactive_Electricity_Profile_GroupFridges.csv')
-        self.createFile('Reactive_Electricity_Profile_GroupElectronics.csv')
-        self.createFile('Reactive_Electricity_Profile_GroupLighting.csv')
-        self.createFile('Reactive_Electricity_Profile_GroupStandby.csv')
-
-        self.createFile('Electricity_Profile_PVProduction.csv')
+        if self.compression is not None:
+            openCompressed(os.devnull, self.compression, self.compressionLevel).close()  # Fail early on a bad codec
+            self.stagingDir = tempfile.mkdtemp(prefix='alpg-')
+        # The profiles, of the channels selected by outputs in the config
+        for channel in self.channels:
+            self.createFile(channel + '.csv')
+
         self.createFile('PhotovoltaicSettings.txt')
-        self.createFile('Electricity_Profile_PVProduction.csv')
         self.createFile('BatterySettings.txt')
         self.createFile('HeatingSettings.txt')
 
@@ -354,49 +592,36 @@ class DEMKitWriter(AbstractWriter):
         self.createFile('Thermostat_Starttimes.txt')
         self.createFile('Thermostat_Setpoints.txt')
 
-        # Save HeatGain profiles
-        self.createFile('Heatgain_Profile.csv')
-        self.createFile('Heatgain_Profile_Persons.csv')
-        self.createFile('Heatgain_Profile_Devices.csv')
-
-        # Safe TapWater profiles
-        self.createFile('Heatdemand_Profile.csv')
-        self.createFile('Heatdemand_Profile_DHWTap.csv')
-
-        self.createFile('Airflow_Profile_Ventilation.csv')
-
     def writeNeighbourhood(self, num):
         pass
 
+    def finalize(self):
+        if self.compression is None:
+            return
+
+        # Write the staged columns of the CSV files, a week of rows at a time
+        for fname, columns in self.columns.items():
+            stream = self.openStream(fname)
+            profiles = [numpy.memmap(column, dtype=numpy.int64, mode='r') if os.path.getsize(column) > 0
+                        else numpy.zeros(0, dtype=numpy.int64) for column in columns]
+            length = len(profiles[0]) if profiles else 0
+            for start in range(0, length, 7*1440):
+                rows = numpy.column_stack([profile[start:start+7*1440] for profile in profiles]).tolist()
+                stream.write(''.join(';'.join(map(str, row)) + '\n' for row in rows))
+            del profiles
+
+        for stream in self.streams.values():
+            stream.close()
+        self.streams = {}
+        self.columns = {}
+        shutil.rmtree(self.stagingDir, ignore_errors=True)
+        self.stagingDir = None
+
     def writeHousehold(self, config, house, num):
-        #Save the profile:
-        self.writeCsvRow('Electricity_Profile.csv', num, house.Consumption['Total'])
-        self.writeCsvRow('Electricity_Profile_GroupOther.csv', num, house.Consumption['Other'])
-        self.writeCsvRow('Electricity_Profile_GroupInductive.csv', num, house.Consumption['Inductive'])
-        self.writeCsvRow('Electricity_Profile_GroupFridges.csv', num, house.Consumption['Fridges'])
-        self.writeCsvRow('Electricity_Profile_GroupElectronics.csv', num, house.Consumption['Electronics'])
-        self.writeCsvRow('Electricity_Profile_GroupLighting.csv', num, house.Consumption['Lighting'])
-        self.writeCsvRow('Electricity_Profile_GroupStandby.csv', num, house.Consumption['Standby'])
-
-        self.writeCsvRow('Reactive_Electricity_Profile.csv', num, house.ReactiveConsumption['Total'])
-        self.writeCsvRow('Reactive_Electricity_Profile_GroupOther.csv', num, house.ReactiveConsumption['Other'])
-        self.writeCsvRow('Reactive_Electricity_Profile_GroupInductive.csv', num, house.ReactiveConsumption['Inductive'])
-        self.writeCsvRow('Reactive_Electricity_Profile_GroupFridges.csv', num, house.ReactiveConsumption['Fridges'])
-        self.writeCsvRow('Reactive_Electricity_Profile_GroupElectronics.csv', num, house.ReactiveConsumption['Electronics'])
-        self.writeCsvRow('Reactive_Electricity_Profile_GroupLighting.csv', num, house.ReactiveConsumption['Lighting'])
-        self.writeCsvRow('Reactive_Electricity_Profile_GroupStandby.csv', num, house.ReactiveConsumption['Standby'])
-
-        # Save HeatGain profiles
-        self.writeCsvRow('Heatgain_Profile.csv', num, house.HeatGain['Total'])
-        self.writeCsvRow('Heatgain_Profile_Persons.csv', num, house.HeatGain['PersonGain'])
-        self.writeCsvRow('Heatgain_Profile_Devices.csv', num, house.HeatGain['DeviceGain'])
-
-        # Safe TapWater profiles
-        self.writeCsvRow('Heatdemand_Profile.csv', num, house.HeatDemand['Total'])
-        self.writeCsvRow('Heatdemand_Profile_DHWTap.csv', num, house.HeatDemand['DHWDemand'])
-
-        # Airflow, kind of hacky
-        self.writeCsvRow('Airflow_Profile_Ventilation.csv', num, house.HeatGain['VentFlow'])
+        #Save the profiles: electricity, reactive power, heat gain, tap water, airflow (kind of hacky), PV and the
+        #rendered timeshiftable devices and EVs, see CHANNELS
+        for channel in self.channels:
+            self.writeCsvRow(channel + '.csv', num, channelProfile(house, channel))
 
         # writeCsvRow('Heatgain_Profile_Solar.csv', num, house.HeatGain['SolarGain'])
 
@@ -414,8 +639,6 @@ class DEMKitWriter(AbstractWriter):
             text += str(house.House.pvElevation)+','+str(house.House.pvAzimuth)+','+str(house.House.pvEfficiency)+','+str(house.House.pvArea)
             self.writeCsvLine('PhotovoltaicSettings.txt', num, text)
 
-        self.writeCsvRow('Electricity_Profile_PVProduction.csv', num, house.PVProfile)
-
         if house.House.hasBattery:
             text = str(num)+':'
             text += str(house.House.batteryPower)+','+str(house.House.batteryCapacity)+','+str(round(house.House.batteryCapacity/2))
@@ -487,3 +710,180 @@ class DEMKitWriter(AbstractWriter):
         text = str(hnum)+':'
         text += profilegentools.createStringList(machine.Setpoints)
         self.writeCsvLine('Thermostat_Setpoints.txt', hnum, text)
+
+
+class EventWriter(AbstractWriter):
+    # Compact output of the device activations instead of dense profiles. All times are in minutes since the start of
+    # the simulation. Dense profiles can be reconstructed from:
+    # - Device_Events.csv: activations of the devices in the 'Other' group, see devices.renderEvents() for the patterns
+    # - Fridge_Cycles.csv: each fridge is on during the first initialOn minutes, and from restart onwards repeats
+    #   runtime minutes on and offtime minutes off
+    # - DHW_Draws.csv: shower and tap draws (W heat), only when a channel of the hot water demand is selected by outputs
+    # - Occupancy_Transitions.csv: number of persons at home from the given minute onwards
+    # - Standby.csv: constant standby consumption (W)
+    # - Profile_Runs.csv: runs of equal values of the remaining (scaled) groups, and of the groups above when their
+    #   events are not available (e.g. households composed out of a profile library). The rendered timeshiftable
+    #   devices and EVs are included by their channel name (see renderedChannels())
+    output_folder: str
+
+    def __init__(self, config: Config):
+        self.output_folder = config.output_dir
+        self.renderedChannels = [channel for channel in outputChannels(config) if channel in OPTIONAL_CHANNELS]
+        self.writeDHW = outputSelected(config, DHW_CHANNELS)
+
+    def writeLines(self, fname, lines):
+        with open(self.output_folder+'/'+fname, 'a') as f:
+            for line in lines:
+                f.write(';'.join(str(x) for x in line) + '\n')
+
+    def writeRuns(self, hnum, channel, profile, skipZero=True):
+        starts, lengths, values = profilegentools.runs(profile)
+        self.writeLines('Profile_Runs.csv', [(hnum, channel, start, length, round(value))
+                                             for start, length, value in zip(starts, lengths, values)
+                                             if not (skipZero and value == 0)])
+
+    def createEmptyFiles(self):
+        headers = {'Device_Events.csv': ('household', 'device', 'start', 'duration', 'power', 'pattern', 'head', 'param'),
+                   'Fridge_Cycles.csv': ('household', 'fridge', 'power', 'initialOn', 'restart', 'runtime', 'offtime'),
+                   'DHW_Draws.csv': ('household', 'start', 'duration', 'power'),
+                   'Occupancy_Transitions.csv': ('household', 'minute', 'occupancy'),
+                   'Standby.csv': ('household', 'power'),
+                   'Profile_Runs.csv': ('household', 'channel', 'start', 'duration', 'value')}
+        if not self.writeDHW:
+            del headers['DHW_Draws.csv']
+        for fname, header in headers.items():
+            with open(self.output_folder+'/'+fname, 'w') as f:
+                f.write(';'.join(header) + '\n')
+
+    def writeNeighbourhood(self, num):
+        pass
+
+    def writeHousehold(self, config, house, num):
+        if house.DeviceEvents is not None:
+            self.writeLines('Device_Events.csv', [(num, device) + tuple(event)
+                                                  for device, events in house.DeviceEvents.items()
+                                                  for event in sorted(events) if event.duration > 0])
+        else:
+            self.writeRuns(num, 'Other', house.Consumption['Other'])
+
+        if house.FridgeCycles is not None:
+            self.writeLines('Fridge_Cycles.csv', [(num, f, cycle['power'], cycle['initialOn'], cycle['restart'], cycle['runtime'], cycle['offtime'])
+                                                  for f, cycle in enumerate(house.FridgeCycles)])
+        else:
+            self.writeRuns(num, 'Fridges', house.Consumption['Fridges'])
+
+        if self.writeDHW:
+            starts, lengths, values = profilegentools.runs(house.HeatDemand['DHWDemand'])
+            self.writeLines('DHW_Draws.csv', [(num, start, length, round(value))
+                                              for start, length, value in zip(starts, lengths, values) if value != 0])
+
+        starts, _, values = profilegentools.runs(house.Occupancy)
+        self.writeLines('Occupancy_Transitions.csv', [(num, start, value) for start, value in zip(starts, values)])
+
+        self.writeLines('Standby.csv', [(num, house.Consumption['Standby'][0])])
+
+        for channel in ('Electronics', 'Lighting', 'Inductive'):
+            self.writeRuns(num, channel, house.Consumption[channel])
+
+        for channel in self.renderedChannels:
+            self.writeRuns(num, channel, numpy.rint(channelProfile(house, channel)).astype(int))
+
+
+
+@dataclass
+class HouseholdResult:
+    # Profiles and flexibility of a single household. The channels have one value per minute from the start of the
+    # simulation (startDay), the times in the session tables are minutes since the start of the year. The session tables
+    # map column names onto equally long arrays.
+    num: int
+    heating_method: HouseHoldHeatingMethod
+    battery_settings: Optional[BatterySettings]
+    pv_settings: Optional[PVSettings]
+    channels: dict[str, numpy.ndarray]
+    ev_capacity_watt_hour: float
+    ev_maximum_charging_power_watt: float
+    ev_sessions: dict[str, numpy.ndarray]  # start, end, required_charge_watt_hour
+    washing_machine_runs: dict[str, numpy.ndarray]  # start, end
+    washing_machine_profile: numpy.ndarray  # complex power (W + var j) of a single run, shared and read-only
+    dishwasher_runs: dict[str, numpy.ndarray]  # start, end
+    dishwasher_profile: numpy.ndarray
+    thermostat_setpoints: dict[str, numpy.ndarray]  # start, setpoint
+
+
+@dataclass
+class NeighbourhoodResult:
+    households: list[HouseholdResult]
+
+    def channel(self, name: str) -> numpy.ndarray:
+        # Profile of all households as an array of (households, minutes)
+        return numpy.array([household.channels[name] for household in self.households])
+
+
+class ArrayWriter(AbstractWriter):
+    # In-memory output as numpy arrays, used by profilegenerator.generate()
+    config: Config
+    result: NeighbourhoodResult
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.channels = outputChannels(config)
+        self.result = NeighbourhoodResult([])
+
+    def createEmptyFiles(self):
+        pass
+
+    def writeNeighbourhood(self, num):
+        pass
+
+    def writeHousehold(self, config, house, num):
+        if house.hasHP:
+            heating_method = HouseHoldHeatingMethod.HEAT_PUMP
+        elif house.hasCHP:
+            heating_method = HouseHoldHeatingMethod.COMBINED_HEAT_POWER
+        else:
+            heating_method = HouseHoldHeatingMethod.CONVENTIONAL
+
+        battery_settings = None
+        if house.House.hasBattery:
+            battery_settings = BatterySettings(maximum_power_watt=house.House.batteryPower,
+                                               capacity_watt_hour=house.House.batteryCapacity,
+                                               initial_soc_watt_hour=round(house.House.batteryCapacity/2))
+
+        pv_settings = None
+        if house.House.hasPV:
+            pv_settings = PVSettings(elevation_angle_degrees=house.House.pvElevation,
+                                     azimuth_degrees=house.House.pvAzimuth,
+                                     efficiency_perc=house.House.pvEfficiency,
+                                     area_m2=house.House.pvArea)
+
+        ev = house.Devices[ELECTRIC_VEHICLE_DEVICE]
+        washingMachine = house.Devices[WASHING_MACHINE_DEVICE]
+        dishwasher = house.Devices[DISHWASHER_DEVICE]
+        thermostat = house.HeatingDevices[THERMOSTAT_DEVICE]
+
+        # Reactive power and the heat gain of devices are derived on access, so each channel is read only once
+        channels = {}
+        for channel in self.channels:
+            profile = channelProfile(house, channel)
+            if profile is not None:
+                channels[channel] = numpy.asarray(profile)
+
+        self.result.households.append(HouseholdResult(
+            num,
+            heating_method=heating_method,
+            battery_settings=battery_settings,
+            pv_settings=pv_settings,
+            channels=channels,
+            ev_capacity_watt_hour=ev.BufferCapacity,
+            ev_maximum_charging_power_watt=ev.Consumption,
+            ev_sessions={'start': numpy.asarray(ev.StartTimes, dtype=int),
+                         'end': numpy.asarray(ev.EndTimes, dtype=int),
+                         'required_charge_watt_hour': numpy.asarray(ev.EnergyLoss, dtype=float)},
+            washing_machine_runs={'start': numpy.asarray(washingMachine.StartTimes, dtype=int),
+                                  'end': numpy.asarray(washingMachine.EndTimes, dtype=int)},
+            washing_machine_profile=washingMachine.Profile,
+            dishwasher_runs={'start': numpy.asarray(dishwasher.StartTimes, dtype=int),
+                             'end': numpy.asarray(dishwasher.EndTimes, dtype=int)},
+            dishwasher_profile=dishwasher.Profile,
+            thermostat_setpoints={'start': numpy.asarray(thermostat.StartTimes, dtype=int),
+                                  'setpoint': numpy.asarray(thermostat.Setpoints, dtype=float)}))